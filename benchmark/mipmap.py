@@ -0,0 +1,60 @@
+'''Compare CPU mipmap generation strategies
+
+`resize_image` resizes every level from the base image whereas
+`mipmap_pyramid` filters each level from the previous one.
+
+Usage:
+    python benchmark/mipmap.py [--size=<px>] [--components=<c>] [--runs=<n>]
+
+Options:
+    --size=<px>        Width and height of the base image [default: 2048]
+    --components=<c>   Components per pixel [default: 4]
+    --runs=<n>         Number of runs, the best one is kept [default: 5]
+'''
+from docopt import docopt
+import numpy as np
+from vulkbare import resize_image
+
+from vulk.graphic.texture import mipmap_pyramid
+from vulk.util import millis, mipmap_levels, mipmap_size
+
+
+def bench_resize_image(bitmap, size, components, levels):
+    for mip_level in range(1, levels):
+        width, height = mipmap_size(size, size, mip_level)
+        resize_image(bitmap, size, size, components, width, height)
+
+
+def bench_mipmap_pyramid(bitmap, size, components, levels):
+    mipmap_pyramid(bitmap, size, size, components, levels)
+
+
+def best_of(runs, function, *args):
+    best = float('inf')
+    for _ in range(runs):
+        start = millis()
+        function(*args)
+        best = min(best, millis() - start)
+    return best
+
+
+def main():
+    arguments = docopt(__doc__)
+    size = int(arguments['--size'])
+    components = int(arguments['--components'])
+    runs = int(arguments['--runs'])
+
+    levels = mipmap_levels(size, size)
+    bitmap = np.random.randint(0, 256, size * size * components,
+                               dtype=np.uint8).tobytes()
+
+    print("%dx%d, %d components, %d levels, best of %d runs" %
+          (size, size, components, levels, runs))
+    for name, function in (('resize_image', bench_resize_image),
+                           ('mipmap_pyramid', bench_mipmap_pyramid)):
+        duration = best_of(runs, function, bitmap, size, components, levels)
+        print("%-16s %10.2f ms" % (name, duration))
+
+
+if __name__ == '__main__':
+    main()
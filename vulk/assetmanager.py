@@ -0,0 +1,235 @@
+'''Asset manager module
+
+The `AssetManager` shares assets (textures, fonts...) loaded from files.
+An asset is loaded only once for a given path and set of options, users
+get an `AssetHandle` and must release it when they don't need the asset
+anymore. Unreferenced assets are kept in cache and evicted, least recently
+used first, only when the memory budget is exceeded.
+'''
+from collections import OrderedDict
+import logging
+import os
+
+from vulk.exception import VulkError
+
+logger = logging.getLogger()
+
+
+class AssetHandle():
+    '''Reference to an asset owned by the `AssetManager`'''
+
+    def __init__(self, manager, key, asset):
+        '''
+        *Parameters:*
+
+        - `manager`: `AssetManager` owning the asset
+        - `key`: Key of the asset in the manager
+        - `asset`: The loaded asset
+        '''
+        self.manager = manager
+        self.key = key
+        self.asset = asset
+
+    def release(self):
+        '''Release the asset, the handle can't be used anymore
+
+        Releasing several times the same handle has no effect.
+        '''
+        if self.asset is None:
+            return
+
+        self.manager.release(self)
+        self.asset = None
+
+
+class AssetEntry():
+    '''Asset stored in the `AssetManager`'''
+
+    def __init__(self, asset):
+        self.asset = asset
+        self.refcount = 0
+
+    @property
+    def memory_size(self):
+        '''Bytes of Vulkan memory used by the asset (0 if unknown)'''
+        return getattr(self.asset, 'memory_size', 0)
+
+
+class AssetManager():
+    '''Deduplicate, reference count and evict assets
+
+    An asset is created by a factory called with
+    `factory(context, path, **options)`. `Texture`, `HighQualityTexture` and
+    `FontData` can be used directly as factories. If the asset has a
+    `memory_size` attribute, it's used to respect the memory budget, if it has
+    a `destroy(context)` method, it's called at eviction. Since command
+    buffers in flight may still use an evicted asset, its destruction is
+    deferred to the next `collect`, called by the context at the end of
+    the frame, once the device is idle.
+
+    *Exemple:*
+
+    ```
+    handle = context.assets.load('hero.png', Texture, mip_levels=0)
+    batch.draw(handle.asset, x, y)
+    handle.release()
+    ```
+    '''
+
+    def __init__(self, context, memory_budget=256 * 1024 * 1024):
+        '''
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        - `memory_budget`: Bytes of memory above which unreferenced assets
+                           are evicted
+        '''
+        self.context = context
+        self.memory_budget = memory_budget
+        # Entries sorted from the least to the most recently used
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Evicted assets waiting for the device to be idle
+        self.evicted = []
+
+    @staticmethod
+    def make_key(path, factory, options):
+        '''Return the key identifying an asset
+
+        *Parameters:*
+
+        - `path`: Path of the asset file
+        - `factory`: Callable creating the asset
+        - `options`: `dict` of options given to the factory
+        '''
+        key = (os.path.abspath(path), factory, tuple(sorted(options.items())))
+        try:
+            hash(key)
+        except TypeError:
+            msg = "Asset options must be hashable: %s" % options
+            logger.error(msg)
+            raise VulkError(msg)
+        return key
+
+    def load(self, path, factory, **options):
+        '''Get an handle on the asset, load it if needed
+
+        *Parameters:*
+
+        - `path`: Path of the asset file
+        - `factory`: Callable creating the asset
+        - `options`: Keyword arguments given to the factory
+
+        *Returns:*
+
+        `AssetHandle`
+        '''
+        key = AssetManager.make_key(path, factory, options)
+        entry = self.entries.get(key)
+
+        if entry:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        else:
+            self.misses += 1
+            entry = AssetEntry(factory(self.context, path, **options))
+            self.entries[key] = entry
+
+        entry.refcount += 1
+        self.evict()
+
+        return AssetHandle(self, key, entry.asset)
+
+    def release(self, handle):
+        '''Release an handle, you should use `AssetHandle.release`
+
+        *Parameters:*
+
+        - `handle`: `AssetHandle` to release
+        '''
+        entry = self.entries[handle.key]
+        entry.refcount -= 1
+
+        if not entry.refcount:
+            self.entries.move_to_end(handle.key)
+            self.evict()
+
+    @property
+    def memory(self):
+        '''Bytes of memory used by all managed assets'''
+        return sum(e.memory_size for e in self.entries.values())
+
+    def evict(self, memory_budget=None):
+        '''Evict unreferenced assets until memory is under budget
+
+        *Parameters:*
+
+        - `memory_budget`: Budget to respect (default: `self.memory_budget`)
+        '''
+        if memory_budget is None:
+            memory_budget = self.memory_budget
+
+        memory = self.memory
+        for key in list(self.entries):
+            if memory <= memory_budget:
+                break
+
+            entry = self.entries[key]
+            if entry.refcount:
+                continue
+
+            memory -= entry.memory_size
+            self.destroy_entry(key)
+            self.evictions += 1
+
+        if memory > memory_budget:
+            logger.debug("Asset memory (%s bytes) over budget (%s bytes)",
+                         memory, memory_budget)
+
+    def purge(self):
+        '''Evict all unreferenced assets'''
+        self.evict(0)
+
+    def destroy_entry(self, key):
+        '''Remove the asset from the manager, it's destroyed at `collect`
+
+        *Parameters:*
+
+        - `key`: Key of the asset
+        '''
+        entry = self.entries.pop(key)
+        self.evicted.append(entry.asset)
+        logger.debug("Asset %s evicted", key[0])
+
+    def collect(self):
+        '''Destroy evicted assets
+
+        The device must be idle, no command buffer can use them anymore.
+        '''
+        for asset in self.evicted:
+            destroy = getattr(asset, 'destroy', None)
+            if destroy:
+                destroy(self.context)
+        self.evicted = []
+
+    @property
+    def stats(self):
+        '''Metrics of the manager
+
+        *Returns:*
+
+        `dict` containing hits, misses, evictions, number of assets,
+        number of referenced assets, used memory and budget
+        '''
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'assets': len(self.entries),
+            'referenced': sum(1 for e in self.entries.values()
+                              if e.refcount),
+            'memory': self.memory,
+            'memory_budget': self.memory_budget
+        }
@@ -2,10 +2,11 @@ from abc import ABC, abstractmethod
 from collections import namedtuple
 import logging
 
+from vulk import profile
 from vulk.audio import VulkAudio
 from vulk.context import VulkWindow, VulkContext
 from vulk.event import CallbackEventListener
-from vulk.util import millis, time_since_millis
+from vulk.util import FrameLimiter, millis, time_since_millis
 
 __all__ = ['BaseApp']
 
@@ -22,7 +23,9 @@ class BaseApp(ABC):
     def __init__(self, name='Vulk', x=-1, y=-1, width=640, height=480,
                  fullscreen=False, resizable=True, decorated=True,
                  highdpi=False, debug=False, extra_vulkan_layers=None,
-                 audio_channel=8):
+                 audio_channel=8, present_mode=None, swapchain_images=0,
+                 fps_limit=0, direct_rendering=False,
+                 dynamic_resolution=None):
         # pylint: disable=W0612,W0613
         '''Set initial configuration
 
@@ -39,6 +42,16 @@ class BaseApp(ABC):
         - `highdpi`: Enable highdpi mode if supported
         - `debug`: Enable debug mode (for development only)
         - `extra_vulkan_layers`: `list` of custom vulkan layers
+        - `audio_channel`: Number of audio channels
+        - `present_mode`: `PresentMode` vulk constant (default: MAILBOX
+                          if available, else FIFO)
+        - `swapchain_images`: Number of swapchain images (0 = minimum
+                              supported + 1)
+        - `fps_limit`: Max number of frames per second (0 = unlimited)
+        - `direct_rendering`: Render directly in swapchain images instead
+                              of copying the final image
+        - `dynamic_resolution`: `ResolutionController` scaling the final
+                                image from frame times
 
         **Note: When full screen mode is enabled, you can set width and
                 height to 0 to use the native resolution, otherwise the
@@ -54,6 +67,7 @@ class BaseApp(ABC):
         self.audio = None
         self.event_listeners = []
         self.request_quit = False
+        self.frame_limiter = FrameLimiter(fps_limit)
 
     def _init_logger(self):
         if self.configuration.debug:
@@ -72,8 +86,13 @@ class BaseApp(ABC):
         '''Create window, Vulkan context, audio'''
         window = VulkWindow()
         window.open(self.configuration)
-        self.context = VulkContext(window, self.configuration.debug,
-                                   self.configuration.extra_vulkan_layers)
+        self.context = VulkContext(
+            window, self.configuration.debug,
+            self.configuration.extra_vulkan_layers,
+            present_mode=self.configuration.present_mode,
+            swapchain_images=self.configuration.swapchain_images,
+            direct=self.configuration.direct_rendering,
+            dynamic_resolution=self.configuration.dynamic_resolution)
         self.context.create()
         self.audio = VulkAudio()
         self.audio.open(self.configuration)
@@ -98,14 +117,21 @@ class BaseApp(ABC):
         self.last_time = millis()
 
         while not self.request_quit:
-            events = self.context.get_events()
-            for event in events:
-                for listener in self.event_listeners:
-                    listener.handle(event)
-
-            delta = time_since_millis(self.last_time)
-            self.last_time = millis()
-            self.render(delta)
+            with profile.zone('frame'):
+                with profile.zone('events'):
+                    events = self.context.get_events()
+                    for event in events:
+                        for listener in self.event_listeners:
+                            listener.handle(event)
+
+                delta = time_since_millis(self.last_time)
+                self.last_time = millis()
+                # In direct mode, final image is known after acquisition
+                self.context.acquire()
+                with profile.zone('render'):
+                    self.render(delta)
+                with profile.zone('frame_limiter'):
+                    self.frame_limiter.wait()
 
     @abstractmethod
     def render(self, delta):
@@ -0,0 +1,339 @@
+'''Frame capture module
+
+`FrameCapture` records the final image of each frame without waiting for
+the copy. Each frame is copied in one of the host visible buffers of a
+ring, the copy is submitted with a fence which is polled at next frames.
+Completed frames are encoded in PNG files or in a Y4M video by a
+background thread.
+'''
+import logging
+import os
+import queue
+import struct
+import threading
+import zlib
+
+import numpy as np
+import vulkan as vk
+
+from vulk.exception import VulkError
+from vulk import vulkanconstant as vc
+from vulk import vulkanobject as vo
+
+logger = logging.getLogger()
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def pixels_to_rgba(pixels, image_format):
+    '''Reorder channels of BGRA pixels in place
+
+    *Parameters:*
+
+    - `pixels`: `numpy` array of shape (height, width, 4)
+    - `image_format`: Vulkan format of the pixels
+
+    *Returns:*
+
+    `pixels` in RGBA order
+    '''
+    if image_format in (vk.VK_FORMAT_B8G8R8A8_UNORM,
+                        vk.VK_FORMAT_B8G8R8A8_SRGB):
+        pixels[..., [0, 2]] = pixels[..., [2, 0]]
+    return pixels
+
+
+def encode_png(pixels, compress_level=6):
+    '''Encode RGBA pixels in PNG
+
+    *Parameters:*
+
+    - `pixels`: `numpy` array of `uint8` of shape (height, width, 4)
+    - `compress_level`: zlib compression level
+
+    *Returns:*
+
+    `bytes`
+    '''
+    height, width, _ = pixels.shape
+
+    def chunk(name, data):
+        return (struct.pack('>I', len(data)) + name + data +
+                struct.pack('>I', zlib.crc32(name + data) & 0xffffffff))
+
+    # Filter type 0 (none) before each row
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    raw[:, 1:] = pixels.reshape(height, width * 4)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    return (PNG_SIGNATURE + chunk(b'IHDR', header) +
+            chunk(b'IDAT', zlib.compress(raw.tobytes(), compress_level)) +
+            chunk(b'IEND', b''))
+
+
+def rgba_to_yuv444(pixels):
+    '''Convert RGBA pixels to planar YCbCr (BT.601, studio range)
+
+    *Parameters:*
+
+    - `pixels`: `numpy` array of `uint8` of shape (height, width, 4)
+
+    *Returns:*
+
+    `bytes` with Y, Cb and Cr planes
+    '''
+    rgb = pixels[..., :3].astype(np.float32)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    y = 16 + 0.257 * r + 0.504 * g + 0.098 * b
+    u = 128 - 0.148 * r - 0.291 * g + 0.439 * b
+    v = 128 + 0.439 * r - 0.368 * g - 0.071 * b
+    planes = np.stack((y, u, v))
+    return np.clip(np.rint(planes), 0, 255).astype(np.uint8).tobytes()
+
+
+class CaptureWriter(threading.Thread):
+    '''Background thread encoding captured frames
+
+    Frames are written as `frame_000000.png`... in a directory or in a
+    single Y4M (YUV 4:4:4) file.
+    '''
+
+    def __init__(self, path, capture_format, fps):
+        '''
+        *Parameters:*
+
+        - `path`: Directory (png) or file (y4m)
+        - `capture_format`: 'png' or 'y4m'
+        - `fps`: Frame rate written in the Y4M header
+        '''
+        super().__init__(name='vulk-capture', daemon=True)
+        self.path = path
+        self.capture_format = capture_format
+        self.fps = fps
+        self.frames = queue.Queue()
+        self.written = 0
+        self.error = None
+        self._file = None
+        self._size = None
+
+    def push(self, index, pixels):
+        '''Queue a frame to write
+
+        *Parameters:*
+
+        - `index`: Frame number
+        - `pixels`: RGBA `numpy` array of shape (height, width, 4)
+        '''
+        self.frames.put((index, pixels))
+
+    def close(self):
+        '''Write remaining frames and stop the thread'''
+        self.frames.put(None)
+        self.join()
+
+    def _write_png(self, index, pixels):
+        filename = os.path.join(self.path, 'frame_%06d.png' % index)
+        with open(filename, 'wb') as f:
+            f.write(encode_png(pixels))
+
+    def _write_y4m(self, index, pixels):
+        # pylint: disable=unused-argument
+        height, width, _ = pixels.shape
+        if not self._file:
+            self._size = (width, height)
+            self._file = open(self.path, 'wb')
+            self._file.write(b'YUV4MPEG2 W%d H%d F%d:1 Ip A1:1 C444\n' %
+                             (width, height, self.fps))
+
+        if self._size != (width, height):
+            logger.warning("Frame %s ignored, Y4M size can't change", index)
+            return
+
+        self._file.write(b'FRAME\n')
+        self._file.write(rgba_to_yuv444(pixels))
+
+    def run(self):
+        write = self._write_png
+        if self.capture_format == 'y4m':
+            write = self._write_y4m
+        else:
+            os.makedirs(self.path, exist_ok=True)
+
+        try:
+            while True:
+                frame = self.frames.get()
+                if frame is None:
+                    break
+                write(*frame)
+                self.written += 1
+        except OSError as e:
+            self.error = e
+            logger.error("Capture writer stopped: %s", e)
+        finally:
+            if self._file:
+                self._file.close()
+
+
+class FrameCapture():
+    '''Capture the final image of the context at each `swap`
+
+    A ring of `ring_size` readback buffers is used. When all buffers are
+    still in use by the GPU, the frame is dropped instead of waiting. A slot
+    is read back only when its fence is signaled.
+
+    **Note: `VulkContext` waits for the device at the end of each frame,
+    so copies are always done at the next `poll` and the ring doesn't save
+    GPU stalls yet. It only keeps the encoding out of the render loop.**
+
+    *Exemple:*
+
+    ```
+    context.start_capture('gameplay.y4m', 'y4m')
+    ...
+    context.stop_capture()
+    ```
+    '''
+
+    def __init__(self, context, path, capture_format='png', ring_size=3,
+                 fps=60, max_frames=0):
+        '''
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        - `path`: Directory of PNG files or Y4M file
+        - `capture_format`: 'png' or 'y4m'
+        - `ring_size`: Number of readback buffers
+        - `fps`: Frame rate of the Y4M video
+        - `max_frames`: Stop capturing after this number of frames
+                        (0 = unlimited, 1 = screenshot)
+        '''
+        if capture_format not in ('png', 'y4m'):
+            msg = "Unknown capture format %s" % capture_format
+            logger.error(msg)
+            raise VulkError(msg)
+
+        self.max_frames = max_frames
+        # Frames recorded and dropped
+        self.frame = 0
+        self.dropped = 0
+        self.commandpool = vo.CommandPool(
+            context, context.queue_family_indices['graphic'],
+            vc.CommandPoolCreate.RESET_COMMAND_BUFFER)
+        commandbuffers = self.commandpool.allocate_buffers(
+            context, vc.CommandBufferLevel.PRIMARY, ring_size)
+        # Slots are dict with commandbuffer, fence, buffer, size and frame
+        # Frame is None when the slot is free
+        self.slots = [{'commandbuffer': c, 'fence': vo.Fence(context),
+                       'buffer': None, 'size': None, 'frame': None}
+                      for c in commandbuffers]
+
+        self.writer = CaptureWriter(path, capture_format, fps)
+        self.writer.start()
+
+    @property
+    def finished(self):
+        '''`True` when `max_frames` frames are recorded'''
+        return bool(self.max_frames) and self.frame >= self.max_frames
+
+    def record(self, context):
+        '''Copy the final image in a free readback buffer
+
+        Must be called after the rendering of the frame is submitted.
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        self.poll(context)
+        if self.finished:
+            return
+
+        slot = next((s for s in self.slots if s['frame'] is None), None)
+        if not slot:
+            self.dropped += 1
+            return
+
+        image = context.final_image
+        size = (image.width, image.height, image.format)
+        if slot['size'] != size:
+            if slot['buffer']:
+                slot['buffer'].destroy(context)
+            slot['buffer'] = vo.Buffer(
+                context, vc.BufferCreate.NONE,
+                image.width * image.height * 4, vc.BufferUsage.TRANSFER_DST,
+                vc.SharingMode.EXCLUSIVE, [], vc.VmaMemoryUsage.GPU_TO_CPU)
+            slot['size'] = size
+
+        commandbuffer = slot['commandbuffer']
+        commandbuffer.reset()
+        with commandbuffer.bind(vc.CommandBufferUsage.ONE_TIME_SUBMIT) as cmd:
+            image.update_layout(
+                cmd, vc.ImageLayout.COLOR_ATTACHMENT_OPTIMAL,
+                vc.ImageLayout.TRANSFER_SRC_OPTIMAL,
+                vc.PipelineStage.COLOR_ATTACHMENT_OUTPUT,
+                vc.PipelineStage.TRANSFER,
+                vc.Access.COLOR_ATTACHMENT_WRITE,
+                vc.Access.TRANSFER_READ
+            )
+            image.copy_to_buffer(cmd, slot['buffer'])
+            image.update_layout(
+                cmd, vc.ImageLayout.TRANSFER_SRC_OPTIMAL,
+                vc.ImageLayout.COLOR_ATTACHMENT_OPTIMAL,
+                vc.PipelineStage.TRANSFER,
+                vc.PipelineStage.COLOR_ATTACHMENT_OUTPUT,
+                vc.Access.TRANSFER_READ,
+                vc.Access.COLOR_ATTACHMENT_WRITE
+            )
+
+        submit = vo.SubmitInfo([], [], [], [commandbuffer])
+        vo.submit_to_graphic_queue(context, [submit], slot['fence'])
+        slot['frame'] = self.frame
+        self.frame += 1
+
+    def poll(self, context, wait=False):
+        '''Send completed copies to the writer thread
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        - `wait`: Wait for all copies to complete
+        '''
+        for slot in self.slots:
+            if slot['frame'] is None:
+                continue
+
+            fence = slot['fence']
+            if wait:
+                fence.wait(context)
+            elif not fence.signaled(context):
+                continue
+
+            width, height, image_format = slot['size']
+            with slot['buffer'].bind(context) as b:
+                slot['buffer'].invalidate(context)
+                pixels = np.frombuffer(b, dtype=np.uint8,
+                                       count=width * height * 4)
+                pixels = pixels.reshape(height, width, 4).copy()
+
+            self.writer.push(slot['frame'],
+                             pixels_to_rgba(pixels, image_format))
+            fence.reset(context)
+            slot['frame'] = None
+
+    def destroy(self, context):
+        '''Write pending frames and free resources
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        self.poll(context, wait=True)
+        self.writer.close()
+        for slot in self.slots:
+            slot['fence'].destroy(context)
+            if slot['buffer']:
+                slot['buffer'].destroy(context)
+        self.commandpool.destroy(context)
+
+        logger.debug("Capture finished: %s frames written, %s dropped",
+                     self.writer.written, self.dropped)
@@ -9,18 +9,31 @@ abstraction. Instead of performing the final drawing operation
 directly on the swapchain's images, Vulk performs all operations on
 custom images and framebuffer and finally just copy the result in the
 swapchain's image.
+In direct mode, the copy is skipped: the final image is the acquired
+swapchain image.
+With dynamic resolution, the final image is smaller than the window and
+is upscaled in the swapchain's image.
+
+Without window, the context is headless: there is no surface and no
+swapchain, only the final image which can be read back with `read_pixels`.
 """
 import ctypes
 import logging
+import numpy as np
 import sdl2
 import sdl2.ext
 import vulkan as vk
 import pyvma as vma
 
+from vulk.assetmanager import AssetManager
+from vulk.capture import FrameCapture, pixels_to_rgba
 from vulk.exception import VulkError, SDL2Error
+from vulk import profile
 from vulk import vulkanconstant as vc
 from vulk import vulkanobject as vo
+from vulk import vulkanutil as vu
 from vulk.eventconstant import to_vulk_event
+from vulk.util import millis, time_since_millis
 
 
 logger = logging.getLogger()
@@ -83,21 +96,54 @@ class VulkWindow():
         height = ctypes.c_int()
         sdl2.SDL_GetWindowSize(self.window, ctypes.byref(width),
                                ctypes.byref(height))
-        return width, height
+        return width.value, height.value
 
 
 class VulkContext():
-    def __init__(self, window, debug=False, extra_layers=None):
+    def __init__(self, window, debug=False, extra_layers=None, size=None,
+                 present_mode=None, swapchain_images=0, direct=False,
+                 dynamic_resolution=None):
         """Create context
 
         Args:
-            window (VulkWindow): SDL2 window
+            window (VulkWindow): SDL2 window, `None` for an headless context
             debug (bool): Enable debug
             extra_layers (list[str]): List of Vulkan layers
+            size (tuple[int]): Width and height of the final image of an
+                               headless context
+            present_mode (PresentMode): Wanted present mode, MAILBOX or FIFO
+                                        if `None` or not supported
+            swapchain_images (int): Wanted number of swapchain images,
+                                    minimum supported + 1 if 0
+            direct (bool): Render directly in swapchain images, ignored
+                           in headless mode
+            dynamic_resolution (ResolutionController): Controller of the
+                                                       final image scale,
+                                                       ignored in headless
+                                                       mode
         """
         self.window = window
         self.debug_enabled = debug
         self.extra_layers = extra_layers or []
+        self.present_mode = present_mode
+        self.swapchain_image_count = swapchain_images
+        # Direct rendering in swapchain images
+        self.direct = direct and window is not None
+        # Scale the final image from frame times
+        self.resolution_controller = None
+        if window is not None:
+            self.resolution_controller = dynamic_resolution
+        if self.direct and self.resolution_controller:
+            msg = "Dynamic resolution can't be used in direct mode"
+            logger.critical(msg)
+            raise VulkError(msg)
+        # Headless context renders only in the final image
+        self.headless = window is None
+        self.headless_size = size or (640, 480)
+        if self.headless and min(self.headless_size) <= 0:
+            msg = "Headless context size must be positive"
+            logger.critical(msg)
+            raise VulkError(msg)
 
         # Vulkan instance
         self.instance = None
@@ -119,18 +165,34 @@ class VulkContext():
         self.graphic_queue = None
         # Presentation queue
         self.present_queue = None
+        # Dedicated transfer queue (None if the device has no such queue)
+        self.transfer_queue = None
         # Indices of queue families
         self.queue_family_indices = None
         # Swapchain
         self.swapchain = None
         # Swapchain images (vulkanobject.Image type)
         self.swapchain_images = None
+        # Views of swapchain images (direct mode only)
+        self.swapchain_views = []
+        # Index of the acquired swapchain image, None if not acquired
+        self.image_index = None
         # Swapchain format
         self.swapchain_format = None
+        # Usage flags of swapchain images
+        self.swapchain_usage = 0
         # Width of the window
         self.width = 0
         # Height of the window
         self.height = 0
+        # Scale of the final image relative to the window
+        self.render_scale = 1
+        # Width of the final image
+        self.render_width = 0
+        # Height of the final image
+        self.render_height = 0
+        # Start time of the current frame, set at acquisition
+        self._frame_start = None
         # Final image which is copied into swapchain image
         self.final_image = None
         # Image view of the final image
@@ -144,11 +206,33 @@ class VulkContext():
         self.commandpool = None
         # Command buffers
         self.commandbuffers = None
+        # Command buffers preparing acquired images (direct mode only)
+        self._acquire_commandbuffers = []
         # VMA Allocator
         self.vma_allocator = None
+        # Asset manager sharing textures and fonts
+        self.assets = None
+        # Commandbuffers and fences of one time submissions
+        self.immediate_pool = None
+        # Queue batching buffer and image uploads
+        self.upload_queue = None
+        # Samplers shared between textures
+        self.sampler_cache = None
+        # Memory pools used to sub-allocate buffers
+        self.buffer_pools = None
+        # Uniform data of the current frame
+        self.uniform_allocator = None
+        # Host visible buffer used to read the final image
+        self._readback_buffer = None
+        # Running frame capture
+        self.capture = None
+        # Running GPU profiler
+        self.gpu_profiler = None
         # Counter used externally to context
         # You can use it if you want to know if context is reloaded
         self.reload_count = 0
+        # Duration in milliseconds of the last swapchain reload
+        self.reload_time = 0
 
     def _get_instance_extensions(self):
         """Get extensions which depend on the window
@@ -164,24 +248,10 @@ class VulkContext():
         logger.debug("Available instance extensions: %s",
                      available_extensions)
 
-        # Compute needed extensions
-        extension_mapping = {
-            sdl2.SDL_SYSWM_X11: vk.VK_KHR_XLIB_SURFACE_EXTENSION_NAME,
-            sdl2.SDL_SYSWM_WINDOWS: vk.VK_KHR_WIN32_SURFACE_EXTENSION_NAME,
-            sdl2.SDL_SYSWM_WAYLAND: vk.VK_KHR_WAYLAND_SURFACE_EXTENSION_NAME,
-            sdl2.SDL_SYSWM_MIR: vk.VK_KHR_MIR_SURFACE_EXTENSION_NAME
-        }
-        sdl_subsystem = self.window.info.subsystem
-
-        if sdl_subsystem not in extension_mapping:
-            msg = "Vulkan not supported on this plateform: %s" % sdl_subsystem
-            logger.critical(msg)
-            raise VulkError(msg)
-
         # Select extension
         enabled_extensions = []
-        enabled_extensions.append(vk.VK_KHR_SURFACE_EXTENSION_NAME)
-        enabled_extensions.append(extension_mapping[sdl_subsystem])
+        if not self.headless:
+            enabled_extensions.extend(self._get_surface_extensions())
 
         if self.debug_enabled:
             if vk.VK_EXT_DEBUG_REPORT_EXTENSION_NAME in available_extensions:
@@ -200,13 +270,36 @@ class VulkContext():
 
         return enabled_extensions
 
+    def _get_surface_extensions(self):
+        """Get surface extensions which depend on the window
+
+        Returns:
+            Extensions list (list[str])
+        """
+        extension_mapping = {
+            sdl2.SDL_SYSWM_X11: vk.VK_KHR_XLIB_SURFACE_EXTENSION_NAME,
+            sdl2.SDL_SYSWM_WINDOWS: vk.VK_KHR_WIN32_SURFACE_EXTENSION_NAME,
+            sdl2.SDL_SYSWM_WAYLAND: vk.VK_KHR_WAYLAND_SURFACE_EXTENSION_NAME,
+            sdl2.SDL_SYSWM_MIR: vk.VK_KHR_MIR_SURFACE_EXTENSION_NAME
+        }
+        sdl_subsystem = self.window.info.subsystem
+
+        if sdl_subsystem not in extension_mapping:
+            msg = "Vulkan not supported on this plateform: %s" % sdl_subsystem
+            logger.critical(msg)
+            raise VulkError(msg)
+
+        return [vk.VK_KHR_SURFACE_EXTENSION_NAME,
+                extension_mapping[sdl_subsystem]]
+
     @staticmethod
-    def _get_device_extensions(physical_device):
+    def _get_device_extensions(physical_device, headless=False):
         '''Get device extensions
 
         *Parameters:*
 
         - `physical_device`: The VkPhysicalDevice to check
+        - `headless`: No swapchain extension needed
 
         *Returns:*
 
@@ -221,7 +314,8 @@ class VulkContext():
 
         # Select extensions
         enabled_extensions = []
-        enabled_extensions.append(vk.VK_KHR_SWAPCHAIN_EXTENSION_NAME)
+        if not headless:
+            enabled_extensions.append(vk.VK_KHR_SWAPCHAIN_EXTENSION_NAME)
 
         # Check extensions availability
         if not all(e in available_extensions for e in enabled_extensions):
@@ -266,12 +360,13 @@ class VulkContext():
         *Parameters:*
 
         - `physical_device`: The `VkPhysicalDevice` to check for
-        - `surface`: The `VkSurfaceKHR` to present
+        - `surface`: The `VkSurfaceKHR` to present (`None` if headless)
         - `pfn`: Function `vkGetPhysicalDeviceSurfaceSupportKHR` callable
 
         *Returns:*
 
-        A tuple with graphic index and present index or None
+        A tuple with graphic index and present index or None.
+        Without surface, present index is the graphic index.
         '''
         queue_families = vk.vkGetPhysicalDeviceQueueFamilyProperties(physical_device) # noqa
 
@@ -283,19 +378,53 @@ class VulkContext():
             if queue_family.queueCount <= 0:
                 continue
 
-            # Check that queue family support present queue
-            present_available = pfn(physical_device, i, surface)
-
             if queue_family.queueFlags & vk.VK_QUEUE_GRAPHICS_BIT:
                 graphic_index = i
-            if present_available:
+
+            # Check that queue family support present queue
+            if surface and pfn(physical_device, i, surface):
                 present_index = i
 
+        if not surface:
+            present_index = graphic_index
+
         if graphic_index == -1 or present_index == -1:
             return None
 
         return graphic_index, present_index
 
+    @staticmethod
+    def _get_transfer_queue_family(physical_device):
+        '''Get the queue family dedicated to transfers
+
+        Copy engines are exposed as queue families supporting transfers but
+        neither graphics nor compute, their copies run in parallel with the
+        rendering. Families copying images only by blocks are ignored.
+
+        *Parameters:*
+
+        - `physical_device`: The `VkPhysicalDevice` to check for
+
+        *Returns:*
+
+        Index of the queue family or None
+        '''
+        queue_families = vk.vkGetPhysicalDeviceQueueFamilyProperties(physical_device) # noqa
+        excluded = vk.VK_QUEUE_GRAPHICS_BIT | vk.VK_QUEUE_COMPUTE_BIT
+
+        for i, queue_family in enumerate(queue_families):
+            granularity = queue_family.minImageTransferGranularity
+            if queue_family.queueCount <= 0 or \
+               not queue_family.queueFlags & vk.VK_QUEUE_TRANSFER_BIT or \
+               queue_family.queueFlags & excluded:
+                continue
+
+            if (granularity.width, granularity.height,
+                    granularity.depth) == (1, 1, 1):
+                return i
+
+        return None
+
     def _get_pfn(self):
         '''Get extension function pointers
 
@@ -315,7 +444,7 @@ class VulkContext():
                 logger.critical(msg)
                 raise VulkError(msg)
 
-        extension_functions = {
+        surface_extension_functions = {
             'vkDestroySurfaceKHR',
             'vkGetPhysicalDeviceSurfaceSupportKHR',
             'vkGetPhysicalDeviceSurfaceCapabilitiesKHR',
@@ -333,6 +462,9 @@ class VulkContext():
             'vkDestroyDebugReportCallbackEXT',
         }
 
+        extension_functions = set()
+        if not self.headless:
+            extension_functions.update(surface_extension_functions)
         if self.debug_enabled:
             extension_functions.update(debug_extension_functions)
 
@@ -495,7 +627,7 @@ class VulkContext():
             # Device must contain graphic and present queue family
             if not VulkContext._get_queue_families(
                 d, self.surface,
-                self.pfn['vkGetPhysicalDeviceSurfaceSupportKHR']
+                self.pfn.get('vkGetPhysicalDeviceSurfaceSupportKHR')
             ):
                 score = 0
 
@@ -519,12 +651,18 @@ class VulkContext():
 
     def _create_device(self):
         """Create Vulkan logical device"""
-        extensions = VulkContext._get_device_extensions(self.physical_device)
+        extensions = VulkContext._get_device_extensions(
+            self.physical_device, self.headless)
         layers = self._get_layers()
 
         graphic_index, present_index = VulkContext._get_queue_families(
             self.physical_device, self.surface,
-            self.pfn['vkGetPhysicalDeviceSurfaceSupportKHR'])
+            self.pfn.get('vkGetPhysicalDeviceSurfaceSupportKHR'))
+        transfer_index = VulkContext._get_transfer_queue_family(
+            self.physical_device)
+        indices = {graphic_index, present_index}
+        if transfer_index is not None:
+            indices.add(transfer_index)
 
         queues_create = [
             vk.VkDeviceQueueCreateInfo(
@@ -534,7 +672,7 @@ class VulkContext():
                 queueCount=1,
                 pQueuePriorities=[1]
             )
-            for i in {graphic_index, present_index}]
+            for i in indices]
 
         device_create = vk.VkDeviceCreateInfo(
             sType=vk.VK_STRUCTURE_TYPE_DEVICE_CREATE_INFO,
@@ -555,8 +693,19 @@ class VulkContext():
         self.queue_family_indices = {'graphic': graphic_index,
                                      'present': present_index}
 
+        # Uploads use the graphic queue without transfer queue
+        if transfer_index is not None:
+            self.transfer_queue = vk.vkGetDeviceQueue(self.device,
+                                                      transfer_index, 0)
+            self.queue_family_indices['transfer'] = transfer_index
+            logger.debug("Queue family %s used for uploads", transfer_index)
+
     def _create_swapchain(self):
-        """Create Vulkan swapchain"""
+        """Create Vulkan swapchain
+
+        If a swapchain already exists, it's given as `oldSwapchain` to
+        allow the driver to reuse its resources and then destroyed.
+        """
         surface_capabilities = self.pfn['vkGetPhysicalDeviceSurfaceCapabilitiesKHR'](self.physical_device, self.surface) # noqa
         surface_formats = self.pfn['vkGetPhysicalDeviceSurfaceFormatsKHR'](self.physical_device, self.surface) # noqa
         surface_present_modes = self.pfn['vkGetPhysicalDeviceSurfacePresentModesKHR'](self.physical_device, self.surface) # noqa
@@ -576,6 +725,12 @@ class VulkContext():
             return formats[0]
 
         def get_present_mode(present_modes):
+            if self.present_mode is not None:
+                if self.present_mode in present_modes:
+                    return self.present_mode
+                logger.warning("Present mode %s not supported",
+                               vc.PresentMode(self.present_mode).name)
+
             for p in present_modes:
                 if p == vk.VK_PRESENT_MODE_MAILBOX_KHR:
                     return p
@@ -602,19 +757,31 @@ class VulkContext():
         present_mode = get_present_mode(surface_present_modes)
         extent = get_swap_extent(surface_capabilities)
 
-        # Try to create triple buffering
+        # Try to create triple buffering if no image count is given
         image_count = surface_capabilities.minImageCount + 1
+        if self.swapchain_image_count:
+            image_count = max(self.swapchain_image_count,
+                              surface_capabilities.minImageCount)
         if surface_capabilities.maxImageCount > 0 and \
            image_count > surface_capabilities.maxImageCount:
             image_count = surface_capabilities.maxImageCount
 
+        # In direct mode, we render in swapchain images and we read them
+        # for capture if possible
+        image_usage = vk.VK_IMAGE_USAGE_TRANSFER_DST_BIT
+        if self.direct:
+            image_usage |= vk.VK_IMAGE_USAGE_COLOR_ATTACHMENT_BIT
+            image_usage |= (surface_capabilities.supportedUsageFlags &
+                            vk.VK_IMAGE_USAGE_TRANSFER_SRC_BIT)
+        self.swapchain_usage = image_usage
+
         sharing_mode = vk.VK_SHARING_MODE_EXCLUSIVE
         queue_family_indices = []
         if self.queue_family_indices['graphic'] != \
            self.queue_family_indices['present']:
             sharing_mode = vk.VK_SHARING_MODE_CONCURRENT
-            queue_family_indices = [v for v in
-                                    self.queue_family_indices.values()]
+            queue_family_indices = [self.queue_family_indices['graphic'],
+                                    self.queue_family_indices['present']]
 
         # Finally create swapchain
         swapchain_create = vk.VkSwapchainCreateInfoKHR(
@@ -626,18 +793,22 @@ class VulkContext():
             imageColorSpace=surface_format.colorSpace,
             imageExtent=extent,
             imageArrayLayers=1,
-            imageUsage=vk.VK_IMAGE_USAGE_TRANSFER_DST_BIT,
+            imageUsage=image_usage,
             imageSharingMode=sharing_mode,
             queueFamilyIndexCount=len(queue_family_indices),
             pQueueFamilyIndices=queue_family_indices,
             compositeAlpha=vk.VK_COMPOSITE_ALPHA_OPAQUE_BIT_KHR,
             presentMode=present_mode,
             clipped=vk.VK_TRUE,
-            oldSwapchain=None,
+            oldSwapchain=self.swapchain,
             preTransform=surface_capabilities.currentTransform)
 
+        old_swapchain = self.swapchain
         self.swapchain = self.pfn['vkCreateSwapchainKHR'](
             self.device, swapchain_create, None)
+        if old_swapchain:
+            self.pfn['vkDestroySwapchainKHR'](self.device, old_swapchain,
+                                              None)
         self.width = extent.width
         self.height = extent.height
         self.swapchain_format = surface_format.format
@@ -652,15 +823,15 @@ class VulkContext():
             img = vo.Image.__new__(vo.Image)
             img.image = raw_image
             img.is_swapchain = True
-            img.format = surface_format.format
+            img.format = vc.Format(surface_format.format)
             img.width = self.width
             img.height = self.height
             img.depth = 1
             self.swapchain_images.append(img)
 
         # Update layout of all swapchain images to present khr
-        for image in self.swapchain_images:
-            with vo.immediate_buffer(self) as cmd:
+        with vo.immediate_buffer(self) as cmd:
+            for image in self.swapchain_images:
                 image.update_layout(
                     cmd, vc.ImageLayout.UNDEFINED,
                     vc.ImageLayout.PRESENT_SRC_KHR,
@@ -669,14 +840,55 @@ class VulkContext():
                     vc.Access.NONE, vc.Access.MEMORY_READ
                 )
 
-        logger.debug("Swapchain created with %s images",
-                     len(self.swapchain_images))
+        self._destroy_swapchain_views()
+        if self.direct:
+            self._create_swapchain_views()
+
+        logger.debug("Swapchain created with %s images in %s mode",
+                     len(self.swapchain_images),
+                     vc.PresentMode(present_mode).name)
+
+    def _create_headless_swapchain(self):
+        """Set final image properties without swapchain"""
+        self.width, self.height = self.headless_size
+        self.swapchain_format = vk.VK_FORMAT_R8G8B8A8_UNORM
+        self.swapchain_images = []
+
+    def _create_swapchain_views(self):
+        """Create a view on each swapchain image (direct mode)"""
+        subresource_range = vo.ImageSubresourceRange(
+            aspect=vc.ImageAspect.COLOR,
+            base_miplevel=0,
+            level_count=1,
+            base_layer=0,
+            layer_count=1
+        )
+        self.swapchain_views = [
+            vo.ImageView(self, image, vc.ImageViewType.TYPE_2D,
+                         image.format, subresource_range)
+            for image in self.swapchain_images]
+
+    def _destroy_swapchain_views(self):
+        """Destroy views of the previous swapchain images"""
+        for view in self.swapchain_views:
+            view.destroy(self)
+        self.swapchain_views = []
 
     def _create_final_image(self):
+        self.render_width = max(1, int(self.width * self.render_scale))
+        self.render_height = max(1, int(self.height * self.render_scale))
+
+        if self.direct:
+            # Final image is the acquired swapchain image, index 0 until
+            # the first acquisition
+            self.final_image = self.swapchain_images[0]
+            self.final_image_view = self.swapchain_views[0]
+            return
+
         usage = vc.ImageUsage.TRANSFER_SRC | vc.ImageUsage.COLOR_ATTACHMENT | vc.ImageUsage.TRANSFER_DST  # noqa
         self.final_image = vo.Image(
             self, vc.ImageType.TYPE_2D, vc.Format(self.swapchain_format),
-            self.width, self.height, 1, 1,
+            self.render_width, self.render_height, 1, 1,
             1, vc.SampleCount.COUNT_1, vc.SharingMode.EXCLUSIVE, [],
             vc.ImageLayout.UNDEFINED, vc.ImageTiling.OPTIMAL, usage,
             vc.VmaMemoryUsage.GPU_ONLY
@@ -722,8 +934,48 @@ class VulkContext():
         self.commandpool = vo.CommandPool(
             self, self.queue_family_indices['graphic'])
 
+    def _create_direct_commandbuffers(self):
+        """Create the command buffers updating swapchain image layout
+
+        Acquired images go to color attachment layout and rendered images
+        go back to present layout.
+        """
+        count = len(self.swapchain_images)
+        self._acquire_commandbuffers = self.commandpool.allocate_buffers(
+            self, vc.CommandBufferLevel.PRIMARY, count)
+        self.commandbuffers = self.commandpool.allocate_buffers(
+            self, vc.CommandBufferLevel.PRIMARY, count)
+
+        for i, image in enumerate(self.swapchain_images):
+            with self._acquire_commandbuffers[i].bind() as cmd:
+                image.update_layout(
+                    cmd, vc.ImageLayout.PRESENT_SRC_KHR,
+                    vc.ImageLayout.COLOR_ATTACHMENT_OPTIMAL,
+                    vc.PipelineStage.COLOR_ATTACHMENT_OUTPUT,
+                    vc.PipelineStage.COLOR_ATTACHMENT_OUTPUT,
+                    vc.Access.NONE,
+                    vc.Access.COLOR_ATTACHMENT_READ | vc.Access.COLOR_ATTACHMENT_WRITE # noqa
+                )
+            with self.commandbuffers[i].bind() as cmd:
+                image.update_layout(
+                    cmd, vc.ImageLayout.COLOR_ATTACHMENT_OPTIMAL,
+                    vc.ImageLayout.PRESENT_SRC_KHR,
+                    vc.PipelineStage.COLOR_ATTACHMENT_OUTPUT,
+                    vc.PipelineStage.BOTTOM_OF_PIPE,
+                    vc.Access.COLOR_ATTACHMENT_WRITE,
+                    vc.Access.MEMORY_READ
+                )
+
     def _create_commandbuffers(self):
         """Create the command buffers used to copy image"""
+        if self.direct:
+            self._create_direct_commandbuffers()
+            return
+
+        # Upscale final image with dynamic resolution
+        scaled = (self.render_width, self.render_height) != \
+            (self.width, self.height)
+
         self.commandbuffers = self.commandpool.allocate_buffers(
             self, vc.CommandBufferLevel.PRIMARY,
             len(self.swapchain_images))
@@ -746,7 +998,11 @@ class VulkContext():
                     vc.Access.MEMORY_READ,
                     vc.Access.TRANSFER_WRITE
                 )
-                self.final_image.copy_to(cmd, self.swapchain_images[i])
+                if scaled:
+                    self.final_image.blit_to(cmd, self.swapchain_images[i],
+                                             vc.Filter.LINEAR)
+                else:
+                    self.final_image.copy_to(cmd, self.swapchain_images[i])
                 self.swapchain_images[i].update_layout(
                     cmd, vc.ImageLayout.TRANSFER_DST_OPTIMAL,
                     vc.ImageLayout.PRESENT_SRC_KHR,
@@ -783,56 +1039,130 @@ class VulkContext():
         # Next functions need extension pointers
         self._get_pfn()
         self._create_debug_callback()
-        self._create_surface()
+        if not self.headless:
+            self._create_surface()
         self._create_physical_device()
         self._create_device()
         self._create_vma()
         self._create_commanpool()
+        self.immediate_pool = vu.ImmediatePool(self)
+        self.upload_queue = vu.UploadQueue(self)
+        self.sampler_cache = vu.SamplerCache(self)
+        self.buffer_pools = vu.BufferPools()
+        self.uniform_allocator = vu.UniformAllocator(self)
         self._create_swapchain_global()
+        self._create_semaphores()
+        self.assets = AssetManager(self)
 
     def _create_swapchain_global(self):
-        self._create_swapchain()
+        if self.headless:
+            self._create_headless_swapchain()
+        else:
+            self._create_swapchain()
         self._create_final_image()
-        self._create_commandbuffers()
-        self._create_semaphores()
+        if not self.headless:
+            self._create_commandbuffers()
         self.reload_count += 1
 
-    def _destroy_swapchain_global(self):
-        # Destroy Framebuffers
+    def _destroy_final_image(self):
+        """Destroy the final image and what depends on its size"""
+        # In direct mode, final image is owned by the swapchain
+        if not self.direct:
+            self.final_image_view.destroy(self)
+            self.final_image.destroy(self)
+        self.final_image_view = None
+        self.final_image = None
+        if self._readback_buffer:
+            self._readback_buffer.destroy(self)
+            self._readback_buffer = None
+
+    def reload_swapchain(self):
+        """Create a new swapchain
+
+        The new swapchain is created from the old one. Only the copy
+        command buffers are recreated, `final_image` is kept if its size
+        and format are unchanged (swapchain only out of date). In this
+        case, `reload_count` is not incremented and batches don't need to
+        be reloaded. In direct mode, swapchain images always change so
+        `reload_count` is always incremented.
+        The duration of the reload is stored in `reload_time`.
+        """
         # In Vulkan spec 2.3.1 - Object Lifetime
         # It's legal to destroy Swapchain before pipelines
         # but pipelines, renderpass and framebuffers must be reloaded too
+        # if final image changes
+        start = millis()
 
-        # Be sure all operations are done
+        # Swapchain images may still be in use by the presentation engine
         vk.vkDeviceWaitIdle(self.device)
+        old_properties = (self.width, self.height, self.swapchain_format)
 
-        # Command buffers
-        self.commandpool.free(self)
+        self.commandpool.free_buffers(
+            self, self.commandbuffers + self._acquire_commandbuffers)
+        self._acquire_commandbuffers = []
+        self.image_index = None
+        self._create_swapchain()
 
-        # Final image
-        self.final_image_view.destroy(self)
-        self.final_image_view = None
-        self.final_image.destroy(self)
-        self.final_image = None
+        final_image_reloaded = False
+        if self.direct or \
+           (self.width, self.height, self.swapchain_format) != \
+           old_properties:
+            self._destroy_final_image()
+            self._create_final_image()
+            self.reload_count += 1
+            final_image_reloaded = True
 
-        # Swapchain
-        self.pfn['vkDestroySwapchainKHR'](self.device, self.swapchain, None)
-        self.swapchain = None
+        self._create_commandbuffers()
 
-    def reload_swapchain(self):
-        """Create a new swapchain
+        self.reload_time = time_since_millis(start)
+        logger.debug("Swapchain reloaded in %.2f ms (final image %s)",
+                     self.reload_time,
+                     "recreated" if final_image_reloaded else "kept")
+
+    def set_render_scale(self, scale):
+        """Resize the final image to a scale of the window size
+
+        `reload_count` is incremented, batches reload themselves at their
+        next `begin`. Their projection matrices stay in window coordinates.
 
-        This function creates a swapchain and all that depends on it
+        Args:
+            scale (float): Scale of the window size (0 < scale <= 1)
         """
-        logger.debug("Reloading swapchain")
-        self._destroy_swapchain_global()
-        self._create_swapchain_global()
+        if self.headless or self.direct:
+            return
+
+        width = max(1, int(self.width * scale))
+        height = max(1, int(self.height * scale))
+        self.render_scale = scale
+        if (width, height) == (self.render_width, self.render_height):
+            return
+
+        vk.vkDeviceWaitIdle(self.device)
+        self.commandpool.free_buffers(self, self.commandbuffers)
+        self._destroy_final_image()
+        self._create_final_image()
+        self._create_commandbuffers()
+        self.reload_count += 1
+        logger.debug("Final image resized to %sx%s (scale %s)",
+                     width, height, scale)
+
+    def _update_resolution(self):
+        """Give the frame time to the resolution controller"""
+        if not self.resolution_controller or self._frame_start is None:
+            return
+
+        frame_time = time_since_millis(self._frame_start)
+        self._frame_start = None
+        self.set_render_scale(self.resolution_controller.update(frame_time))
 
     def resize(self):
         """Resize context when window is resized"""
+        if self.headless:
+            return
+
         width, height = self.window.get_size()
 
-        if self.width != width and self.height != height:
+        if self.width != width or self.height != height:
             self.reload_swapchain()
 
     def clear_final_image(self, colors):
@@ -842,13 +1172,22 @@ class VulkContext():
         *Parameters:*
 
         - `colors`: `list` of 4 `float` (rgba)
+
+        In direct mode, the swapchain image is acquired first. Its content
+        is discarded, so it's transitioned from `UNDEFINED`. Nothing is
+        cleared if it can't be acquired.
         '''
+        old_layout = vc.ImageLayout.COLOR_ATTACHMENT_OPTIMAL
+        if self.direct:
+            if self.acquire() is None:
+                return
+            old_layout = vc.ImageLayout.UNDEFINED
+
         clear_color = vo.ClearColorValue(float32=colors)
         ranges = [vo.ImageSubresourceRange(vc.ImageAspect.COLOR, 0, 1, 0, 1)]
         with vo.immediate_buffer(self) as cmd:
             self.final_image.update_layout(
-                cmd,
-                vc.ImageLayout.COLOR_ATTACHMENT_OPTIMAL,
+                cmd, old_layout,
                 vc.ImageLayout.TRANSFER_DST_OPTIMAL,
                 vc.PipelineStage.COLOR_ATTACHMENT_OUTPUT,
                 vc.PipelineStage.TRANSFER,
@@ -867,6 +1206,59 @@ class VulkContext():
                 vc.Access.COLOR_ATTACHMENT_WRITE
             )
 
+    @profile.profiled('VulkContext.acquire')
+    def acquire(self):
+        """Acquire the next swapchain image
+
+        It's done by `swap` if not called before but in direct mode, it
+        must be called before rendering: the acquired image becomes
+        `final_image`. `BaseApp` calls it before `render`.
+
+        Returns:
+            Index of the acquired swapchain image (`image_index`) or `None`
+            if the swapchain can't be acquired
+        """
+        if self.headless or self.image_index is not None:
+            return self.image_index
+
+        index = None
+        for retry in (True, False):
+            try:
+                index = self.pfn['vkAcquireNextImageKHR'](
+                    self.device, self.swapchain, vk.UINT64_MAX,
+                    self._semaphore_available.semaphore, None)
+                break
+            except vk.VkErrorOutOfDateKhr:
+                logger.warning("Swapchain out of date, reloading...")
+                self.reload_swapchain()
+                # Only direct mode needs an image to render into
+                if not self.direct or not retry:
+                    return None
+
+        self.image_index = index
+        # Waiting for the image is not part of the frame time
+        self._frame_start = millis()
+        if self.direct:
+            self.final_image = self.swapchain_images[index]
+            self.final_image_view = self.swapchain_views[index]
+
+            wait_semaphores = [self._semaphore_available.semaphore]
+            submit = vk.VkSubmitInfo(
+                sType=vk.VK_STRUCTURE_TYPE_SUBMIT_INFO,
+                waitSemaphoreCount=len(wait_semaphores),
+                pWaitSemaphores=wait_semaphores,
+                pWaitDstStageMask=[vc.PipelineStage.COLOR_ATTACHMENT_OUTPUT],
+                commandBufferCount=1,
+                pCommandBuffers=[
+                    self._acquire_commandbuffers[index].commandbuffer],
+                signalSemaphoreCount=0,
+                pSignalSemaphores=None
+            )
+            vk.vkQueueSubmit(self.graphic_queue, 1, [submit], None)
+
+        return index
+
+    @profile.profiled('VulkContext.swap')
     def swap(self, semaphores=None):
         """Display final image on screen.
 
@@ -880,39 +1272,58 @@ class VulkContext():
 
         **Note: `final_image` layout is handled by `VulkContext`. You must
                  let it to COLOR_ATTACHMENT_OPTIMAL**
+
+        **Note: In headless mode, nothing is presented, `swap` only waits
+                for the rendering to finish**
+
+        **Note: In direct mode, there is no copy, the swapchain image is
+                only transitioned to the present layout**
         """
-        # Acquire image
-        try:
-            index = self.pfn['vkAcquireNextImageKHR'](
-                self.device, self.swapchain, vk.UINT64_MAX,
-                self._semaphore_available.semaphore, None)
-        except vk.VkErrorOutOfDateKhr:
-            logger.warning("Swapchain out of date, reloading...")
-            self.reload_swapchain()
+        if self.headless:
+            self._swap_headless(semaphores)
             return
 
-        wait_semaphores = [self._semaphore_available]
+        index = self.acquire()
+        if index is None:
+            return
+
+        wait_semaphores = []
+        if not self.direct:
+            wait_semaphores.append(self._semaphore_available)
         if semaphores:
             wait_semaphores.extend([s for s in semaphores if s])
 
+        # Swapchain image must be read before going to present layout
+        if self.capture and self.direct:
+            self.capture.record(self)
+
         wait_masks = [vc.PipelineStage.COLOR_ATTACHMENT_OUTPUT]
         wait_masks *= len(wait_semaphores)
 
         copied_semaphores = [self._semaphore_copied.semaphore]
 
+        commandbuffers = [self.commandbuffers[index]]
+        if self.gpu_profiler:
+            scope = self.gpu_profiler.scope_commandbuffers(self, 'swap')
+            if scope:
+                commandbuffers = [scope[0]] + commandbuffers + [scope[1]]
+
         # Transfer final image to swapchain image
         submit = vk.VkSubmitInfo(
             sType=vk.VK_STRUCTURE_TYPE_SUBMIT_INFO,
             waitSemaphoreCount=len(wait_semaphores),
             pWaitSemaphores=[s.semaphore for s in wait_semaphores],
             pWaitDstStageMask=wait_masks,
-            commandBufferCount=1,
-            pCommandBuffers=[self.commandbuffers[index].commandbuffer],
+            commandBufferCount=len(commandbuffers),
+            pCommandBuffers=[c.commandbuffer for c in commandbuffers],
             signalSemaphoreCount=len(copied_semaphores),
             pSignalSemaphores=copied_semaphores
         )
         vk.vkQueueSubmit(self.graphic_queue, 1, [submit], None)
 
+        if self.capture and not self.direct:
+            self.capture.record(self)
+
         # Present swapchain image on screen
         present = vk.VkPresentInfoKHR(
             sType=vk.VK_STRUCTURE_TYPE_PRESENT_INFO_KHR,
@@ -923,10 +1334,183 @@ class VulkContext():
             pImageIndices=[index],
             pResults=None
         )
-        self.pfn['vkQueuePresentKHR'](self.present_queue, present)
+        self.image_index = None
+        out_of_date = False
+        try:
+            self.pfn['vkQueuePresentKHR'](self.present_queue, present)
+        except (vk.VkErrorOutOfDateKhr, vk.VkSuboptimalKhr):
+            out_of_date = True
+
+        self._end_frame()
 
+        if out_of_date:
+            logger.warning("Swapchain out of date, reloading...")
+            self.reload_swapchain()
+        else:
+            self._update_resolution()
+
+    def _swap_headless(self, semaphores):
+        """Wait on semaphores and end the frame
+
+        Args:
+            semaphore (list[Semaphore]): semaphores to wait on
+        """
+        wait_semaphores = [s for s in semaphores or [] if s]
+        if wait_semaphores:
+            wait_masks = [vc.PipelineStage.COLOR_ATTACHMENT_OUTPUT]
+            wait_masks *= len(wait_semaphores)
+            submit = vk.VkSubmitInfo(
+                sType=vk.VK_STRUCTURE_TYPE_SUBMIT_INFO,
+                waitSemaphoreCount=len(wait_semaphores),
+                pWaitSemaphores=[s.semaphore for s in wait_semaphores],
+                pWaitDstStageMask=wait_masks,
+                commandBufferCount=0,
+                pCommandBuffers=None,
+                signalSemaphoreCount=0,
+                pSignalSemaphores=None
+            )
+            vk.vkQueueSubmit(self.graphic_queue, 1, [submit], None)
+
+        if self.capture:
+            self.capture.record(self)
+
+        self._end_frame()
+
+    @profile.profiled('VulkContext.end_frame')
+    def _end_frame(self):
+        """Wait for the GPU and release resources of the frame"""
         vk.vkDeviceWaitIdle(self.device)
+        self.upload_queue.collect()
+        self.immediate_pool.collect()
+        self.assets.collect()
+        # Uniform data has a single region, rewound only once the device
+        # is idle
+        self.uniform_allocator.reset()
+        if self.gpu_profiler:
+            self.gpu_profiler.next_frame(self)
+
+    def read_pixels(self):
+        """Read the final image
+
+        Rendering must be finished (after `swap`, or before it in direct
+        mode since the image is then presented). The final image is
+        copied in a host visible buffer which is kept for next reads.
+
+        Returns:
+            `numpy` array of `uint8` of shape (height, width, 4), in RGBA
+        """
+        self._check_readable()
+        width = self.final_image.width
+        height = self.final_image.height
+        image_format = vc.Format(self.final_image.format)
+        if vc.format_size(image_format, 1, 1) != 4:
+            msg = "Can't read pixels of format %s" % image_format.name
+            logger.error(msg)
+            raise VulkError(msg)
+
+        size = vc.format_size(image_format, width, height)
+        if self._readback_buffer and self._readback_buffer.size != size:
+            self._readback_buffer.destroy(self)
+            self._readback_buffer = None
+        if not self._readback_buffer:
+            self._readback_buffer = vo.Buffer(
+                self, vc.BufferCreate.NONE, size, vc.BufferUsage.TRANSFER_DST,
+                vc.SharingMode.EXCLUSIVE, [], vc.VmaMemoryUsage.GPU_TO_CPU)
+
+        with vo.immediate_buffer(self) as cmd:
+            self.final_image.update_layout(
+                cmd, vc.ImageLayout.COLOR_ATTACHMENT_OPTIMAL,
+                vc.ImageLayout.TRANSFER_SRC_OPTIMAL,
+                vc.PipelineStage.COLOR_ATTACHMENT_OUTPUT,
+                vc.PipelineStage.TRANSFER,
+                vc.Access.COLOR_ATTACHMENT_WRITE,
+                vc.Access.TRANSFER_READ
+            )
+            self.final_image.copy_to_buffer(cmd, self._readback_buffer)
+            self.final_image.update_layout(
+                cmd, vc.ImageLayout.TRANSFER_SRC_OPTIMAL,
+                vc.ImageLayout.COLOR_ATTACHMENT_OPTIMAL,
+                vc.PipelineStage.TRANSFER,
+                vc.PipelineStage.COLOR_ATTACHMENT_OUTPUT,
+                vc.Access.TRANSFER_READ,
+                vc.Access.COLOR_ATTACHMENT_WRITE
+            )
+
+        with self._readback_buffer.bind(self) as b:
+            self._readback_buffer.invalidate(self)
+            pixels = np.frombuffer(b, dtype=np.uint8, count=size)
+            pixels = pixels.reshape(height, width, 4).copy()
+
+        return pixels_to_rgba(pixels, self.swapchain_format)
+
+    def start_capture(self, path, capture_format='png', ring_size=3,
+                      fps=60, max_frames=0):
+        """Capture the final image at each `swap`
+
+        Frames are copied asynchronously and encoded by a background
+        thread, see `FrameCapture`.
+
+        Args:
+            path (str): Directory of PNG files or Y4M file
+            capture_format (str): 'png' or 'y4m'
+            ring_size (int): Number of readback buffers
+            fps (int): Frame rate of the Y4M video
+            max_frames (int): Number of frames to capture (0 = unlimited)
+
+        Returns:
+            `FrameCapture`
+        """
+        self._check_readable()
+        self.stop_capture()
+        self.capture = FrameCapture(self, path, capture_format, ring_size,
+                                    fps, max_frames)
+        return self.capture
+
+    def _check_readable(self):
+        """Raise an error if the final image can't be copied
+
+        In direct mode, the final image is a swapchain image which can be
+        copied only if the surface supports `TRANSFER_SRC` usage.
+        """
+        if self.direct and \
+           not self.swapchain_usage & vk.VK_IMAGE_USAGE_TRANSFER_SRC_BIT:
+            msg = "Swapchain images can't be read in direct mode"
+            logger.error(msg)
+            raise VulkError(msg)
+
+    def stop_capture(self):
+        """Stop the capture and write pending frames"""
+        if self.capture:
+            self.capture.destroy(self)
+            self.capture = None
+
+    def start_gpu_profiler(self, frames=3, max_scopes=256, window=120):
+        """Measure GPU time of batch flushes, `swap` and user scopes
+
+        See `GpuProfiler` and `CommandBufferRegister.profile`.
+
+        Args:
+            frames (int): Number of frames in flight
+            max_scopes (int): Maximum number of scopes per frame
+            window (int): Number of frames kept for percentiles
+
+        Returns:
+            `GpuProfiler`
+        """
+        self.stop_gpu_profiler()
+        self.gpu_profiler = vu.GpuProfiler(self, frames, max_scopes, window)
+        return self.gpu_profiler
+
+    def stop_gpu_profiler(self):
+        """Stop and destroy the GPU profiler"""
+        if self.gpu_profiler:
+            vk.vkDeviceWaitIdle(self.device)
+            self.gpu_profiler.destroy(self)
+            self.gpu_profiler = None
 
     def get_events(self):
+        if self.headless:
+            return
+
         for sdl_event in sdl2.ext.get_events():
             yield to_vulk_event(sdl_event)
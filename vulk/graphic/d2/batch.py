@@ -7,6 +7,7 @@ from os import path
 import math
 
 from vulk import PATH_VULK_SHADER
+from vulk import profile
 from vulk import vulkanconstant as vc
 from vulk import vulkanobject as vo
 from vulk import vulkanutil as vu
@@ -17,7 +18,7 @@ from vulk.math.matrix import ProjectionMatrix, TransformationMatrix, Matrix4
 
 class BaseBatch(ABC):
     def __init__(self, context, size=1000, shaderprogram=None,
-                 out_view=None):
+                 out_view=None, push_constants=False):
         """Initialize BaseBatch
 
         Args:
@@ -26,13 +27,26 @@ class BaseBatch(ABC):
             shaderprogram (ShaderProgram): Custom shader program
             clear (list[float]): 4 `float` (r,g,b,a) or `None`
             out_view (ImageView): Out image view to render into
+            push_constants (bool): Send the combined matrix with push
+                                   constants instead of a uniform buffer
 
         **Note: By default, `BaseBatch` doesn't clear `out_image`, you have
                 to fill `clear` to clear `out_image`**
 
         **Note: By default, out image is the context `final_image`, you can
                 override this behavior with the `out_view` parameter**
+
+        **Note: In direct mode, there is one framebuffer per swapchain
+                image, the one of the acquired image is used**
+
+        **Note: In a `RenderGraph`, the batch draws in the target given by
+                the graph with `set_target`**
+
+        **Note: With `push_constants`, a custom shader program must declare
+                the combined matrix in a `push_constant` block**
         """
+        self.push_constants = push_constants
+
         # ShaderProgram
         if not shaderprogram:
             shaderprogram = self.get_default_shaderprogram(context)
@@ -41,6 +55,10 @@ class BaseBatch(ABC):
         # Stored parameters
         self.custom_out_view = out_view is not None
         self.out_view = out_view if out_view else context.final_image_view
+        # RenderTarget of a RenderGraph
+        self.target = None
+        # Name of the flush scope in the GPU profiler
+        self.profile_name = type(self).__name__
 
         # Init rendering attributes
         self.mesh = self.init_mesh(context, size)
@@ -53,7 +71,7 @@ class BaseBatch(ABC):
 
         self.renderpass = self.init_renderpass(context)
         self.pipeline = self.init_pipeline(context)
-        self.framebuffer = self.init_framebuffer(context)
+        self.framebuffers = self.init_framebuffers(context)
 
         # Others attributes
         self.drawing = False
@@ -101,12 +119,27 @@ class BaseBatch(ABC):
         self.pipeline.destroy(context)
         self.pipeline = self.init_pipeline(context)
 
-        self.framebuffer.destroy(context)
-        self.framebuffer = self.init_framebuffer(context)
+        for framebuffer in self.framebuffers:
+            framebuffer.destroy(context)
+        self.framebuffers = self.init_framebuffers(context)
 
         # Update reload count
         self.reload_count = context.reload_count
 
+    def set_target(self, context, target):
+        """Draw in the target of a render graph
+
+        The renderpass and the framebuffer of the target are used instead
+        of the ones of the batch. The batch is reloaded.
+
+        Args:
+            context (VulkContext)
+            target (RenderTarget): Target or `None` to draw again in
+                                   `out_view`
+        """
+        self.target = target
+        self.reload(context)
+
     def init_indices(self, size):
         '''Initialize mesh's indices.
         It's done only at initialization for better performance.
@@ -134,13 +167,21 @@ class BaseBatch(ABC):
         *Parameters:*
 
         - `context`: `VulkContext`
+
+        *Returns:*
+
+        `UniformBlock` or `None` with push constants
         '''
+        if self.push_constants:
+            return None
+
         matrix_attribute = uniform.UniformAttribute(
             uniform.UniformShapeType.MATRIX4,
             vc.DataType.SFLOAT32)
         uniform_attributes = uniform.UniformAttributes([matrix_attribute])
 
-        return uniform.UniformBlock(context, uniform_attributes)
+        return uniform.UniformBlock(context, uniform_attributes,
+                                    dynamic=True)
 
     def init_commandpool(self, context):
         return vu.CommandBufferSynchronizedPool(context)
@@ -152,8 +193,10 @@ class BaseBatch(ABC):
 
         - `context`: `VulkContext`
         '''
+        image_format = self.target.format if self.target \
+            else self.out_view.image.format
         attachment = vo.AttachmentDescription(
-            self.out_view.image.format, vc.SampleCount.COUNT_1,
+            image_format, vc.SampleCount.COUNT_1,
             vc.AttachmentLoadOp.LOAD, vc.AttachmentStoreOp.STORE,
             vc.AttachmentLoadOp.DONT_CARE,
             vc.AttachmentStoreOp.DONT_CARE,
@@ -177,7 +220,12 @@ class BaseBatch(ABC):
 
         - `context`: `VulkContext`
         '''
-        return vo.PipelineLayout(context, [self.descriptorlayout])
+        layouts = [self.descriptorlayout] if self.descriptorlayout else []
+        ranges = []
+        if self.push_constants:
+            # Combined matrix: mat4 of float32
+            ranges.append(vo.PushConstantRange(vc.ShaderStage.VERTEX, 0, 64))
+        return vo.PipelineLayout(context, layouts, ranges)
 
     def init_pipeline(self, context):
         '''Initialize pipeline
@@ -203,9 +251,9 @@ class BaseBatch(ABC):
             vc.PrimitiveTopology.TRIANGLE_LIST)
 
         # Viewport and Scissor
-        viewport = vo.Viewport(0, 0, context.width, context.height, 0, 1)
-        scissor = vo.Rect2D(vo.Offset2D(0, 0),
-                            vo.Extent2D(context.width, context.height))
+        width, height = self.get_render_size(context)
+        viewport = vo.Viewport(0, 0, width, height, 0, 1)
+        scissor = vo.Rect2D(vo.Offset2D(0, 0), vo.Extent2D(width, height))
         viewport_state = vo.PipelineViewportState([viewport], [scissor])
 
         # Rasterization
@@ -236,17 +284,73 @@ class BaseBatch(ABC):
             viewport_state, rasterization, multisample, depth,
             blend, dynamic, self.pipelinelayout, self.renderpass)
 
-    def init_framebuffer(self, context):
-        '''Create the framebuffer with the final_image (from context)
+    def init_framebuffers(self, context):
+        '''Create the framebuffers with the final_image (from context)
+
+        In direct mode, one framebuffer is created per swapchain image.
 
         *Parameters:*
 
         - `context`: `VulkContext`
         '''
-        return vo.Framebuffer(
-            context, self.renderpass, [self.out_view],
-            context.width, context.height, 1)
+        # Framebuffers are owned by the render target
+        if self.target:
+            return []
+
+        views = [self.out_view]
+        if context.direct and not self.custom_out_view:
+            views = context.swapchain_views
 
+        width, height = self.get_render_size(context)
+        return [vo.Framebuffer(context, self.renderpass, [view],
+                               width, height, 1)
+                for view in views]
+
+    def get_render_size(self, context):
+        '''Return the size in pixels of the out image
+
+        With dynamic resolution, the final image is smaller than the
+        window but the projection stays in window coordinates.
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        if self.target:
+            return self.target.width, self.target.height
+        if self.custom_out_view:
+            return context.width, context.height
+        return context.render_width, context.render_height
+
+    def get_renderpass(self):
+        '''Return the renderpass to begin, the one of the target if any'''
+        if self.target:
+            return self.target.renderpass
+        return self.renderpass
+
+    def get_framebuffer(self, context):
+        '''Return the framebuffer to render into
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+
+        *Returns:*
+
+        `Framebuffer` or `None` if the swapchain image can't be acquired
+        (direct mode)
+        '''
+        if self.target:
+            return self.target.get_framebuffer(context)
+        if len(self.framebuffers) == 1:
+            return self.framebuffers[0]
+
+        index = context.acquire()
+        if index is None:
+            return None
+        return self.framebuffers[index]
+
+    @profile.profiled('BaseBatch.begin')
     def begin(self, context, semaphores=None):
         '''Begin drawing sprites
 
@@ -261,10 +365,12 @@ class BaseBatch(ABC):
         if self.drawing:
             raise Exception("Currently drawing")
 
+        # Swapchain or final image recreated (resize, render scale)
         if self.reload_count != context.reload_count:
-            raise Exception("Batch not reloaded, can't draw")
+            self.reload(context)
 
-        if self.matrices_dirty:
+        if self.matrices_dirty or (
+                self.uniformblock and self.uniformblock.expired(context)):
             self.upload_matrices(context)
 
         self.drawing = True
@@ -273,6 +379,7 @@ class BaseBatch(ABC):
         self.context = context
         self.cbpool.begin(context, semaphores)
 
+    @profile.profiled('BaseBatch.end')
     def end(self):
         '''End drawing of sprite
 
@@ -305,10 +412,33 @@ class BaseBatch(ABC):
         '''
         self.combined_matrix.set(self.projection_matrix)
         self.combined_matrix.mul(self.transform_matrix)
-        self.uniformblock.set_uniform(0, self.combined_matrix.values)
-        self.uniformblock.upload(context)
+        if self.uniformblock:
+            self.uniformblock.set_uniform(0, self.combined_matrix.values)
+            self.uniformblock.upload(context)
         self.matrices_dirty = False
 
+    def dynamic_offsets(self):
+        '''Return the dynamic offsets of the uniform descriptor
+
+        *Returns:*
+
+        `list` of offsets to give to `bind_descriptor_sets`
+        '''
+        if self.uniformblock:
+            return [self.uniformblock.offset]
+        return []
+
+    def push_matrices(self, cmd):
+        '''Record the combined matrix in push constants if enabled
+
+        *Parameters:*
+
+        - `cmd`: `CommandBufferRegister`
+        '''
+        if self.push_constants:
+            cmd.push_constants(self.pipelinelayout, vc.ShaderStage.VERTEX, 0,
+                               self.combined_matrix.values)
+
     def update_transform(self, matrix):
         '''Update the transfrom matrix with `matrix`
 
@@ -365,8 +495,9 @@ class BlockBatch(BaseBatch):
     """
 
     def __init__(self, context, size=1000, shaderprogram=None,
-                 out_view=None):
-        super().__init__(context, size, shaderprogram, out_view)
+                 out_view=None, push_constants=False):
+        super().__init__(context, size, shaderprogram, out_view,
+                         push_constants)
 
         # Init rendering attributes
         self.descriptorsets = self.init_descriptorsets(context)
@@ -403,29 +534,38 @@ class BlockBatch(BaseBatch):
         return me.Mesh(context, size * 4, size * 6, vertex_attributes)
 
     def init_descriptorpool(self, context):
+        # Nothing to bind with push constants
+        if self.push_constants:
+            return None
+
         # Only 1 uniform buffer
         size = 1
         pool_sizes = [vo.DescriptorPoolSize(
-            vc.DescriptorType.UNIFORM_BUFFER, size)]
+            vc.DescriptorType.UNIFORM_BUFFER_DYNAMIC, size)]
         return vo.DescriptorPool(context, pool_sizes, size)
 
     def init_descriptorlayout(self, context):
+        if self.push_constants:
+            return None
+
         ubo_descriptor = vo.DescriptorSetLayoutBinding(
-            0, vc.DescriptorType.UNIFORM_BUFFER, 1,
+            0, vc.DescriptorType.UNIFORM_BUFFER_DYNAMIC, 1,
             vc.ShaderStage.VERTEX, None)
         bindings = [ubo_descriptor]
         return vo.DescriptorSetLayout(context, bindings)
 
     def init_descriptorsets(self, context):
         """Create the descriptor set (for mat4)"""
+        if self.push_constants:
+            return []
+
         descriptorsets = self.descriptorpool.allocate_descriptorsets(
             context, 1, [self.descriptorlayout])
 
         descriptorub_info = vo.DescriptorBufferInfo(
-            self.uniformblock.uniform_buffer.final_buffer, 0,
-            self.uniformblock.size)
+            self.uniformblock.buffer, 0, self.uniformblock.size)
         descriptorub_write = vo.WriteDescriptorSet(
-            descriptorsets[0], 0, 0, vc.DescriptorType.UNIFORM_BUFFER,
+            descriptorsets[0], 0, 0, vc.DescriptorType.UNIFORM_BUFFER_DYNAMIC,
             [descriptorub_info])
 
         vo.update_descriptorsets(context, [descriptorub_write], [])
@@ -439,7 +579,9 @@ class BlockBatch(BaseBatch):
 
         - `context`: `VulkContext`
         '''
-        vs = path.join(PATH_VULK_SHADER, "block.vs.glsl")
+        vs_name = "block.push.vs.glsl" if self.push_constants \
+            else "block.vs.glsl"
+        vs = path.join(PATH_VULK_SHADER, vs_name)
         fs = path.join(PATH_VULK_SHADER, "block.fs.glsl")
 
         shaders_mapping = {
@@ -449,6 +591,7 @@ class BlockBatch(BaseBatch):
 
         return vo.ShaderProgramGlslFile(context, shaders_mapping)
 
+    @profile.profiled('BlockBatch.flush')
     def flush(self):
         '''Flush all draws to graphic card.
         Currently, `flush` register and submit command.
@@ -463,6 +606,12 @@ class BlockBatch(BaseBatch):
         if not self.drawing:
             raise Exception("Not currently drawing")
 
+        # No swapchain image to render into, the frame is skipped
+        framebuffer = self.get_framebuffer(self.context)
+        if not framebuffer:
+            self.idx = 0
+            return
+
         # Upload mesh data
         self.mesh.upload(self.context)
 
@@ -471,20 +620,23 @@ class BlockBatch(BaseBatch):
         indices_count = int(blocks_in_batch) * 6
 
         # Register commands
-        with self.cbpool.pull() as cmd:
-            width = self.context.width
-            height = self.context.height
+        with self.cbpool.pull() as cmd, \
+                cmd.profile(self.context.gpu_profiler, self.profile_name):
+            width, height = self.get_render_size(self.context)
             cmd.begin_renderpass(
-                self.renderpass,
-                self.framebuffer,
+                self.get_renderpass(),
+                framebuffer,
                 vo.Rect2D(vo.Offset2D(0, 0),
                           vo.Extent2D(width, height)),
                 []
             )
             cmd.bind_pipeline(self.pipeline)
+            self.push_matrices(cmd)
             self.mesh.bind(cmd)
-            cmd.bind_descriptor_sets(self.pipelinelayout, 0,
-                                     self.descriptorsets, [])
+            if self.descriptorsets:
+                cmd.bind_descriptor_sets(self.pipelinelayout, 0,
+                                         self.descriptorsets,
+                                         self.dynamic_offsets())
             self.mesh.draw(cmd, 0, indices_count)
             cmd.end_renderpass()
 
@@ -599,8 +751,9 @@ class SpriteBatch(BaseBatch):
     '''
 
     def __init__(self, context, size=1000, shaderprogram=None,
-                 out_view=None):
-        super().__init__(context, size, shaderprogram, out_view)
+                 out_view=None, push_constants=False):
+        super().__init__(context, size, shaderprogram, out_view,
+                         push_constants)
 
         self.dspool = self.init_dspool()
         self.last_texture = None
@@ -632,28 +785,31 @@ class SpriteBatch(BaseBatch):
         - `context`: `VulkContext`
         '''
         size = 8
-        type_uniform = vc.DescriptorType.UNIFORM_BUFFER
+        type_uniform = vc.DescriptorType.UNIFORM_BUFFER_DYNAMIC
         type_sampler = vc.DescriptorType.COMBINED_IMAGE_SAMPLER
-        pool_sizes = [
-            vo.DescriptorPoolSize(type_uniform, size),
-            vo.DescriptorPoolSize(type_sampler, size)
-        ]
+        pool_sizes = [vo.DescriptorPoolSize(type_sampler, size)]
+        if not self.push_constants:
+            pool_sizes.append(vo.DescriptorPoolSize(type_uniform, size))
         return vo.DescriptorPool(context, pool_sizes, size)
 
     def init_descriptorlayout(self, context):
         '''Initialize descriptor layout for one uniform and one texture
 
+        The uniform is not present with push constants.
+
         *Parameters:*
 
         - `context`: `VulkContext`
         '''
-        ubo_descriptor = vo.DescriptorSetLayoutBinding(
-            0, vc.DescriptorType.UNIFORM_BUFFER, 1,
-            vc.ShaderStage.VERTEX, None)
         texture_descriptor = vo.DescriptorSetLayoutBinding(
             1, vc.DescriptorType.COMBINED_IMAGE_SAMPLER, 1,
             vc.ShaderStage.FRAGMENT, None)
-        layout_bindings = [ubo_descriptor, texture_descriptor]
+        layout_bindings = [texture_descriptor]
+        if not self.push_constants:
+            ubo_descriptor = vo.DescriptorSetLayoutBinding(
+                0, vc.DescriptorType.UNIFORM_BUFFER_DYNAMIC, 1,
+                vc.ShaderStage.VERTEX, None)
+            layout_bindings.insert(0, ubo_descriptor)
         return vo.DescriptorSetLayout(context, layout_bindings)
 
     def init_dspool(self):
@@ -667,7 +823,9 @@ class SpriteBatch(BaseBatch):
 
         - `context`: `VulkContext`
         '''
-        vs = path.join(PATH_VULK_SHADER, "spritebatch.vs.glsl")
+        vs_name = "spritebatch.push.vs.glsl" if self.push_constants \
+            else "spritebatch.vs.glsl"
+        vs = path.join(PATH_VULK_SHADER, vs_name)
         fs = path.join(PATH_VULK_SHADER, "spritebatch.fs.glsl")
 
         shaders_mapping = {
@@ -687,22 +845,22 @@ class SpriteBatch(BaseBatch):
         '''
         descriptorset = self.dspool.pull(context)
 
-        descriptorub_info = vo.DescriptorBufferInfo(
-            self.uniformblock.uniform_buffer.final_buffer, 0,
-            self.uniformblock.size)
-        descriptorub_write = vo.WriteDescriptorSet(
-            descriptorset, 0, 0, vc.DescriptorType.UNIFORM_BUFFER,
-            [descriptorub_info])
-
         descriptorimage_info = vo.DescriptorImageInfo(
             texture.sampler, texture.view,
             vc.ImageLayout.SHADER_READ_ONLY_OPTIMAL)
         descriptorimage_write = vo.WriteDescriptorSet(
             descriptorset, 1, 0, vc.DescriptorType.COMBINED_IMAGE_SAMPLER,
             [descriptorimage_info])
+        writes = [descriptorimage_write]
 
-        vo.update_descriptorsets(
-            context, [descriptorub_write, descriptorimage_write], [])
+        if self.uniformblock:
+            descriptorub_info = vo.DescriptorBufferInfo(
+                self.uniformblock.buffer, 0, self.uniformblock.size)
+            writes.append(vo.WriteDescriptorSet(
+                descriptorset, 0, 0, vc.DescriptorType.UNIFORM_BUFFER_DYNAMIC,
+                [descriptorub_info]))
+
+        vo.update_descriptorsets(context, writes, [])
 
         return descriptorset
 
@@ -712,6 +870,7 @@ class SpriteBatch(BaseBatch):
 
         return semaphore
 
+    @profile.profiled('SpriteBatch.flush')
     def flush(self):
         """Flush all draws to graphic card
 
@@ -726,6 +885,12 @@ class SpriteBatch(BaseBatch):
         if not self.drawing:
             raise Exception("Not currently drawing")
 
+        # No swapchain image to render into, the frame is skipped
+        framebuffer = self.get_framebuffer(self.context)
+        if not framebuffer:
+            self.idx = 0
+            return
+
         # Upload mesh data
         self.mesh.upload(self.context)
 
@@ -737,20 +902,22 @@ class SpriteBatch(BaseBatch):
         indices_count = int(sprites_in_batch) * 6
 
         # Register commands
-        with self.cbpool.pull() as cmd:
-            width = self.context.width
-            height = self.context.height
+        with self.cbpool.pull() as cmd, \
+                cmd.profile(self.context.gpu_profiler, self.profile_name):
+            width, height = self.get_render_size(self.context)
             cmd.begin_renderpass(
-                self.renderpass,
-                self.framebuffer,
+                self.get_renderpass(),
+                framebuffer,
                 vo.Rect2D(vo.Offset2D(0, 0),
                           vo.Extent2D(width, height)),
                 []
             )
             cmd.bind_pipeline(self.pipeline)
+            self.push_matrices(cmd)
             self.mesh.bind(cmd)
             cmd.bind_descriptor_sets(self.pipelinelayout, 0,
-                                     [descriptorset], [])
+                                     [descriptorset],
+                                     self.dynamic_offsets())
             self.mesh.draw(cmd, 0, indices_count)
             cmd.end_renderpass()
 
@@ -876,8 +1043,9 @@ class SpriteBatch(BaseBatch):
 class CharBatch(SpriteBatch):
     """CharBatch allows to batch chars into minimum of draw calls."""
     def __init__(self, context, size=1000, shaderprogram=None,
-                 out_view=None):
-        super().__init__(context, size, shaderprogram, out_view)
+                 out_view=None, push_constants=False):
+        super().__init__(context, size, shaderprogram, out_view,
+                         push_constants)
 
         self.dspool = self.init_dspool()
         self.last_texture = None
@@ -889,7 +1057,9 @@ class CharBatch(SpriteBatch):
 
         - `context`: `VulkContext`
         '''
-        vs = path.join(PATH_VULK_SHADER, "distancefieldfont.vs.glsl")
+        vs_name = "distancefieldfont.push.vs.glsl" if self.push_constants \
+            else "distancefieldfont.vs.glsl"
+        vs = path.join(PATH_VULK_SHADER, vs_name)
         fs = path.join(PATH_VULK_SHADER, "distancefieldfont.fs.glsl")
 
         shaders_mapping = {
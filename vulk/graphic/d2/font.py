@@ -14,6 +14,7 @@ class FontData():
     def __init__(self, context, filepath):
         self.filepath = Path(filepath)
         self.raw_data = FontData.load_bmfont(filepath)
+        self.page_handles = []
         self.pages = self._init_pages(context)
         self.regions = self._init_regions()
         self.chars = self._init_chars()
@@ -23,6 +24,9 @@ class FontData():
     def _init_pages(self, context):
         """Create Texture for each page
 
+        Pages are loaded through the context asset manager so that fonts
+        sharing the same page file share the same texture.
+
         Args:
             context (VulkContext): Vulk context
 
@@ -32,7 +36,13 @@ class FontData():
         res = {}
         dirpath = self.filepath.parent
         for p in self.raw_data['page']:
-            res[p['id']] = HighQualityTexture(context, dirpath / p['file'])
+            path_file = dirpath / p['file']
+            if context.assets:
+                handle = context.assets.load(path_file, HighQualityTexture)
+                self.page_handles.append(handle)
+                res[p['id']] = handle.asset
+            else:
+                res[p['id']] = HighQualityTexture(context, path_file)
 
         return res
 
@@ -81,6 +91,16 @@ class FontData():
 
         return res
 
+    def destroy(self, context):
+        """Release the pages of this FontData
+
+        Args:
+            context (VulkContext): Vulk context
+        """
+        for handle in self.page_handles:
+            handle.release()
+        self.page_handles = []
+
     def get_region(self, char):
         """Get texture region of char in this FontData
 
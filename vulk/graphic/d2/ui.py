@@ -31,14 +31,25 @@ class RenderHandler():
         if self.texture.width != width or self.texture.height != height:
             return
 
-        if self.loaded:
-            self.texture.bitmap = np.frombuffer(
-                paint_buffer.GetString(mode="rgba", origin="top-left"),
-                dtype=np.uint8
-            )
+        if not self.loaded:
+            return
+
+        pixels = np.frombuffer(
+            paint_buffer.GetString(mode="rgba", origin="top-left"),
+            dtype=np.uint8
+        )
+
+        # Upload the whole page once, then only the dirty rectangles
+        if not self.texture_ready:
+            self.texture.bitmap = pixels
             self.texture.upload_buffer(self.context, 0)
             self.texture.upload(self.context)
             self.texture_ready = True
+        else:
+            pixels = pixels.reshape(height, width, 4)
+            for x, y, w, h in dirty_rects:
+                self.texture.update_region(self.context, x, y, w, h,
+                                           pixels[y:y + h, x:x + w])
 
     def OnLoadingStateChange(self, browser, is_loading, **_):
         if not is_loading:
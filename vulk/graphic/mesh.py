@@ -1,6 +1,7 @@
 '''This module contains mesh'''
 import numpy as np
 
+from vulk import profile
 import vulk.vulkanconstant as vc
 import vulk.vulkanobject as vo
 
@@ -179,6 +180,7 @@ class Mesh():
                       self.vertices_array.view(dtype=np.uint8),
                       casting='no')
 
+    @profile.profiled('Mesh.upload')
     def upload(self, context):
         '''
         Upload vertices and indices to graphic card
@@ -0,0 +1,751 @@
+'''Render graph module
+
+A `RenderGraph` is made of passes declaring the images they read and the
+image they write. The graph deduces the execution order, culls the passes
+whose result is never used and synchronizes everything: passes writing
+the same image share a renderpass and a framebuffer, layout transitions
+are inserted only when an image goes from attachment to sampled (and
+back) and semaphores are chained between passes. Transient images are
+taken from a pool and aliased when their lifetimes don't overlap.
+
+The final image of the context is the image named `RenderGraph.FINAL`.
+
+*Exemple:*
+
+```
+graph = RenderGraph(context)
+graph.add_image('scene', scale=0.5)
+graph.add_pass('background', blockbatch, draw_blocks, writes='scene',
+               clear=[0, 0, 0, 1])
+graph.add_pass('compose', spritebatch, lambda batch: batch.draw(
+    graph.get_texture('scene'), 0, 0, context.width, context.height),
+    reads=['scene'])
+context.swap([graph.execute(context)])
+```
+
+Nodes of passes are `SpriteBatch`, `BlockBatch`, `CharBatch` or any
+object with `set_target(context, target)`, `begin(context, semaphores)`
+and `end()` methods.
+'''
+from collections import OrderedDict
+import logging
+
+import vulkan as vk
+
+from vulk.exception import VulkError
+from vulk import vulkanconstant as vc
+from vulk import vulkanobject as vo
+
+logger = logging.getLogger()
+
+# Layout states of graph images
+ATTACHMENT = 0
+SAMPLED = 1
+
+
+def create_renderpass(context, image_format):
+    '''Create a renderpass drawing in a color image kept in
+    `COLOR_ATTACHMENT_OPTIMAL` layout
+
+    It's compatible with the renderpasses of the 2D batches.
+
+    *Parameters:*
+
+    - `context`: `VulkContext`
+    - `image_format`: `Format` vulk constant
+    '''
+    attachment = vo.AttachmentDescription(
+        image_format, vc.SampleCount.COUNT_1,
+        vc.AttachmentLoadOp.LOAD, vc.AttachmentStoreOp.STORE,
+        vc.AttachmentLoadOp.DONT_CARE,
+        vc.AttachmentStoreOp.DONT_CARE,
+        vc.ImageLayout.COLOR_ATTACHMENT_OPTIMAL,
+        vc.ImageLayout.COLOR_ATTACHMENT_OPTIMAL)
+    subpass = vo.SubpassDescription([vo.AttachmentReference(
+        0, vc.ImageLayout.COLOR_ATTACHMENT_OPTIMAL)],
+        [], [], [], [])
+    dependency = vo.SubpassDependency(
+        vc.SUBPASS_EXTERNAL,
+        vc.PipelineStage.COLOR_ATTACHMENT_OUTPUT, vc.Access.NONE, 0,
+        vc.PipelineStage.COLOR_ATTACHMENT_OUTPUT,
+        vc.Access.COLOR_ATTACHMENT_READ | vc.Access.COLOR_ATTACHMENT_WRITE
+    )
+    return vo.Renderpass(context, [attachment], [subpass], [dependency])
+
+
+class TransientImage():
+    '''Color image owned by a `TransientImagePool`
+
+    It's created in `COLOR_ATTACHMENT_OPTIMAL` layout and can be sampled.
+    '''
+
+    def __init__(self, context, width, height, image_format):
+        '''
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        - `width`: Width in pixels
+        - `height`: Height in pixels
+        - `image_format`: `Format` vulk constant
+        '''
+        usage = vc.ImageUsage.COLOR_ATTACHMENT | vc.ImageUsage.SAMPLED | vc.ImageUsage.TRANSFER_DST  # noqa
+        self.image = vo.Image(
+            context, vc.ImageType.TYPE_2D, image_format, width, height, 1, 1,
+            1, vc.SampleCount.COUNT_1, vc.SharingMode.EXCLUSIVE, [],
+            vc.ImageLayout.UNDEFINED, vc.ImageTiling.OPTIMAL, usage,
+            vc.VmaMemoryUsage.GPU_ONLY
+        )
+
+        with vo.immediate_buffer(context) as cmd:
+            self.image.update_layout(
+                cmd, vc.ImageLayout.UNDEFINED,
+                vc.ImageLayout.COLOR_ATTACHMENT_OPTIMAL,
+                vc.PipelineStage.TOP_OF_PIPE,
+                vc.PipelineStage.COLOR_ATTACHMENT_OUTPUT,
+                vc.Access.NONE, vc.Access.COLOR_ATTACHMENT_WRITE
+            )
+
+        subresource_range = vo.ImageSubresourceRange(
+            vc.ImageAspect.COLOR, 0, 1, 0, 1)
+        self.view = vo.ImageView(
+            context, self.image, vc.ImageViewType.TYPE_2D, image_format,
+            subresource_range)
+        self.key = (width, height, image_format)
+
+    def destroy(self, context):
+        '''Destroy the image
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        self.view.destroy(context)
+        self.image.destroy(context)
+
+
+class TransientImagePool():
+    '''Pool of `TransientImage` shared by several compilations of a graph
+
+    Images are taken with `pull` and given back with `push`. Images not
+    used by the last compilation are destroyed by `trim`.
+    '''
+
+    def __init__(self):
+        # Free images by key (width, height, format)
+        self.free = {}
+        self.images = []
+        self.used = set()
+
+    def pull(self, context, width, height, image_format):
+        '''Return a free image, create it if needed
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        - `width`: Width in pixels
+        - `height`: Height in pixels
+        - `image_format`: `Format` vulk constant
+
+        *Returns:*
+
+        `TransientImage`
+        '''
+        key = (width, height, image_format)
+        free = self.free.setdefault(key, [])
+        if free:
+            image = free.pop()
+        else:
+            image = TransientImage(context, width, height, image_format)
+            self.images.append(image)
+        self.used.add(image)
+        return image
+
+    def push(self, image):
+        '''Give back an image, it can be aliased by the next `pull`
+
+        *Parameters:*
+
+        - `image`: `TransientImage`
+        '''
+        self.free.setdefault(image.key, []).append(image)
+
+    def reset(self):
+        '''Make all images free, called before a new compilation'''
+        self.free = {}
+        for image in self.images:
+            self.free.setdefault(image.key, []).append(image)
+        self.used = set()
+
+    def trim(self, context):
+        '''Destroy images unused since the last `reset`
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        unused = [i for i in self.images if i not in self.used]
+        for image in unused:
+            image.destroy(context)
+        self.images = [i for i in self.images if i in self.used]
+        self.free = {k: [i for i in v if i in self.used]
+                     for k, v in self.free.items()}
+
+    def destroy(self, context):
+        '''Destroy all images
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        for image in self.images:
+            image.destroy(context)
+        self.images = []
+        self.free = {}
+        self.used = set()
+
+
+class GraphImage():
+    '''Image declared in a `RenderGraph`
+
+    It can be drawn by a `SpriteBatch` like a texture once a pass wrote it.
+    '''
+
+    def __init__(self, name, scale=1, width=0, height=0, image_format=None):
+        '''
+        *Parameters:*
+
+        - `name`: Name of the image in the graph
+        - `scale`: Scale of the final image size
+        - `width`: Width in pixels, overrides `scale`
+        - `height`: Height in pixels, overrides `scale`
+        - `image_format`: `Format` vulk constant, format of the final
+                          image if `None`
+        '''
+        self.name = name
+        self.scale = scale
+        self.requested_width = width
+        self.requested_height = height
+        self.requested_format = image_format
+        # Set at compilation
+        self.transient = None
+        self.sampler = None
+        self.width = 0
+        self.height = 0
+        self.format = None
+
+    @property
+    def image(self):
+        '''Physical `Image`'''
+        return self.transient.image
+
+    @property
+    def view(self):
+        '''Physical `ImageView`'''
+        return self.transient.view
+
+    def resolve(self, context):
+        '''Compute size and format from the context
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        self.width = self.requested_width or \
+            max(1, int(context.render_width * self.scale))
+        self.height = self.requested_height or \
+            max(1, int(context.render_height * self.scale))
+        self.format = self.requested_format or \
+            vc.Format(context.swapchain_format)
+
+
+class RenderTarget():
+    '''Renderpass and framebuffers shared by the passes writing an image'''
+
+    def __init__(self, context, views, image_format, width, height):
+        '''
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        - `views`: `list` of `ImageView`, one per swapchain image in direct
+                   mode, else only one
+        - `image_format`: `Format` vulk constant
+        - `width`: Width in pixels
+        - `height`: Height in pixels
+        '''
+        self.format = image_format
+        self.width = width
+        self.height = height
+        self.renderpass = create_renderpass(context, image_format)
+        self.framebuffers = [
+            vo.Framebuffer(context, self.renderpass, [view], width, height, 1)
+            for view in views]
+
+    def get_framebuffer(self, context):
+        '''Return the framebuffer of the image to render into
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+
+        *Returns:*
+
+        `Framebuffer` or `None` if the swapchain image can't be acquired
+        '''
+        if len(self.framebuffers) == 1:
+            return self.framebuffers[0]
+
+        index = context.acquire()
+        if index is None:
+            return None
+        return self.framebuffers[index]
+
+    def destroy(self, context):
+        '''Destroy renderpass and framebuffers
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        for framebuffer in self.framebuffers:
+            framebuffer.destroy(context)
+        self.renderpass.destroy(context)
+
+
+class GraphPass():
+    '''Pass declared in a `RenderGraph`'''
+
+    def __init__(self, name, node, draw, writes, reads, clear):
+        '''
+        *Parameters:*
+
+        - `name`: Name of the pass
+        - `node`: Batch recording the draws
+        - `draw`: Function called with `node` between `begin` and `end`
+        - `writes`: Name of the written image
+        - `reads`: `list` of names of sampled images
+        - `clear`: `list` of 4 `float` (rgba) or `None`
+        '''
+        self.name = name
+        self.node = node
+        self.draw = draw
+        self.writes = writes
+        self.reads = list(reads)
+        self.clear = clear
+
+
+class RenderGraph():
+    '''Order, synchronize and execute passes
+
+    The graph is compiled at the first `execute` and again when the
+    context is reloaded or when passes or images are added.
+    '''
+    FINAL = 'final'
+
+    def __init__(self, context):
+        '''
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        self.images = OrderedDict()
+        self.passes = OrderedDict()
+        self.pool = TransientImagePool()
+        self.sampler = context.sampler_cache.get(
+            context, vc.Filter.LINEAR, vc.Filter.LINEAR,
+            vc.SamplerMipmapMode.NEAREST,
+            vc.SamplerAddressMode.CLAMP_TO_EDGE,
+            vc.SamplerAddressMode.CLAMP_TO_EDGE,
+            vc.SamplerAddressMode.CLAMP_TO_EDGE, 0, False, 1, False,
+            vc.CompareOp.ALWAYS, 0, 0, vc.BorderColor.INT_OPAQUE_BLACK,
+            False)
+        self.commandpool = vo.CommandPool(
+            context, context.queue_family_indices['graphic'],
+            vc.CommandPoolCreate.RESET_COMMAND_BUFFER)
+        # Compiled passes in execution order
+        self.order = []
+        # Steps: (pass, barriers, commandbuffer, semaphore)
+        self.steps = []
+        self.final_step = None
+        self.targets = {}
+        self.dirty = True
+        self.reload_count = None
+
+    def add_image(self, name, scale=1, width=0, height=0, image_format=None):
+        '''Declare a transient image
+
+        *Parameters:*
+
+        - `name`: Name of the image
+        - `scale`: Scale of the final image size
+        - `width`: Width in pixels, overrides `scale`
+        - `height`: Height in pixels, overrides `scale`
+        - `image_format`: `Format` vulk constant (default: format of the
+                          final image)
+
+        *Returns:*
+
+        `GraphImage`
+        '''
+        if name == RenderGraph.FINAL or name in self.images:
+            msg = "Image %s already declared" % name
+            logger.error(msg)
+            raise VulkError(msg)
+
+        image = GraphImage(name, scale, width, height, image_format)
+        self.images[name] = image
+        self.dirty = True
+        return image
+
+    def add_pass(self, name, node, draw, writes=FINAL, reads=(),
+                 clear=None):
+        '''Declare a pass
+
+        *Parameters:*
+
+        - `name`: Name of the pass
+        - `node`: Batch recording the draws, it can't be shared by passes
+        - `draw`: Function called with `node` during execution
+        - `writes`: Name of the written image
+        - `reads`: Names of the images sampled by the pass
+        - `clear`: `list` of 4 `float` (rgba), clear `writes` before
+                   the pass
+
+        *Returns:*
+
+        `GraphPass`
+        '''
+        if name in self.passes:
+            msg = "Pass %s already declared" % name
+            logger.error(msg)
+            raise VulkError(msg)
+
+        if any(p.node is node for p in self.passes.values()):
+            msg = "Node of pass %s is already used by another pass" % name
+            logger.error(msg)
+            raise VulkError(msg)
+
+        for image_name in [writes] + list(reads):
+            if image_name != RenderGraph.FINAL and \
+               image_name not in self.images:
+                msg = "Unknown image %s in pass %s" % (image_name, name)
+                logger.error(msg)
+                raise VulkError(msg)
+
+        if RenderGraph.FINAL in reads or writes in reads:
+            msg = "Pass %s can't sample the final image or its own " \
+                  "target" % name
+            logger.error(msg)
+            raise VulkError(msg)
+
+        graph_pass = GraphPass(name, node, draw, writes, reads, clear)
+        self.passes[name] = graph_pass
+        self.dirty = True
+        return graph_pass
+
+    def get_texture(self, name):
+        '''Return the image to give to a `SpriteBatch`
+
+        *Parameters:*
+
+        - `name`: Name of the image
+        '''
+        return self.images[name]
+
+    def sort_passes(self):
+        '''Return used passes in execution order
+
+        A pass reading an image comes after all passes writing it. Passes
+        writing the same image keep their declaration order. Passes whose
+        image is never read (except the final image) are culled.
+
+        *Returns:*
+
+        `list` of `GraphPass`
+        '''
+        passes = list(self.passes.values())
+        dependencies = {p.name: set() for p in passes}
+        for i, graph_pass in enumerate(passes):
+            for other in passes[:i]:
+                if other.writes == graph_pass.writes:
+                    dependencies[graph_pass.name].add(other.name)
+            for other in passes:
+                if other.writes in graph_pass.reads:
+                    dependencies[graph_pass.name].add(other.name)
+
+        # Keep only passes contributing to the final image
+        used = set()
+        stack = [p.name for p in passes if p.writes == RenderGraph.FINAL]
+        while stack:
+            name = stack.pop()
+            if name not in used:
+                used.add(name)
+                stack.extend(dependencies[name])
+
+        for graph_pass in passes:
+            if graph_pass.name not in used:
+                logger.debug("Pass %s culled", graph_pass.name)
+
+        # Topological sort, declaration order when there is a choice
+        order = []
+        done = set()
+        while len(order) < len(used):
+            ready = next((p for p in passes if p.name in used and
+                          p.name not in done and
+                          dependencies[p.name] <= done), None)
+            if not ready:
+                msg = "Cycle in render graph"
+                logger.error(msg)
+                raise VulkError(msg)
+            order.append(ready)
+            done.add(ready.name)
+
+        return order
+
+    def compile(self, context):
+        '''Sort passes, allocate images and prepare synchronization
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        vk.vkDeviceWaitIdle(context.device)
+        self.destroy_compilation(context)
+        self.order = self.sort_passes()
+
+        # Lifetime of each image in the execution order
+        first_use = {}
+        last_use = {}
+        for i, graph_pass in enumerate(self.order):
+            for name in [graph_pass.writes] + graph_pass.reads:
+                first_use.setdefault(name, i)
+                last_use[name] = i
+
+        # Allocate images, aliasing the ones whose lifetimes don't overlap
+        # Culled images keep no transient image from a previous compilation
+        self.pool.reset()
+        for image in self.images.values():
+            image.transient = None
+        for i, graph_pass in enumerate(self.order):
+            for name, image in self.images.items():
+                if first_use.get(name) == i:
+                    image.resolve(context)
+                    image.transient = self.pool.pull(
+                        context, image.width, image.height, image.format)
+                    image.sampler = self.sampler
+            for name, image in self.images.items():
+                if last_use.get(name) == i:
+                    self.pool.push(image.transient)
+        self.pool.trim(context)
+
+        # Renderpass and framebuffers shared by passes writing an image
+        for name in {p.writes for p in self.order}:
+            if name == RenderGraph.FINAL:
+                views = context.swapchain_views if context.direct \
+                    else [context.final_image_view]
+                self.targets[name] = RenderTarget(
+                    context, views, vc.Format(context.swapchain_format),
+                    context.render_width, context.render_height)
+            else:
+                image = self.images[name]
+                self.targets[name] = RenderTarget(
+                    context, [image.view], image.format, image.width,
+                    image.height)
+
+        # Minimal barriers from the layout state of physical images
+        states = {}
+        for graph_pass in self.order:
+            barriers = []
+            for name in graph_pass.reads:
+                key = id(self.images[name].transient)
+                if states.get(key, ATTACHMENT) != SAMPLED:
+                    barriers.append(('sample', name))
+                    states[key] = SAMPLED
+
+            name = graph_pass.writes
+            key = name if name == RenderGraph.FINAL \
+                else id(self.images[name].transient)
+            if states.get(key, ATTACHMENT) == SAMPLED:
+                barriers.append(('attach', name))
+                states[key] = ATTACHMENT
+            if graph_pass.clear:
+                barriers.append(('clear', name))
+
+            self.steps.append(self._create_step(context, graph_pass,
+                                                barriers))
+
+        # Images are given back in attachment layout, once per physical
+        # image even when several images alias it
+        final_barriers = []
+        for image in self.images.values():
+            key = id(image.transient)
+            if image.transient and states.get(key) == SAMPLED:
+                final_barriers.append(('attach', image.name))
+                states[key] = ATTACHMENT
+        if final_barriers:
+            self.final_step = self._create_step(context, None,
+                                                final_barriers)
+
+        for graph_pass in self.order:
+            graph_pass.node.set_target(context,
+                                       self.targets[graph_pass.writes])
+            # GPU profiler scopes are named after passes
+            if hasattr(graph_pass.node, 'profile_name'):
+                graph_pass.node.profile_name = graph_pass.name
+
+        self.dirty = False
+        self.reload_count = context.reload_count
+        logger.debug("Render graph compiled: %s",
+                     ', '.join(p.name for p in self.order))
+
+    def _create_step(self, context, graph_pass, barriers):
+        commandbuffer = None
+        semaphore = None
+        if barriers:
+            commandbuffer = self.commandpool.allocate_buffers(
+                context, vc.CommandBufferLevel.PRIMARY, 1)[0]
+            semaphore = vo.Semaphore(context)
+        return (graph_pass, barriers, commandbuffer, semaphore)
+
+    def _get_image(self, context, name):
+        if name == RenderGraph.FINAL:
+            return context.final_image
+        return self.images[name].image
+
+    def _record_barriers(self, context, cmd, graph_pass, barriers):
+        '''Record layout transitions and clears of a step'''
+        for operation, name in barriers:
+            image = self._get_image(context, name)
+            if operation == 'sample':
+                image.update_layout(
+                    cmd, vc.ImageLayout.COLOR_ATTACHMENT_OPTIMAL,
+                    vc.ImageLayout.SHADER_READ_ONLY_OPTIMAL,
+                    vc.PipelineStage.COLOR_ATTACHMENT_OUTPUT,
+                    vc.PipelineStage.FRAGMENT_SHADER,
+                    vc.Access.COLOR_ATTACHMENT_WRITE,
+                    vc.Access.SHADER_READ
+                )
+            elif operation == 'attach':
+                image.update_layout(
+                    cmd, vc.ImageLayout.SHADER_READ_ONLY_OPTIMAL,
+                    vc.ImageLayout.COLOR_ATTACHMENT_OPTIMAL,
+                    vc.PipelineStage.FRAGMENT_SHADER,
+                    vc.PipelineStage.COLOR_ATTACHMENT_OUTPUT,
+                    vc.Access.SHADER_READ,
+                    vc.Access.COLOR_ATTACHMENT_READ | vc.Access.COLOR_ATTACHMENT_WRITE # noqa
+                )
+            elif operation == 'clear':
+                clear_color = vo.ClearColorValue(float32=graph_pass.clear)
+                ranges = [vo.ImageSubresourceRange(
+                    vc.ImageAspect.COLOR, 0, 1, 0, 1)]
+                image.update_layout(
+                    cmd, vc.ImageLayout.COLOR_ATTACHMENT_OPTIMAL,
+                    vc.ImageLayout.TRANSFER_DST_OPTIMAL,
+                    vc.PipelineStage.COLOR_ATTACHMENT_OUTPUT,
+                    vc.PipelineStage.TRANSFER,
+                    vc.Access.COLOR_ATTACHMENT_WRITE,
+                    vc.Access.TRANSFER_WRITE
+                )
+                cmd.clear_color_image(
+                    image, vc.ImageLayout.TRANSFER_DST_OPTIMAL,
+                    clear_color, ranges)
+                image.update_layout(
+                    cmd, vc.ImageLayout.TRANSFER_DST_OPTIMAL,
+                    vc.ImageLayout.COLOR_ATTACHMENT_OPTIMAL,
+                    vc.PipelineStage.TRANSFER,
+                    vc.PipelineStage.COLOR_ATTACHMENT_OUTPUT,
+                    vc.Access.TRANSFER_WRITE,
+                    vc.Access.COLOR_ATTACHMENT_READ | vc.Access.COLOR_ATTACHMENT_WRITE # noqa
+                )
+
+    def _submit_step(self, context, step, semaphores):
+        '''Record and submit the barriers of a step
+
+        *Returns:*
+
+        `list` of `Semaphore` to wait on for the next step
+        '''
+        graph_pass, barriers, commandbuffer, semaphore = step
+        if not barriers:
+            return semaphores
+
+        commandbuffer.reset()
+        with commandbuffer.bind(vc.CommandBufferUsage.ONE_TIME_SUBMIT) as cmd:
+            self._record_barriers(context, cmd, graph_pass, barriers)
+
+        wait_stages = [vc.PipelineStage.ALL_COMMANDS] * len(semaphores)
+        submit = vo.SubmitInfo(semaphores, wait_stages, [semaphore],
+                               [commandbuffer])
+        vo.submit_to_graphic_queue(context, [submit])
+        return [semaphore]
+
+    def execute(self, context, semaphores=None):
+        '''Execute all passes
+
+        Passes are executed one after the other, each one waiting on the
+        previous one.
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        - `semaphores`: `list` of `Semaphore` to wait on before the first
+                        pass
+
+        *Returns:*
+
+        `Semaphore` signaled when all passes are done, to give to
+        `VulkContext.swap`
+        '''
+        if self.dirty or self.reload_count != context.reload_count:
+            self.compile(context)
+
+        semaphores = [s for s in semaphores or [] if s]
+        for step in self.steps:
+            semaphores = self._submit_step(context, step, semaphores)
+            graph_pass = step[0]
+            graph_pass.node.begin(context, semaphores)
+            graph_pass.draw(graph_pass.node)
+            semaphore = graph_pass.node.end()
+            if semaphore:
+                semaphores = [semaphore]
+
+        if self.final_step:
+            semaphores = self._submit_step(context, self.final_step,
+                                           semaphores)
+
+        return semaphores[0] if semaphores else None
+
+    def destroy_compilation(self, context):
+        '''Destroy targets and synchronization objects of the last
+        compilation
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        steps = self.steps + ([self.final_step] if self.final_step else [])
+        for _, _, commandbuffer, semaphore in steps:
+            if commandbuffer:
+                self.commandpool.free_buffers(context, [commandbuffer])
+                semaphore.destroy(context)
+        for target in self.targets.values():
+            target.destroy(context)
+        self.steps = []
+        self.final_step = None
+        self.targets = {}
+
+    def destroy(self, context):
+        '''Destroy the graph, nodes are not destroyed
+
+        Nodes are detached from the graph, so it must be called before
+        destroying them.
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        for graph_pass in self.passes.values():
+            graph_pass.node.set_target(context, None)
+        self.destroy_compilation(context)
+        self.pool.destroy(context)
+        self.commandpool.destroy(context)
+        context.sampler_cache.release(context, self.sampler)
@@ -1,13 +1,164 @@
 '''
 This module allows to load texture and to sample from it
 '''
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack
+import hashlib
+import logging
+import mmap
+import os
+import queue
+import struct
+
 import numpy as np
 from vulkbare import load_image, resize_image
 
 from vulk import vulkanobject as vo
 from vulk import vulkanconstant as vc
+from vulk.exception import VulkError
 from vulk.util import mipmap_size, mipmap_levels
 
+logger = logging.getLogger()
+
+# Under this number of destination pixels, a mip level is filtered
+# on the calling thread, splitting the work would cost more than it saves
+MIPMAP_PARALLEL_THRESHOLD = 256 * 256
+_mipmap_executor = None
+
+# Atlas manifest written by `vulk.tools.atlas` (little endian). It contains
+# the header followed by the regions, each region is made of its name
+# (length then utf-8 bytes) and its rectangle.
+ATLAS_MAGIC = b'VATL'
+ATLAS_VERSION = 1
+# magic, version, format, page width, page height, mip levels, pages, regions
+ATLAS_HEADER = struct.Struct('<4sHIHHHHI')
+ATLAS_NAME = struct.Struct('<H')
+# page, x, y, width, height, u, v, u2, v2
+ATLAS_REGION = struct.Struct('<HHHHH4f')
+
+
+def _get_mipmap_executor():
+    '''Return the thread pool shared by all mipmap generations'''
+    global _mipmap_executor  # pylint: disable=global-statement
+    if not _mipmap_executor:
+        _mipmap_executor = ThreadPoolExecutor(
+            max_workers=os.cpu_count() or 1,
+            thread_name_prefix='vulk-mipmap')
+    return _mipmap_executor
+
+
+def _halve_rows(src, dst, out, start, stop):
+    """Box filter rows `start` to `stop` of `dst` from `src`
+
+    Each destination texel is the average of a 2x2 block of the source.
+    When a source dimension is odd, the last row (or column) is folded
+    into the last destination row (or column) which then averages 3
+    texels on that axis. A dimension of 1 is kept as is.
+
+    Args:
+        src (ndarray): Source level of shape (height, width, components)
+        dst (ndarray): Float32 destination of shape
+                       (height, width, components)
+        out (ndarray): Uint8 view receiving the rounded result (can be None)
+        start (int): First destination row
+        stop (int): Last destination row (excluded)
+    """
+    src_height, src_width = src.shape[:2]
+    dst_height, dst_width = dst.shape[:2]
+
+    # Vertical pass, work on float32 only for the needed rows
+    if src_height > 1:
+        rows = src[2 * start:2 * stop].astype(np.float32)
+        acc = rows[0::2] + rows[1::2]
+        weights_y = np.full(stop - start, 2, dtype=np.float32)
+        if src_height % 2 and stop == dst_height:
+            acc[-1] += src[-1]
+            weights_y[-1] = 3
+    else:
+        acc = src[start:stop].astype(np.float32)
+        weights_y = np.ones(stop - start, dtype=np.float32)
+
+    # Horizontal pass
+    if src_width > 1:
+        result = acc[:, 0:2 * dst_width:2] + acc[:, 1:2 * dst_width:2]
+        weights_x = np.full(dst_width, 2, dtype=np.float32)
+        if src_width % 2:
+            result[:, -1] += acc[:, -1]
+            weights_x[-1] = 3
+    else:
+        result = acc
+        weights_x = np.ones(1, dtype=np.float32)
+
+    weights = weights_y[:, None, None] * weights_x[None, :, None]
+    np.divide(result, weights, out=dst[start:stop])
+
+    if out is not None:
+        np.copyto(out[start:stop], dst[start:stop] + 0.5, casting='unsafe')
+
+
+def mipmap_pyramid(bitmap, width, height, components, mip_levels,
+                   outputs=None, executor=None):
+    """Generate mipmaps by successive halving
+
+    Each level is box filtered from the previous one and not from the base
+    image, the whole pyramid costs about a third of the base level.
+    Odd dimensions are handled without dropping any source texel (see
+    `_halve_rows`). Rows of big levels are filtered in parallel, NumPy
+    releases the GIL during the computation.
+
+    Args:
+        bitmap (buffer): Base level pixels (uint8)
+        width (int): Base level width
+        height (int): Base level height
+        components (int): Number of components per pixel (1 to 4)
+        mip_levels (int): Number of levels, base level included
+        outputs (list): Writable buffers receiving levels 1 to
+                        `mip_levels - 1`, typically the mapped staging
+                        buffers (optional)
+        executor (Executor): Pool used to filter rows in parallel (default
+                             to a shared pool)
+
+    Returns:
+        list[ndarray]: Uint8 levels, level 1 first (views on `outputs`
+                       when given)
+    """
+    if components < 1 or components > 4:
+        raise ValueError("components must be between 1 and 4")
+
+    if outputs is not None and len(outputs) != mip_levels - 1:
+        raise ValueError("outputs must contain one buffer per mip level")
+
+    executor = executor or _get_mipmap_executor()
+    src = np.frombuffer(bitmap, dtype=np.uint8, count=width * height *
+                        components).reshape(height, width, components)
+    levels = []
+
+    for mip_level in range(1, mip_levels):
+        w, h = mipmap_size(width, height, mip_level)
+        dst = np.empty((h, w, components), dtype=np.float32)
+
+        if outputs is not None:
+            out = np.frombuffer(outputs[mip_level - 1], dtype=np.uint8,
+                                count=w * h * components)
+            out = out.reshape(h, w, components)
+        else:
+            out = np.empty((h, w, components), dtype=np.uint8)
+
+        if w * h < MIPMAP_PARALLEL_THRESHOLD or h == 1:
+            _halve_rows(src, dst, out, 0, h)
+        else:
+            chunk = max(1, h // (os.cpu_count() or 1))
+            futures = [executor.submit(_halve_rows, src, dst, out, start,
+                                       min(start + chunk, h))
+                       for start in range(0, h, chunk)]
+            for future in futures:
+                future.result()
+
+        levels.append(out)
+        src = dst
+
+    return levels
+
 
 class RawTexture():
     """A Raw texture is not initialized with an image file but can be filled
@@ -79,6 +230,8 @@ class RawTexture():
         By default, sampler is configured for the best performance.
         If you want better quality, you must enable manually bilinear,
         trilinear or anisotropic filtering.
+        Samplers are shared between textures through the sampler cache of
+        the context.
 
         Args:
             context (VulkContext): Context
@@ -91,22 +244,113 @@ class RawTexture():
             anisotropy_enable (bool): Whether to enable anisotropy
             max_anisotropy (int): Anisotropy value clamp
         """
-        if self.sampler:
-            self.sampler.destroy(context)
-
-        self.sampler = vo.Sampler(
+        self.release_sampler(context)
+        self.sampler = context.sampler_cache.get(
             context, mag_filter, min_filter, mipmap_mode,
             address_mode_u, address_mode_v, address_mode_w, 0,
             anisotropy_enable, max_anisotropy, False, vc.CompareOp.ALWAYS,
             0, 0, vc.BorderColor.INT_OPAQUE_BLACK, False)
 
-    def upload(self, context):
+    def release_sampler(self, context):
+        """Give back the sampler to the sampler cache
+
+        Args:
+            context (VulkContext)
+        """
+        if self.sampler:
+            context.sampler_cache.release(context, self.sampler)
+            self.sampler = None
+
+    def upload(self, context, release_staging=False, upload_queue=None):
         """Make texture accessible for shader
 
         If this function is not called, the texture can't be used.
         When all your buffers are uploaded, call this function
+
+        Args:
+            context (VulkContext)
+            release_staging (bool): Free the staging memory, the texture
+                                    becomes immutable
+            upload_queue (UploadQueue): Record the upload in this queue
+                                        instead of submitting it (optional)
+
+        Returns:
+            int: Bytes of memory saved by releasing the staging memory
+        """
+        return self.texture.finalize(context, release_staging, upload_queue)
+
+    def update_region(self, context, x, y, width, height, pixels,
+                      mip_level=0):
+        """Update a rectangle of the texture
+
+        Only the rectangle is written in the staging buffer and copied to
+        the image, and only its mip level changes of layout. Use it when a
+        small part of a big texture changes.
+
+        Args:
+            context (VulkContext)
+            x (int): X offset of the rectangle
+            y (int): Y offset of the rectangle
+            width (int): Width of the rectangle
+            height (int): Height of the rectangle
+            pixels (buffer): Pixels of the rectangle, tightly packed buffer
+                             or ndarray of shape (height, width, components)
+            mip_level (int): Mip level to update
+
+        Block compressed formats are not supported since their regions
+        must be aligned on blocks.
         """
-        self.texture.finalize(context)
+        if vc.format_compressed(self.format):
+            msg = "Can't update a region of compressed format %s" % \
+                self.format.name
+            logger.error(msg)
+            raise VulkError(msg)
+
+        level_width, level_height = mipmap_size(self.width, self.height,
+                                                mip_level)
+        if x < 0 or y < 0 or x + width > level_width or \
+           y + height > level_height:
+            msg = "Region (%s, %s, %s, %s) is outside of mip level %s" % (
+                x, y, width, height, mip_level)
+            logger.error(msg)
+            raise VulkError(msg)
+
+        pixel_size = vc.format_size(self.format, 1, 1)
+        if isinstance(pixels, np.ndarray):
+            src = pixels.reshape(height, width, pixel_size)
+        else:
+            src = np.frombuffer(pixels, dtype=np.uint8,
+                                count=width * height * pixel_size)
+            src = src.reshape(height, width, pixel_size)
+
+        with self.texture.bind_buffer(context, mip_level) as buf:
+            dst = np.frombuffer(buf, dtype=np.uint8, count=level_width *
+                                level_height * pixel_size)
+            dst = dst.reshape(level_height, level_width, pixel_size)
+            dst[y:y + height, x:x + width] = src
+
+        # Keep the bitmap in sync
+        if mip_level == 0 and self.bitmap is not None and \
+           self.bitmap.flags.writeable:
+            bitmap = self.bitmap.reshape(self.height, self.width, pixel_size)
+            bitmap[y:y + height, x:x + width] = src
+
+        self.texture.upload_region(context, x, y, width, height, mip_level)
+
+    @property
+    def memory_size(self):
+        """Bytes allocated in Vulkan memory for this texture"""
+        return self.texture.memory_size
+
+    def destroy(self, context):
+        """Destroy the sampler, the view and the image
+
+        Args:
+            context (VulkContext)
+        """
+        self.release_sampler(context)
+        self.view.destroy(context)
+        self.texture.destroy(context)
 
 
 class BinaryTexture(RawTexture):
@@ -174,6 +418,8 @@ class BinaryTexture(RawTexture):
         """Generate mipmap automatically
 
         This method generates mipmap on processor and then upload it on GPU.
+        Each level is filtered from the previous one and written directly
+        in its staging buffer (see `mipmap_pyramid`).
         This method is heavy, use it with care. You shouldn't need to call it
         several times unless raw_bitmap is modified.
 
@@ -182,29 +428,80 @@ class BinaryTexture(RawTexture):
         Args:
             context (VulkContext)
         """
-        for i in range(self.mip_levels):
-            self.upload_buffer(context, i)
+        self.upload_buffer(context, 0)
+
+        if self.mip_levels == 1:
+            return
+
+        components = vc.format_info(self.format)[1]
+        with ExitStack() as stack:
+            outputs = [
+                stack.enter_context(self.texture.bind_buffer(context, i))
+                for i in range(1, self.mip_levels)]
+            mipmap_pyramid(self.bitmap, self.width, self.height, components,
+                           self.mip_levels, outputs)
 
 
 class Texture(BinaryTexture):
     """BinaryTexture with file managing"""
 
-    def __init__(self, context, path_file, mip_levels=1):
+    def __init__(self, context, path_file, mip_levels=1, image=None,
+                 cache=None):
         """
         Args:
             context (VulkContext)
             path_file (str): Path to the image to load
             mip_levels (int): Number of mip level (0=max)
+            image (tuple): Image already decoded by `load_file`, the file
+                           is not read again (optional)
+            cache (TextureCache): Cache of decoded images, the file is
+                                  decoded only if it's not in cache
+                                  (optional)
         """
+        self.path_file = path_file
+
+        # Load decoded image and mipmaps from cache
+        header = None
+        if cache and image is None:
+            header = cache.lookup(path_file, mip_levels)
+        if header:
+            width, height, components, cached_levels = header
+            super().__init__(
+                context, width, height,
+                Texture.components_to_format(components), None,
+                mip_levels=cached_levels)
+            cache.read(context, path_file, self, mip_levels)
+            self.upload(context)
+            return
+
         # Load bitmap
-        with open(path_file, 'rb') as f:
-            raw_bitmap, width, height, components = load_image(f.read())
+        if image is None:
+            image = Texture.load_file(path_file)
+        raw_bitmap, width, height, components = image
         texture_format = Texture.components_to_format(components)
 
         # Create all the components by calling parent init
         super().__init__(context, width, height, texture_format, raw_bitmap,
                          mip_levels=mip_levels)
 
+        if cache:
+            cache.write(context, path_file, self, mip_levels)
+
+    @staticmethod
+    def load_file(path_file):
+        """Read and decode an image file
+
+        This function doesn't need Vulkan, it can be called from any thread.
+
+        Args:
+            path_file (str): Path to the image to load
+
+        Returns:
+            tuple(raw_bitmap, width, height, components)
+        """
+        with open(path_file, 'rb') as f:
+            return load_image(f.read())
+
     @staticmethod
     def components_to_format(components):
         '''Convert number of channel components in image to Vulkan format
@@ -228,10 +525,11 @@ class HighQualityTexture(Texture):
     It's really just a helper class.
     """
 
-    def __init__(self, context, path_file, anisotropy=0):
+    def __init__(self, context, path_file, anisotropy=0, image=None,
+                 cache=None):
         self.anisotropy = anisotropy
         # Set mipmap_levels to 0 to generate all mipmaps
-        super().__init__(context, path_file, 0)
+        super().__init__(context, path_file, 0, image=image, cache=cache)
 
     def init_sampler(self, context):
         anisotropy_enable = self.anisotropy > 0
@@ -242,6 +540,568 @@ class HighQualityTexture(Texture):
                          max_anisotropy=self.anisotropy)
 
 
+class TextureCache():
+    """Disk cache of decoded images
+
+    Decoding a PNG is much slower than reading raw pixels. After the first
+    decoding, `Texture` writes the pixels of all its mip levels in a cache
+    file, next loads copy the mapped file straight into the staging
+    buffers. A cache file is identified by the path, modification time and
+    size of the source image, so a modified image is decoded again, and by
+    the requested number of mip levels.
+    When the cache exceeds `max_size`, the least recently used files are
+    removed.
+
+    Example:
+
+    ```
+    cache = TextureCache('/tmp/mygame')
+    texture = Texture(context, 'hero.png', cache=cache)
+    ```
+    """
+
+    MAGIC = b'VTXC'
+    VERSION = 1
+    # magic, version, components, width, height, mip levels
+    HEADER = struct.Struct('<4sHHIII')
+    EXTENSION = '.vtc'
+
+    def __init__(self, directory, max_size=512 * 1024 * 1024):
+        """
+        Args:
+            directory (str): Directory containing the cache files, created
+                             if needed
+            max_size (int): Maximum size of the cache in bytes
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def cache_path(self, path_file, mip_levels=1):
+        """Return the path of the cache file of an image
+
+        Args:
+            path_file (str): Path to the source image
+            mip_levels (int): Requested number of mip levels (0=max)
+
+        Returns:
+            str
+        """
+        stat = os.stat(path_file)
+        key = '%s:%s:%s:%s' % (os.path.abspath(path_file), stat.st_mtime_ns,
+                               stat.st_size, mip_levels)
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, name + TextureCache.EXTENSION)
+
+    def lookup(self, path_file, mip_levels=1):
+        """Return the header of the cached image
+
+        Args:
+            path_file (str): Path to the source image
+            mip_levels (int): Requested number of mip levels (0=max)
+
+        Returns:
+            tuple(width, height, components, mip_levels) or None if the image
+            is not in cache with these mip levels
+        """
+        try:
+            with open(self.cache_path(path_file, mip_levels), 'rb') as f:
+                header = f.read(TextureCache.HEADER.size)
+        except OSError:
+            self.misses += 1
+            return None
+
+        if len(header) != TextureCache.HEADER.size:
+            self.misses += 1
+            return None
+
+        magic, version, components, width, height, cached_levels = \
+            TextureCache.HEADER.unpack(header)
+        if magic != TextureCache.MAGIC or version != TextureCache.VERSION or \
+           cached_levels != (mip_levels or mipmap_levels(width, height)):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return width, height, components, cached_levels
+
+    def _level_sizes(self, texture):
+        """Return the size in bytes of each mip level"""
+        return [vc.format_size(texture.format, *mipmap_size(
+            texture.width, texture.height, mip_level))
+                for mip_level in range(texture.mip_levels)]
+
+    def read(self, context, path_file, texture, mip_levels=1):
+        """Copy the cached mip levels into the staging buffers of texture
+
+        Args:
+            context (VulkContext)
+            path_file (str): Path to the source image
+            texture (RawTexture): Texture created with the cached header
+            mip_levels (int): Requested number of mip levels (0=max)
+        """
+        cache_file = self.cache_path(path_file, mip_levels)
+        offset = TextureCache.HEADER.size
+
+        with open(cache_file, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data, \
+                memoryview(data) as view:
+            for mip_level, size in enumerate(self._level_sizes(texture)):
+                if offset + size > len(data):
+                    msg = "Cache file %s is truncated" % cache_file
+                    logger.error(msg)
+                    raise VulkError(msg)
+                with texture.texture.bind_buffer(context, mip_level) as buf:
+                    buf[0:size] = view[offset:offset + size]
+                offset += size
+
+        # Mark the file as recently used
+        os.utime(cache_file)
+
+    def write(self, context, path_file, texture, mip_levels=1):
+        """Write the mip levels of texture in cache
+
+        Levels are read back from the staging buffers.
+
+        Args:
+            context (VulkContext)
+            path_file (str): Path to the source image
+            texture (RawTexture): Uploaded texture
+            mip_levels (int): Requested number of mip levels (0=max)
+        """
+        cache_file = self.cache_path(path_file, mip_levels)
+        tmp_file = '%s.%s.tmp' % (cache_file, os.getpid())
+        components = vc.format_info(texture.format)[1]
+
+        try:
+            with open(tmp_file, 'wb') as f:
+                f.write(TextureCache.HEADER.pack(
+                    TextureCache.MAGIC, TextureCache.VERSION, components,
+                    texture.width, texture.height, texture.mip_levels))
+                for mip_level, size in enumerate(
+                        self._level_sizes(texture)):
+                    with texture.texture.bind_buffer(
+                            context, mip_level) as buf:
+                        f.write(buf[0:size])
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            logger.warning("Can't write texture cache %s: %s",
+                           cache_file, e)
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            return
+
+        self.trim()
+
+    def trim(self, max_size=None):
+        """Remove the least recently used files until the cache fits
+
+        Args:
+            max_size (int): Maximum size in bytes (default: `self.max_size`)
+        """
+        if max_size is None:
+            max_size = self.max_size
+
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(TextureCache.EXTENSION):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        """Remove all cache files"""
+        self.trim(0)
+
+
+# KTX glInternalFormat to Vulkan format
+_KTX_FORMATS = {
+    0x83F0: vc.Format.BC1_RGB_UNORM_BLOCK,
+    0x83F1: vc.Format.BC1_RGBA_UNORM_BLOCK,
+    0x83F2: vc.Format.BC2_UNORM_BLOCK,
+    0x83F3: vc.Format.BC3_UNORM_BLOCK,
+    0x8C4C: vc.Format.BC1_RGB_SRGB_BLOCK,
+    0x8C4D: vc.Format.BC1_RGBA_SRGB_BLOCK,
+    0x8C4E: vc.Format.BC2_SRGB_BLOCK,
+    0x8C4F: vc.Format.BC3_SRGB_BLOCK,
+    0x8DBB: vc.Format.BC4_UNORM_BLOCK,
+    0x8DBC: vc.Format.BC4_SNORM_BLOCK,
+    0x8DBD: vc.Format.BC5_UNORM_BLOCK,
+    0x8DBE: vc.Format.BC5_SNORM_BLOCK,
+    0x8E8C: vc.Format.BC7_UNORM_BLOCK,
+    0x8E8D: vc.Format.BC7_SRGB_BLOCK,
+    0x8E8E: vc.Format.BC6H_SFLOAT_BLOCK,
+    0x8E8F: vc.Format.BC6H_UFLOAT_BLOCK,
+    0x9270: vc.Format.EAC_R11_UNORM_BLOCK,
+    0x9271: vc.Format.EAC_R11_SNORM_BLOCK,
+    0x9272: vc.Format.EAC_R11G11_UNORM_BLOCK,
+    0x9273: vc.Format.EAC_R11G11_SNORM_BLOCK,
+    0x9274: vc.Format.ETC2_R8G8B8_UNORM_BLOCK,
+    0x9275: vc.Format.ETC2_R8G8B8_SRGB_BLOCK,
+    0x9276: vc.Format.ETC2_R8G8B8A1_UNORM_BLOCK,
+    0x9277: vc.Format.ETC2_R8G8B8A1_SRGB_BLOCK,
+    0x9278: vc.Format.ETC2_R8G8B8A8_UNORM_BLOCK,
+    0x9279: vc.Format.ETC2_R8G8B8A8_SRGB_BLOCK
+}
+# ASTC formats follow each other, in this block order
+for _i, _block in enumerate(['4x4', '5x4', '5x5', '6x5', '6x6', '8x5', '8x6',
+                             '8x8', '10x5', '10x6', '10x8', '10x10', '12x10',
+                             '12x12']):
+    _KTX_FORMATS[0x93B0 + _i] = vc.Format['ASTC_%s_UNORM_BLOCK' % _block]
+    _KTX_FORMATS[0x93D0 + _i] = vc.Format['ASTC_%s_SRGB_BLOCK' % _block]
+
+# DDS FourCC to Vulkan format
+_DDS_FOURCC_FORMATS = {
+    b'DXT1': vc.Format.BC1_RGBA_UNORM_BLOCK,
+    b'DXT3': vc.Format.BC2_UNORM_BLOCK,
+    b'DXT5': vc.Format.BC3_UNORM_BLOCK,
+    b'ATI1': vc.Format.BC4_UNORM_BLOCK,
+    b'BC4U': vc.Format.BC4_UNORM_BLOCK,
+    b'BC4S': vc.Format.BC4_SNORM_BLOCK,
+    b'ATI2': vc.Format.BC5_UNORM_BLOCK,
+    b'BC5U': vc.Format.BC5_UNORM_BLOCK,
+    b'BC5S': vc.Format.BC5_SNORM_BLOCK
+}
+
+# DDS DXGI_FORMAT (DX10 header) to Vulkan format
+_DDS_DXGI_FORMATS = {
+    71: vc.Format.BC1_RGBA_UNORM_BLOCK,
+    72: vc.Format.BC1_RGBA_SRGB_BLOCK,
+    74: vc.Format.BC2_UNORM_BLOCK,
+    75: vc.Format.BC2_SRGB_BLOCK,
+    77: vc.Format.BC3_UNORM_BLOCK,
+    78: vc.Format.BC3_SRGB_BLOCK,
+    80: vc.Format.BC4_UNORM_BLOCK,
+    81: vc.Format.BC4_SNORM_BLOCK,
+    83: vc.Format.BC5_UNORM_BLOCK,
+    84: vc.Format.BC5_SNORM_BLOCK,
+    95: vc.Format.BC6H_UFLOAT_BLOCK,
+    96: vc.Format.BC6H_SFLOAT_BLOCK,
+    98: vc.Format.BC7_UNORM_BLOCK,
+    99: vc.Format.BC7_SRGB_BLOCK
+}
+
+_KTX_IDENTIFIER = b'\xabKTX 11\xbb\r\n\x1a\n'
+# endianness, glType, glTypeSize, glFormat, glInternalFormat,
+# glBaseInternalFormat, width, height, depth, array elements, faces,
+# mip levels, key/value bytes
+_KTX_HEADER = struct.Struct('<13I')
+# magic, size, flags, height, width, pitch, depth, mip levels, pixel format
+# size and flags, FourCC
+_DDS_HEADER = struct.Struct('<4s7I44x2I4s')
+_DDS_DX10_HEADER = struct.Struct('<5I')
+
+
+class CompressedTexture(RawTexture):
+    """Texture loaded from a KTX or DDS file
+
+    The file contains block compressed mip levels (BCn, ETC2, ASTC) used as
+    is by the graphic card. The file is mapped in memory and each level is
+    copied straight into its staging buffer, there is no decoding.
+    Only 2D textures are supported (no array, no cubemap). The texture is
+    immutable, its staging memory is released after upload.
+    """
+
+    def __init__(self, context, path_file):
+        """
+        Args:
+            context (VulkContext)
+            path_file (str): Path to the KTX or DDS file
+        """
+        self.path_file = path_file
+
+        with open(path_file, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:len(_KTX_IDENTIFIER)] == _KTX_IDENTIFIER:
+                texture_format, width, height, levels = \
+                    CompressedTexture.parse_ktx(data)
+            elif data[:4] == b'DDS ':
+                texture_format, width, height, levels = \
+                    CompressedTexture.parse_dds(data)
+            else:
+                msg = "%s is not a KTX or DDS file" % path_file
+                logger.error(msg)
+                raise VulkError(msg)
+
+            if not CompressedTexture.is_supported(context, texture_format):
+                msg = "Format %s of %s is not supported by the device" % (
+                    texture_format.name, path_file)
+                logger.error(msg)
+                raise VulkError(msg)
+
+            super().__init__(context, width, height, texture_format,
+                             mip_levels=len(levels))
+
+            with memoryview(data) as view:
+                for mip_level, (offset, size) in enumerate(levels):
+                    with self.texture.bind_buffer(context, mip_level) as buf:
+                        buf[0:size] = view[offset:offset + size]
+
+        self.upload(context, release_staging=True)
+
+    def init_bitmap(self):
+        '''Compressed textures have no bitmap'''
+        return None
+
+    @staticmethod
+    def is_supported(context, texture_format):
+        """Return `True` if the device can sample this format
+
+        Args:
+            context (VulkContext)
+            texture_format (Format): Format to check
+        """
+        features = vo.format_features(context, texture_format)
+        return bool(features & vc.FormatFeature.SAMPLED_IMAGE)
+
+    @staticmethod
+    def _check_levels(texture_format, width, height, levels, data_size):
+        """Check that each level has the expected size"""
+        for mip_level, (offset, size) in enumerate(levels):
+            w, h = mipmap_size(width, height, mip_level)
+            expected = vc.format_size(texture_format, w, h)
+            if size != expected or offset + size > data_size:
+                msg = "Mip level %s is corrupted (%s bytes, expected %s)" % (
+                    mip_level, size, expected)
+                logger.error(msg)
+                raise VulkError(msg)
+
+    @staticmethod
+    def parse_ktx(data):
+        """Parse a KTX 1 file
+
+        Args:
+            data (buffer): Content of the file
+
+        Returns:
+            tuple(format, width, height, levels) with levels a list of
+            tuple(offset, size)
+        """
+        endianness, _, _, _, internal_format, _, width, height, depth, \
+            elements, faces, mip_levels, kv_size = \
+            _KTX_HEADER.unpack_from(data, len(_KTX_IDENTIFIER))
+
+        if endianness != 0x04030201:
+            msg = "Big endian KTX files are not supported"
+            logger.error(msg)
+            raise VulkError(msg)
+        if depth > 1 or elements > 1 or faces > 1:
+            msg = "Only 2D KTX textures are supported"
+            logger.error(msg)
+            raise VulkError(msg)
+        if internal_format not in _KTX_FORMATS:
+            msg = "KTX format 0x%X is not supported" % internal_format
+            logger.error(msg)
+            raise VulkError(msg)
+
+        texture_format = _KTX_FORMATS[internal_format]
+        offset = len(_KTX_IDENTIFIER) + _KTX_HEADER.size + kv_size
+        levels = []
+        for _ in range(max(1, mip_levels)):
+            size = struct.unpack_from('<I', data, offset)[0]
+            offset += 4
+            levels.append((offset, size))
+            # Each level is padded to 4 bytes
+            offset += (size + 3) & ~3
+
+        CompressedTexture._check_levels(texture_format, width, height,
+                                        levels, len(data))
+        return texture_format, width, height, levels
+
+    @staticmethod
+    def parse_dds(data):
+        """Parse a DDS file
+
+        Args:
+            data (buffer): Content of the file
+
+        Returns:
+            tuple(format, width, height, levels) with levels a list of
+            tuple(offset, size)
+        """
+        _, _, _, height, width, _, _, mip_levels, _, _, fourcc = \
+            _DDS_HEADER.unpack_from(data)
+        # Magic and header
+        offset = 4 + 124
+
+        if fourcc == b'DX10':
+            dxgi_format = _DDS_DX10_HEADER.unpack_from(data, offset)[0]
+            offset += _DDS_DX10_HEADER.size
+            texture_format = _DDS_DXGI_FORMATS.get(dxgi_format)
+        else:
+            texture_format = _DDS_FOURCC_FORMATS.get(fourcc)
+
+        if not texture_format:
+            msg = "DDS format %s is not supported" % fourcc
+            logger.error(msg)
+            raise VulkError(msg)
+
+        levels = []
+        for mip_level in range(max(1, mip_levels)):
+            w, h = mipmap_size(width, height, mip_level)
+            size = vc.format_size(texture_format, w, h)
+            levels.append((offset, size))
+            offset += size
+
+        CompressedTexture._check_levels(texture_format, width, height,
+                                        levels, len(data))
+        return texture_format, width, height, levels
+
+
+class TextureLoader():
+    """Load textures without freezing the render thread
+
+    Files are read and decoded by worker threads. Decoded images are
+    queued and turned into textures on the render thread by `update`, which
+    creates and uploads at most `budget` bytes per call. Until a texture is
+    ready, `placeholder` can be drawn in its place.
+
+    Example:
+
+    ```
+    loader = TextureLoader(context)
+    future = loader.load_async('hero.png')
+
+    # In the render loop
+    loader.update(context)
+    batch.draw(loader.get(future), x, y)
+    ```
+    """
+
+    def __init__(self, context, workers=None, budget=16 * 1024 * 1024):
+        """
+        Args:
+            context (VulkContext)
+            workers (int): Number of decoding threads (default to the
+                           `ThreadPoolExecutor` default)
+            budget (int): Bytes uploaded to the GPU per `update` call
+        """
+        self.budget = budget
+        self.executor = ThreadPoolExecutor(max_workers=workers,
+                                           thread_name_prefix='vulk-texture')
+        self.decoded = queue.Queue()
+        self.pending = 0
+        self.placeholder = BinaryTexture(
+            context, 1, 1, vc.Format.R8G8B8A8_UNORM, bytearray([255] * 4))
+
+    def load_async(self, path_file, texture_class=Texture, **kwargs):
+        """Load a texture in background
+
+        Args:
+            path_file (str): Path to the image to load
+            texture_class (class): `Texture` or a subclass, it must accept
+                                   the `image` keyword argument
+            kwargs: Extra arguments given to `texture_class`
+
+        Returns:
+            Future[Texture]: Resolved by `update` on the render thread
+        """
+        future = Future()
+        self.pending += 1
+        self.executor.submit(self._decode, future, path_file,
+                             texture_class, kwargs)
+        return future
+
+    def _decode(self, future, path_file, texture_class, kwargs):
+        """Decode image in a worker thread and queue it for upload"""
+        image = error = None
+        try:
+            image = Texture.load_file(path_file)
+        except Exception as e:  # pylint: disable=broad-except
+            error = e
+        self.decoded.put((future, path_file, texture_class, kwargs,
+                          image, error))
+
+    def update(self, context):
+        """Create and upload decoded textures
+
+        Must be called on the render thread, typically once per frame.
+        At least one texture is uploaded per call, then textures are uploaded
+        until `budget` is reached. All uploads of a call are submitted at
+        once in the upload queue of the context.
+
+        Args:
+            context (VulkContext)
+
+        Returns:
+            int: Number of textures still loading
+        """
+        with context.upload_queue.batch():
+            return self._update(context)
+
+    def _update(self, context):
+        """Create textures until budget is reached"""
+        uploaded = 0
+        while uploaded < self.budget:
+            try:
+                future, path_file, texture_class, kwargs, image, error = \
+                    self.decoded.get_nowait()
+            except queue.Empty:
+                break
+
+            self.pending -= 1
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            if error:
+                logger.error("Can't load texture %s: %s", path_file, error)
+                future.set_exception(error)
+                continue
+
+            try:
+                texture = texture_class(context, path_file, image=image,
+                                        **kwargs)
+            except Exception as e:  # pylint: disable=broad-except
+                future.set_exception(e)
+                continue
+
+            _, width, height, components = image
+            uploaded += width * height * components
+            future.set_result(texture)
+
+        return self.pending
+
+    def get(self, future):
+        """Return the texture if loaded, else the placeholder
+
+        Args:
+            future (Future): Future returned by `load_async`
+
+        Returns:
+            RawTexture
+        """
+        if future.done() and not future.cancelled() and \
+           not future.exception():
+            return future.result()
+        return self.placeholder
+
+    def shutdown(self, context, wait=True):
+        """Stop worker threads and destroy the placeholder
+
+        The placeholder must not be used by the GPU anymore.
+
+        Args:
+            context (VulkContext)
+            wait (bool): Wait for the current decodings to finish
+        """
+        self.executor.shutdown(wait=wait)
+        if self.placeholder:
+            self.placeholder.destroy(context)
+            self.placeholder = None
+
+
 class TextureRegion():
     '''
     Defines a rectangular area of a texture. The coordinate system used has
@@ -322,3 +1182,389 @@ class TextureRegion():
             x * inv_width, y * inv_height,
             (x + width) * inv_width, (y + height) * inv_height
         )
+
+
+class SkylinePacker():
+    """Pack rectangles in a fixed size area with the skyline algorithm
+
+    The skyline is the list of segments formed by the top of the
+    rectangles already packed. A new rectangle is placed where its top is
+    the lowest (bottom-left heuristic), ties are broken by the smallest
+    width of skyline. It's fast and wastes few space when rectangles are
+    inserted sorted by decreasing height.
+    """
+
+    def __init__(self, width, height):
+        """
+        Args:
+            width (int): Width of the area
+            height (int): Height of the area
+        """
+        self.width = width
+        self.height = height
+        # Segments [x, y, width] sorted by x
+        self.skyline = [[0, 0, width]]
+
+    def _fit(self, index, width, height):
+        """Return the y where the rectangle fits at segment `index`
+
+        Returns:
+            int: y position or -1 if the rectangle doesn't fit
+        """
+        x = self.skyline[index][0]
+        if x + width > self.width:
+            return -1
+
+        y = 0
+        remaining = width
+        while remaining > 0:
+            y = max(y, self.skyline[index][1])
+            if y + height > self.height:
+                return -1
+            remaining -= self.skyline[index][2]
+            index += 1
+
+        return y
+
+    def insert(self, width, height):
+        """Find a place for a rectangle and reserve it
+
+        Args:
+            width (int): Width of the rectangle
+            height (int): Height of the rectangle
+
+        Returns:
+            tuple(x, y) or None if there is no room left
+        """
+        best = None
+        best_key = None
+        for i in range(len(self.skyline)):
+            y = self._fit(i, width, height)
+            if y < 0:
+                continue
+            key = (y + height, self.skyline[i][2])
+            if best_key is None or key < best_key:
+                best = (i, self.skyline[i][0], y)
+                best_key = key
+
+        if best is None:
+            return None
+
+        index, x, y = best
+        self._add_segment(index, x, y + height, width)
+        return x, y
+
+    def _add_segment(self, index, x, y, width):
+        """Insert a segment and shrink the ones it covers"""
+        self.skyline.insert(index, [x, y, width])
+
+        i = index + 1
+        while i < len(self.skyline):
+            segment = self.skyline[i]
+            shrink = x + width - segment[0]
+            if shrink <= 0:
+                break
+            segment[0] += shrink
+            segment[2] -= shrink
+            if segment[2] > 0:
+                break
+            del self.skyline[i]
+
+        # Merge segments at the same height
+        i = 0
+        while i < len(self.skyline) - 1:
+            if self.skyline[i][1] == self.skyline[i + 1][1]:
+                self.skyline[i][2] += self.skyline[i + 1][2]
+                del self.skyline[i + 1]
+            else:
+                i += 1
+
+
+def _blit_extruded(dst, src, x, y, extrude):
+    """Copy `src` into `dst` and repeat its border pixels
+
+    The border of the image is repeated `extrude` times around it so that
+    bilinear filtering doesn't sample the neighbours in the atlas.
+
+    Args:
+        dst (ndarray): Destination of shape (height, width, components)
+        src (ndarray): Source of shape (height, width, components)
+        x (int): X position of the extruded image in `dst`
+        y (int): Y position of the extruded image in `dst`
+        extrude (int): Number of border pixels to repeat
+    """
+    h, w = src.shape[:2]
+    left, top = x + extrude, y + extrude
+    dst[top:top + h, left:left + w] = src
+
+    if not extrude:
+        return
+
+    dst[y:top, left:left + w] = src[0]
+    dst[top + h:top + h + extrude, left:left + w] = src[-1]
+    rows = slice(y, top + h + extrude)
+    dst[rows, x:left] = dst[rows, left:left + 1]
+    dst[rows, left + w:left + w + extrude] = dst[rows, left + w - 1:left + w]
+
+
+class TextureAtlas():
+    """Pack many images into few big textures
+
+    Each page is a `BinaryTexture` filled with a `SkylinePacker`. Images are
+    added at any time, only the area of the new images is uploaded. Drawing
+    regions of the same page doesn't break `SpriteBatch` batching.
+
+    Example:
+
+    ```
+    atlas = TextureAtlas()
+    region = atlas.add(context, 'hero', bitmap, 32, 32)
+    batch.draw_region(region, x, y, 32, 32)
+    ```
+    """
+
+    def __init__(self, page_width=2048, page_height=2048,
+                 texture_format=vc.Format.R8G8B8A8_UNORM, padding=1,
+                 extrude=1):
+        """
+        Args:
+            page_width (int): Width of each page
+            page_height (int): Height of each page
+            texture_format (Format): Format of pages and added images
+            padding (int): Empty pixels between images
+            extrude (int): Border pixels repeated around each image
+        """
+        self.page_width = page_width
+        self.page_height = page_height
+        self.format = texture_format
+        self.components = vc.format_info(texture_format)[1]
+        self.padding = padding
+        self.extrude = extrude
+        self.pages = []
+        self.packers = []
+        self.regions = {}
+
+    def _add_page(self, context):
+        """Create a new empty page"""
+        size = self.page_width * self.page_height * \
+            vc.format_info(self.format)[2]
+        page = BinaryTexture(context, self.page_width, self.page_height,
+                             self.format, bytearray(size))
+        self.pages.append(page)
+        self.packers.append(SkylinePacker(self.page_width, self.page_height))
+        return len(self.pages) - 1
+
+    def _pack(self, context, width, height):
+        """Reserve room for an image, in a new page if needed
+
+        Returns:
+            tuple(page, x, y) with x and y the position of the extruded image
+        """
+        cell_width = width + 2 * self.extrude + self.padding
+        cell_height = height + 2 * self.extrude + self.padding
+        if cell_width > self.page_width or cell_height > self.page_height:
+            msg = "Image %sx%s is too big for atlas page %sx%s" % (
+                width, height, self.page_width, self.page_height)
+            logger.error(msg)
+            raise VulkError(msg)
+
+        for page, packer in enumerate(self.packers):
+            # Pages loaded from file are immutable
+            if not packer:
+                continue
+            position = packer.insert(cell_width, cell_height)
+            if position:
+                return (page,) + position
+
+        page = self._add_page(context)
+        return (page,) + self.packers[page].insert(cell_width, cell_height)
+
+    def _blit(self, name, page, x, y, bitmap, width, height):
+        """Copy the image into the page bitmap and create its region"""
+        expected = width * height * self.components
+        src = np.frombuffer(bitmap, dtype=np.uint8)
+        if src.size != expected:
+            msg = "Image %s must have %s bytes, not %s" % (
+                name, expected, src.size)
+            logger.error(msg)
+            raise VulkError(msg)
+
+        texture = self.pages[page]
+        dst = texture.bitmap.reshape(self.page_height, self.page_width,
+                                     self.components)
+        _blit_extruded(dst, src.reshape(height, width, self.components),
+                       x, y, self.extrude)
+
+        region = TextureRegion.from_pixels(
+            texture, x + self.extrude, y + self.extrude, width, height)
+        self.regions[name] = region
+        return region
+
+    def _upload(self, context, page, x, y, width, height):
+        """Upload an area of a page"""
+        texture = self.pages[page]
+        src = texture.bitmap.reshape(self.page_height, self.page_width,
+                                     self.components)
+        texture.update_region(context, x, y, width, height,
+                              src[y:y + height, x:x + width])
+
+    def add(self, context, name, bitmap, width, height):
+        """Add an image to the atlas
+
+        Args:
+            context (VulkContext)
+            name (str): Name of the image
+            bitmap (buffer): Pixels of the image, in the atlas format
+            width (int): Image width
+            height (int): Image height
+
+        Returns:
+            TextureRegion: Region of the image in the atlas
+        """
+        return self.add_all(context, [(name, bitmap, width, height)])[name]
+
+    def add_all(self, context, images):
+        """Add several images to the atlas
+
+        Images are packed from the tallest to the smallest which wastes less
+        space. Each page is uploaded once, only on the area containing the
+        new images.
+
+        Args:
+            context (VulkContext)
+            images (list): List of tuple(name, bitmap, width, height)
+
+        Returns:
+            dict: `TextureRegion` indexed by name
+        """
+        res = {}
+        areas = {}
+        for name, bitmap, width, height in sorted(
+                images, key=lambda image: (image[3], image[2]),
+                reverse=True):
+            page, x, y = self._pack(context, width, height)
+            res[name] = self._blit(name, page, x, y, bitmap, width, height)
+
+            x2 = x + width + 2 * self.extrude
+            y2 = y + height + 2 * self.extrude
+            if page in areas:
+                ax, ay, ax2, ay2 = areas[page]
+                areas[page] = (min(ax, x), min(ay, y),
+                               max(ax2, x2), max(ay2, y2))
+            else:
+                areas[page] = (x, y, x2, y2)
+
+        for page, (x, y, x2, y2) in areas.items():
+            self._upload(context, page, x, y, x2 - x, y2 - y)
+
+        return res
+
+    @staticmethod
+    def page_path(path_file, page):
+        """Return the path of a page file of an atlas manifest
+
+        Args:
+            path_file (str): Path to the manifest
+            page (int): Index of the page
+
+        Returns:
+            str
+        """
+        return '%s.%d.page' % (os.path.splitext(path_file)[0], page)
+
+    @staticmethod
+    def load(context, path_file):
+        """Load an atlas built by `vulk.tools.atlas`
+
+        The manifest is mapped in memory and source images are never read.
+        Page files contain all the mip levels one after the other, each
+        level is read straight into its staging buffer, which is released
+        once uploaded. Images can still be added to the returned atlas, they
+        go in new pages.
+
+        Args:
+            context (VulkContext)
+            path_file (str): Path to the manifest
+
+        Returns:
+            TextureAtlas
+        """
+        with open(path_file, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            magic, version, texture_format, width, height, mip_levels, \
+                page_count, region_count = ATLAS_HEADER.unpack_from(data)
+            if magic != ATLAS_MAGIC or version != ATLAS_VERSION:
+                msg = "%s is not an atlas manifest (version %s)" % (
+                    path_file, ATLAS_VERSION)
+                logger.error(msg)
+                raise VulkError(msg)
+
+            atlas = TextureAtlas(width, height, vc.Format(texture_format))
+            for page in range(page_count):
+                atlas.pages.append(atlas._load_page(
+                    context, TextureAtlas.page_path(path_file, page),
+                    mip_levels))
+                atlas.packers.append(None)
+
+            offset = ATLAS_HEADER.size
+            for _ in range(region_count):
+                length = ATLAS_NAME.unpack_from(data, offset)[0]
+                offset += ATLAS_NAME.size
+                name = data[offset:offset + length].decode('utf-8')
+                offset += length
+                page, _, _, _, _, u, v, u2, v2 = ATLAS_REGION.unpack_from(
+                    data, offset)
+                offset += ATLAS_REGION.size
+                atlas.regions[name] = TextureRegion(atlas.pages[page],
+                                                    u, v, u2, v2)
+
+        return atlas
+
+    def _load_page(self, context, path_file, mip_levels):
+        """Create a page texture from a page file"""
+        page = BinaryTexture(context, self.page_width, self.page_height,
+                             self.format, None, mip_levels=mip_levels)
+        pixel_size = vc.format_info(self.format)[2]
+
+        with open(path_file, 'rb') as f:
+            for mip_level in range(mip_levels):
+                width, height = mipmap_size(self.page_width,
+                                            self.page_height, mip_level)
+                size = width * height * pixel_size
+                with page.texture.bind_buffer(context, mip_level) as buf:
+                    read = f.readinto(np.frombuffer(buf, dtype=np.uint8,
+                                                    count=size))
+                if read != size:
+                    msg = "Atlas page %s is truncated" % path_file
+                    logger.error(msg)
+                    raise VulkError(msg)
+
+        if mip_levels > 1:
+            page.set_sampler(context, mag_filter=vc.Filter.LINEAR,
+                             min_filter=vc.Filter.LINEAR,
+                             mipmap_mode=vc.SamplerMipmapMode.LINEAR)
+        page.upload(context, release_staging=True)
+        return page
+
+    def get(self, name):
+        """Return the region of an image
+
+        Args:
+            name (str): Name of the image
+
+        Returns:
+            TextureRegion
+        """
+        return self.regions[name]
+
+    def destroy(self, context):
+        """Destroy all pages
+
+        Args:
+            context (VulkContext)
+        """
+        for page in self.pages:
+            page.destroy(context)
+        self.pages = []
+        self.packers = []
+        self.regions = {}
@@ -49,14 +49,24 @@ class UniformAttributes():
 
 
 class UniformBlock():
-    def __init__(self, context, attributes):
+    def __init__(self, context, attributes, dynamic=False):
         '''
         *Parameters:*
 
         - `context`: `VulkContext`
         - `attributes`: `UniformAttributes`
+        - `dynamic`: Upload in the uniform allocator of the context instead
+                     of an own buffer. Descriptors must be of type
+                     `UNIFORM_BUFFER_DYNAMIC` and bound with `offset`.
+
+        **Note: A dynamic block must be uploaded at each frame**
         '''
         self.attributes = attributes
+        self.dynamic = dynamic
+        # Offset of the data in `buffer` (dynamic only)
+        self.offset = 0
+        # Frame of the last upload (dynamic only)
+        self.frame = -1
 
         # Create numpy type based on uniform attributes
         numpy_dtype = []
@@ -65,11 +75,16 @@ class UniformBlock():
                 ('', vc.DataTypeNumpy[attr.dtype], attr.components))
 
         self.uniform_array = np.zeros(1, dtype=numpy_dtype)
-        self.uniform_buffer = vo.HighPerformanceBuffer(
-            context, self.uniform_array.nbytes,
-            vc.BufferUsage.UNIFORM_BUFFER)
         self.size = self.uniform_array.nbytes
 
+        if dynamic:
+            self.uniform_buffer = None
+            self.buffer = context.uniform_allocator.buffer
+        else:
+            self.uniform_buffer = vo.HighPerformanceBuffer(
+                context, self.size, vc.BufferUsage.UNIFORM_BUFFER)
+            self.buffer = self.uniform_buffer.final_buffer
+
     def set_uniform(self, index, uniform):
         '''
         Update uniform at `index` position
@@ -81,7 +96,29 @@ class UniformBlock():
         '''
         self.uniform_array[index] = uniform
 
+    def expired(self, context):
+        '''Return `True` if the block must be uploaded for this frame
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        return self.dynamic and self.frame != context.uniform_allocator.frame
+
     def upload(self, context):
+        '''Upload uniforms, a plain copy in the uniform allocator if dynamic
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        if self.dynamic:
+            allocator = context.uniform_allocator
+            self.offset = allocator.write(
+                self.uniform_array.view(dtype=np.uint8))
+            self.frame = allocator.frame
+            return
+
         with self.uniform_buffer.bind(context) as b:
             np.copyto(np.array(b, copy=False),
                       self.uniform_array.view(dtype=np.uint8),
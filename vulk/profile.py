@@ -0,0 +1,225 @@
+'''CPU profiler module
+
+Zones measure the Python time spent in a block of code. They can be
+nested, samples are stored in a ring buffer and can be exported in the
+Chrome trace format, readable by `chrome://tracing` or Perfetto.
+
+When the profiler is not enabled, zones cost only a function call.
+
+*Exemple:*
+
+```
+from vulk import profile
+
+profile.enable()
+with profile.zone('physics'):
+    world.step()
+profile.export_chrome_trace('trace.json')
+```
+'''
+import functools
+import json
+import os
+import threading
+import time
+
+# Running profiler, None when disabled
+_profiler = None
+
+
+class _NullZone():
+    '''Zone doing nothing, used when the profiler is disabled'''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NULL_ZONE = _NullZone()
+
+
+class _Zone():
+    '''Zone measuring the time between `__enter__` and `__exit__`'''
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.profiler.local.depth = getattr(self.profiler.local,
+                                            'depth', 0) + 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        end = time.perf_counter()
+        local = self.profiler.local
+        local.depth -= 1
+        self.profiler.add(self.name, self.start, end, local.depth)
+        return False
+
+
+class Profiler():
+    '''Store zone samples in a ring buffer
+
+    A sample is a tuple (name, start, end, depth, thread id) with times in
+    seconds. When the buffer is full, the oldest samples are replaced.
+    '''
+
+    def __init__(self, capacity=65536):
+        '''
+        *Parameters:*
+
+        - `capacity`: Number of samples kept
+        '''
+        self.capacity = capacity
+        self.buffer = [None] * capacity
+        self.index = 0
+        self.count = 0
+        self.local = threading.local()
+
+    def add(self, name, start, end, depth):
+        '''Add a sample
+
+        *Parameters:*
+
+        - `name`: Name of the zone
+        - `start`: Start time in seconds (`time.perf_counter`)
+        - `end`: End time in seconds (`time.perf_counter`)
+        - `depth`: Number of parent zones
+        '''
+        self.buffer[self.index] = (name, start, end, depth,
+                                   threading.get_ident())
+        self.index = (self.index + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def samples(self):
+        '''Return samples from the oldest to the newest'''
+        start = (self.index - self.count) % self.capacity
+        return [self.buffer[(start + i) % self.capacity]
+                for i in range(self.count)]
+
+    def clear(self):
+        '''Remove all samples'''
+        self.buffer = [None] * self.capacity
+        self.index = 0
+        self.count = 0
+
+
+def enable(capacity=65536):
+    '''Start profiling, previous samples are dropped
+
+    *Parameters:*
+
+    - `capacity`: Number of samples kept
+
+    *Returns:*
+
+    `Profiler`
+    '''
+    global _profiler  # pylint: disable=global-statement
+    _profiler = Profiler(capacity)
+    return _profiler
+
+
+def disable():
+    '''Stop profiling
+
+    *Returns:*
+
+    The stopped `Profiler` (or `None`), its samples can still be exported
+    '''
+    global _profiler  # pylint: disable=global-statement
+    profiler = _profiler
+    _profiler = None
+    return profiler
+
+
+def is_enabled():
+    '''Return `True` if the profiler is running'''
+    return _profiler is not None
+
+
+def zone(name):
+    '''Measure a block of code
+
+    *Parameters:*
+
+    - `name`: Name of the zone
+
+    *Returns:*
+
+    Context manager to use with `with`
+    '''
+    if _profiler is None:
+        return _NULL_ZONE
+    return _Zone(_profiler, name)
+
+
+def profiled(name):
+    '''Decorator measuring each call of a function in a zone
+
+    *Parameters:*
+
+    - `name`: Name of the zone
+    '''
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _profiler is None:
+                return function(*args, **kwargs)
+            with _Zone(_profiler, name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def chrome_trace(profiler=None):
+    '''Convert samples to the Chrome trace format
+
+    *Parameters:*
+
+    - `profiler`: `Profiler` (default: the running one)
+
+    *Returns:*
+
+    `dict` serializable in JSON
+    '''
+    profiler = profiler or _profiler
+    events = []
+    pid = os.getpid()
+    samples = profiler.samples() if profiler else []
+    for name, start, end, depth, tid in samples:
+        # Times are in microseconds
+        events.append({
+            'name': name,
+            'cat': 'vulk',
+            'ph': 'X',
+            'ts': start * 1000000,
+            'dur': (end - start) * 1000000,
+            'pid': pid,
+            'tid': tid,
+            'args': {'depth': depth}
+        })
+
+    # Parents must come before their children at the same timestamp
+    events.sort(key=lambda e: (e['ts'], e['args']['depth']))
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def export_chrome_trace(path, profiler=None):
+    '''Write samples in a Chrome trace JSON file
+
+    *Parameters:*
+
+    - `path`: Path of the JSON file
+    - `profiler`: `Profiler` (default: the running one)
+    '''
+    with open(path, 'w') as f:
+        json.dump(chrome_trace(profiler), f)
@@ -0,0 +1,120 @@
+from vulk.assetmanager import AssetManager
+from vulk.exception import VulkError
+
+import pytest
+
+
+class FakeAsset():
+    def __init__(self, path, memory_size):
+        self.path = path
+        self.memory_size = memory_size
+        self.destroyed = False
+
+    def destroy(self, context):
+        self.destroyed = True
+
+
+class FakeFactory():
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, context, path, memory_size=100):
+        self.calls.append(path)
+        return FakeAsset(path, memory_size)
+
+
+def test_assetmanager_shares_assets():
+    factory = FakeFactory()
+    manager = AssetManager(None, memory_budget=1000)
+
+    handle1 = manager.load('a.png', factory)
+    handle2 = manager.load('a.png', factory)
+    handle3 = manager.load('a.png', factory, memory_size=200)
+
+    assert factory.calls == ['a.png', 'a.png']
+    assert handle1.asset is handle2.asset
+    assert handle1.asset is not handle3.asset
+    assert manager.entries[handle1.key].refcount == 2
+    assert manager.stats['hits'] == 1
+    assert manager.stats['misses'] == 2
+    assert manager.stats['memory'] == 300
+
+
+def test_assetmanager_release_counts():
+    factory = FakeFactory()
+    manager = AssetManager(None, memory_budget=1000)
+    handle1 = manager.load('a.png', factory)
+    handle2 = manager.load('a.png', factory)
+    entry = manager.entries[handle1.key]
+
+    handle1.release()
+    handle1.release()
+    assert handle1.asset is None
+    assert entry.refcount == 1
+    assert manager.stats['referenced'] == 1
+
+    handle2.release()
+    assert entry.refcount == 0
+    assert manager.stats['referenced'] == 0
+    # Unreferenced assets stay in cache while under budget
+    assert manager.stats['assets'] == 1
+
+
+def test_assetmanager_evicts_least_recently_used():
+    factory = FakeFactory()
+    manager = AssetManager(None, memory_budget=300)
+    handles = {path: manager.load(path, factory) for path in 'abc'}
+    assets = {path: handle.asset for path, handle in handles.items()}
+
+    handles['a'].release()
+    handles['c'].release()
+    handles['b'].release()
+    # 'a' was released first so it's the least recently used
+    manager.load('d', factory).release()
+
+    assert [key[0][-1] for key in manager.entries] == ['c', 'b', 'd']
+    assert manager.evicted == [assets['a']]
+    assert manager.stats['evictions'] == 1
+
+    manager.load('c', factory).release()
+    manager.load('e', factory).release()
+    assert [key[0][-1] for key in manager.entries] == ['d', 'c', 'e']
+    assert manager.evicted == [assets['a'], assets['b']]
+
+
+def test_assetmanager_never_evicts_referenced_assets():
+    factory = FakeFactory()
+    manager = AssetManager(None, memory_budget=150)
+    handle1 = manager.load('a.png', factory)
+    handle2 = manager.load('b.png', factory)
+    handle3 = manager.load('c.png', factory)
+
+    manager.purge()
+    assert manager.stats['assets'] == 3
+    assert manager.stats['memory'] == 300
+    assert not manager.evicted
+
+    handle2.release()
+    assert [asset.path for asset in manager.evicted] == ['b.png']
+    assert handle1.key in manager.entries
+    assert handle3.key in manager.entries
+
+
+def test_assetmanager_destroys_at_collect():
+    manager = AssetManager(None, memory_budget=0)
+    handle = manager.load('a.png', FakeFactory())
+    asset = handle.asset
+
+    handle.release()
+    assert manager.evicted == [asset]
+    assert not asset.destroyed
+
+    manager.collect()
+    assert asset.destroyed
+    assert not manager.evicted
+
+
+def test_assetmanager_rejects_unhashable_options():
+    manager = AssetManager(None)
+    with pytest.raises(VulkError):
+        manager.load('a.png', FakeFactory(), memory_size=[100])
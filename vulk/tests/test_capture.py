@@ -0,0 +1,55 @@
+from vulk import capture
+
+import struct
+import zlib
+
+import numpy as np
+
+
+def test_encode_png_chunks():
+    pixels = np.arange(2 * 3 * 4, dtype=np.uint8).reshape(2, 3, 4)
+    png = capture.encode_png(pixels)
+    assert png.startswith(capture.PNG_SIGNATURE)
+
+    # Read chunks and check their CRC
+    chunks = {}
+    offset = len(capture.PNG_SIGNATURE)
+    while offset < len(png):
+        length, = struct.unpack('>I', png[offset:offset + 4])
+        name = png[offset + 4:offset + 8]
+        data = png[offset + 8:offset + 8 + length]
+        crc, = struct.unpack('>I', png[offset + 8 + length:
+                                       offset + 12 + length])
+        assert crc == zlib.crc32(name + data) & 0xffffffff
+        chunks[name] = data
+        offset += length + 12
+
+    width, height = struct.unpack('>II', chunks[b'IHDR'][:8])
+    assert (width, height) == (3, 2)
+    assert b'IEND' in chunks
+
+
+def test_encode_png_rows():
+    pixels = np.arange(2 * 3 * 4, dtype=np.uint8).reshape(2, 3, 4)
+    png = capture.encode_png(pixels)
+    start = png.index(b'IDAT') + 4
+    length, = struct.unpack('>I', png[start - 8:start - 4])
+    raw = zlib.decompress(png[start:start + length])
+    rows = np.frombuffer(raw, dtype=np.uint8).reshape(2, 13)
+    assert (rows[:, 0] == 0).all()
+    assert (rows[:, 1:] == pixels.reshape(2, 12)).all()
+
+
+def test_rgba_to_yuv444_limits():
+    pixels = np.zeros((1, 2, 4), dtype=np.uint8)
+    pixels[0, 1] = 255
+    planes = np.frombuffer(capture.rgba_to_yuv444(pixels), dtype=np.uint8)
+    y, u, v = planes.reshape(3, 2)
+    assert list(y) == [16, 235]
+    assert list(u) == [128, 128]
+    assert list(v) == [128, 128]
+
+
+def test_rgba_to_yuv444_planar_size():
+    pixels = np.full((4, 5, 4), 100, dtype=np.uint8)
+    assert len(capture.rgba_to_yuv444(pixels)) == 3 * 4 * 5
@@ -0,0 +1,63 @@
+from vulk import profile
+
+
+def teardown_function(function):
+    profile.disable()
+
+
+def test_zone_nesting_depth():
+    profile.enable()
+    with profile.zone('parent'):
+        with profile.zone('child'):
+            pass
+    samples = profile.disable().samples()
+    assert [(s[0], s[3]) for s in samples] == [('child', 1), ('parent', 0)]
+    child, parent = samples
+    assert parent[1] <= child[1] <= child[2] <= parent[2]
+
+
+def test_ring_buffer_wraparound():
+    profiler = profile.Profiler(3)
+    for i in range(5):
+        profiler.add(str(i), i, i + 1, 0)
+    assert [s[0] for s in profiler.samples()] == ['2', '3', '4']
+    profiler.clear()
+    assert profiler.samples() == []
+
+
+def test_disabled_zone_is_noop():
+    @profile.profiled('add')
+    def add(a, b):
+        return a + b
+
+    assert not profile.is_enabled()
+    with profile.zone('ignored'):
+        assert add(1, 2) == 3
+    assert profile.chrome_trace() == {'traceEvents': [],
+                                      'displayTimeUnit': 'ms'}
+
+
+def test_profiled_records_calls():
+    @profile.profiled('add')
+    def add(a, b):
+        return a + b
+
+    profile.enable()
+    assert add(1, 2) == 3
+    assert [s[0] for s in profile.disable().samples()] == ['add']
+
+
+def test_chrome_trace_shape():
+    profiler = profile.Profiler()
+    profiler.add('child', 1.0, 1.5, 1)
+    profiler.add('parent', 1.0, 2.0, 0)
+    trace = profile.chrome_trace(profiler)
+    assert trace['displayTimeUnit'] == 'ms'
+    events = trace['traceEvents']
+    assert [e['name'] for e in events] == ['parent', 'child']
+    parent = events[0]
+    assert parent['ph'] == 'X'
+    assert parent['ts'] == 1000000
+    assert parent['dur'] == 1000000
+    assert set(parent) == {'name', 'cat', 'ph', 'ts', 'dur', 'pid', 'tid',
+                           'args'}
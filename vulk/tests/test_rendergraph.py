@@ -0,0 +1,51 @@
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import pytest
+
+from vulk.exception import VulkError
+from vulk.graphic.rendergraph import GraphPass, RenderGraph
+
+
+def sort(*passes):
+    '''Return names of sorted passes, only `passes` is used by the sort'''
+    graph = SimpleNamespace(passes=OrderedDict((p.name, p) for p in passes))
+    return [p.name for p in RenderGraph.sort_passes(graph)]
+
+
+def make_pass(name, writes=RenderGraph.FINAL, reads=()):
+    return GraphPass(name, None, None, writes, reads, None)
+
+
+def test_sort_readers_after_writers():
+    order = sort(make_pass('compose', reads=['scene']),
+                 make_pass('scene', writes='scene'))
+    assert order == ['scene', 'compose']
+
+
+def test_sort_same_target_keeps_declaration_order():
+    order = sort(make_pass('ui'),
+                 make_pass('background', writes='scene'),
+                 make_pass('compose', reads=['scene']),
+                 make_pass('overlay'))
+    assert order == ['ui', 'background', 'compose', 'overlay']
+
+
+def test_sort_culls_unused_passes():
+    order = sort(make_pass('shadows', writes='shadow'),
+                 make_pass('scene'))
+    assert order == ['scene']
+
+
+def test_sort_keeps_indirect_dependencies():
+    order = sort(make_pass('blur', writes='blurred', reads=['scene']),
+                 make_pass('scene', writes='scene'),
+                 make_pass('compose', reads=['blurred']))
+    assert order == ['scene', 'blur', 'compose']
+
+
+def test_sort_detects_cycles():
+    with pytest.raises(VulkError):
+        sort(make_pass('a', writes='a', reads=['b']),
+             make_pass('b', writes='b', reads=['a']),
+             make_pass('compose', reads=['a']))
@@ -0,0 +1,165 @@
+from vulk import vulkanconstant as vc
+from vulk.exception import VulkError
+from vulk.graphic import texture
+
+import numpy as np
+import pytest
+import struct
+
+
+def test_mipmap_pyramid_sizes():
+    bitmap = bytes([100] * 4 * 4 * 4)
+    levels = texture.mipmap_pyramid(bitmap, 4, 4, 4, 3)
+    assert [level.shape for level in levels] == [(2, 2, 4), (1, 1, 4)]
+    assert all((level == 100).all() for level in levels)
+
+
+def test_mipmap_pyramid_box_filter():
+    levels = texture.mipmap_pyramid(bytes([0, 10, 20, 30]), 2, 2, 1, 2)
+    assert levels[0].tolist() == [[[15]]]
+
+
+def test_mipmap_pyramid_odd_size_keeps_all_texels():
+    levels = texture.mipmap_pyramid(bytes([0, 30, 60]), 3, 1, 1, 2)
+    assert levels[0].tolist() == [[[30]]]
+
+
+def test_mipmap_pyramid_writes_outputs():
+    output = bytearray(1)
+    levels = texture.mipmap_pyramid(bytes([8, 8, 8, 8]), 2, 2, 1, 2,
+                                    outputs=[output])
+    assert output == bytearray([8])
+    assert levels[0].tolist() == [[[8]]]
+
+
+def test_mipmap_pyramid_rejects_components():
+    with pytest.raises(ValueError):
+        texture.mipmap_pyramid(bytes(5), 1, 1, 5, 1)
+    with pytest.raises(ValueError):
+        texture.mipmap_pyramid(bytes(4), 2, 2, 1, 2, outputs=[])
+
+
+def test_skyline_packer_fills_area():
+    packer = texture.SkylinePacker(4, 4)
+    positions = [packer.insert(2, 2) for _ in range(4)]
+    assert sorted(positions) == [(0, 0), (0, 2), (2, 0), (2, 2)]
+    assert packer.insert(1, 1) is None
+
+
+def test_skyline_packer_rejects_too_big():
+    packer = texture.SkylinePacker(4, 4)
+    assert packer.insert(5, 1) is None
+    assert packer.insert(1, 5) is None
+
+
+def test_skyline_packer_bottom_left():
+    packer = texture.SkylinePacker(8, 8)
+    assert packer.insert(4, 4) == (0, 0)
+    assert packer.insert(2, 2) == (4, 0)
+    # Lowest top wins
+    assert packer.insert(2, 4) == (6, 0)
+    assert packer.insert(2, 1) == (4, 2)
+
+
+def test_skyline_packer_no_overlap():
+    rng = np.random.RandomState(0)
+    packer = texture.SkylinePacker(64, 64)
+    used = np.zeros((64, 64), dtype=np.int32)
+    for _ in range(200):
+        width, height = rng.randint(1, 12, size=2)
+        position = packer.insert(width, height)
+        if position is None:
+            continue
+        x, y = position
+        assert x + width <= 64 and y + height <= 64
+        used[y:y + height, x:x + width] += 1
+    assert used.max() == 1
+
+
+def test_texture_loader_returns_placeholder_while_pending(monkeypatch):
+    # Only the Vulkan side of textures is skipped, bitmaps are real
+    def noop(*args, **kwargs):
+        pass
+
+    for name in ('init_texture', 'init_view', 'init_sampler', 'upload',
+                 'destroy'):
+        monkeypatch.setattr(texture.RawTexture, name, noop)
+    monkeypatch.setattr(texture.BinaryTexture, 'generate_mipmaps', noop)
+
+    loader = texture.TextureLoader(None, workers=1)
+    assert loader.placeholder.bitmap.tolist() == [255] * 4
+
+    future = loader.load_async('missing.png')
+    assert loader.get(future) is loader.placeholder
+    assert not future.done()
+
+    loader.shutdown(None)
+    assert loader.placeholder is None
+
+
+def make_ktx(internal_format, width, height, level_sizes, kv_size=0):
+    data = bytearray(texture._KTX_IDENTIFIER)
+    data += struct.pack('<13I', 0x04030201, 0, 1, 0, internal_format, 0,
+                        width, height, 0, 0, 1, len(level_sizes), kv_size)
+    data += bytes(kv_size)
+    for size in level_sizes:
+        data += struct.pack('<I', size)
+        data += bytes((size + 3) & ~3)
+    return bytes(data)
+
+
+def make_dds(fourcc, width, height, mip_levels, data_size, dxgi_format=0):
+    data = bytearray(b'DDS ')
+    data += struct.pack('<7I44x2I4s', 124, 0, height, width, 0, 0,
+                        mip_levels, 32, 4, fourcc)
+    data += bytes(128 - len(data))
+    if dxgi_format:
+        data += struct.pack('<5I', dxgi_format, 3, 0, 1, 0)
+    return bytes(data + bytes(data_size))
+
+
+def test_format_size():
+    assert vc.format_size(vc.Format.R8G8B8A8_UNORM, 3, 3) == 36
+    assert vc.format_size(vc.Format.BC1_RGBA_UNORM_BLOCK, 6, 6) == 32
+    assert vc.format_size(vc.Format.BC1_RGBA_UNORM_BLOCK, 1, 1) == 8
+    assert vc.format_size(vc.Format.BC3_UNORM_BLOCK, 5, 3) == 32
+    assert vc.format_size(vc.Format.ASTC_10x5_UNORM_BLOCK, 13, 6) == 64
+    assert vc.format_compressed(vc.Format.BC7_UNORM_BLOCK)
+    assert not vc.format_compressed(vc.Format.R8G8B8A8_UNORM)
+
+
+def test_parse_ktx():
+    data = make_ktx(0x83F1, 6, 6, [32, 8, 8], kv_size=8)
+    texture_format, width, height, levels = \
+        texture.CompressedTexture.parse_ktx(data)
+    assert texture_format == vc.Format.BC1_RGBA_UNORM_BLOCK
+    assert (width, height) == (6, 6)
+    assert levels == [(76, 32), (112, 8), (124, 8)]
+
+
+def test_parse_ktx_rejects_wrong_level_size():
+    data = make_ktx(0x83F1, 6, 6, [32, 16])
+    with pytest.raises(VulkError):
+        texture.CompressedTexture.parse_ktx(data)
+
+
+def test_parse_dds():
+    data = make_dds(b'DXT5', 10, 6, 3, 96 + 32 + 16)
+    texture_format, width, height, levels = \
+        texture.CompressedTexture.parse_dds(data)
+    assert texture_format == vc.Format.BC3_UNORM_BLOCK
+    assert (width, height) == (10, 6)
+    assert levels == [(128, 96), (224, 32), (256, 16)]
+
+
+def test_parse_dds_dx10():
+    data = make_dds(b'DX10', 4, 4, 1, 16, dxgi_format=98)
+    texture_format, _, _, levels = texture.CompressedTexture.parse_dds(data)
+    assert texture_format == vc.Format.BC7_UNORM_BLOCK
+    assert levels == [(148, 16)]
+
+
+def test_parse_dds_rejects_truncated_file():
+    data = make_dds(b'DXT1', 8, 8, 2, 32)
+    with pytest.raises(VulkError):
+        texture.CompressedTexture.parse_dds(data)
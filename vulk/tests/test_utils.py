@@ -5,3 +5,32 @@ import numbers
 
 def test_returns_number():
     assert isinstance(util.millis(), numbers.Number)
+
+
+def test_frame_limiter_waits_frame_time():
+    limiter = util.FrameLimiter(200)
+    start = util.millis()
+    for _ in range(5):
+        limiter.wait()
+    assert util.millis() - start >= 5 * limiter.frame_time
+
+
+def test_frame_limiter_unlimited():
+    limiter = util.FrameLimiter()
+    limiter.wait()
+    assert limiter.deadline is None
+
+
+def test_resolution_controller_decreases_over_budget():
+    controller = util.ResolutionController(60, min_scale=0.5, cooldown=5)
+    for _ in range(100):
+        scale = controller.update(40)
+    assert scale == 0.5
+
+
+def test_resolution_controller_increases_under_budget():
+    controller = util.ResolutionController(60, cooldown=1)
+    controller.scale = 0.5
+    for _ in range(3):
+        scale = controller.update(5)
+    assert scale == 0.8
@@ -0,0 +1,4 @@
+"""Command line tools to prepare assets
+
+Each tool is a module which can be run with `python -m vulk.tools.<name>`.
+"""
@@ -0,0 +1,193 @@
+'''Pack a directory of images into a texture atlas
+
+Run it with `python -m vulk.tools.atlas`. Images are packed into pages of
+fixed size. The manifest `<output>` maps the name of each image (its path
+relative to `<directory>`, without extension) to its page and rectangle.
+Pages are written next to it, `ui.atlas` pages are `ui.0.page`,
+`ui.1.page`... They contain all the mip levels, raw pixels ready to be
+copied in staging buffers. Load the atlas with
+`vulk.graphic.texture.TextureAtlas.load`.
+
+To avoid bleeding between images in the smallest mip levels, the padding
+should be close to `2 ^ (mip_levels - 1)`.
+
+Usage:
+    atlas <directory> <output> [options]
+
+Options:
+    --size=<px>         Width and height of pages [default: 2048]
+    --padding=<px>      Empty pixels between images [default: 2]
+    --extrude=<px>      Border pixels repeated around images [default: 1]
+    --mip-levels=<n>    Number of mip levels, 0 until 1x1 [default: 0]
+    --components=<c>    Components per pixel of pages [default: 4]
+'''
+import os
+
+from docopt import docopt
+import numpy as np
+
+from vulk.exception import VulkError
+from vulk.graphic.texture import (ATLAS_HEADER, ATLAS_MAGIC, ATLAS_NAME,
+                                  ATLAS_REGION, ATLAS_VERSION,
+                                  SkylinePacker, Texture, TextureAtlas,
+                                  _blit_extruded, mipmap_pyramid)
+from vulk.util import mipmap_levels
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tga', '.gif')
+
+
+def find_images(directory):
+    """Return the name and path of all images in `directory`
+
+    Args:
+        directory (str): Directory searched recursively
+
+    Returns:
+        list[tuple(name, path)] sorted by name
+    """
+    images = []
+    for root, _, files in os.walk(directory):
+        for f in files:
+            stem, extension = os.path.splitext(f)
+            if extension.lower() not in IMAGE_EXTENSIONS:
+                continue
+            name = os.path.relpath(os.path.join(root, stem), directory)
+            images.append((name.replace(os.sep, '/'), os.path.join(root, f)))
+
+    return sorted(images)
+
+
+def convert_components(pixels, components):
+    """Convert pixels of shape (height, width, c) to `components`
+
+    Missing color channels are copied from the luminance and a missing
+    alpha channel is opaque.
+
+    Args:
+        pixels (ndarray): Uint8 pixels
+        components (int): Wanted number of components
+
+    Returns:
+        ndarray
+    """
+    current = pixels.shape[2]
+    if current == components:
+        return pixels
+
+    rgba = np.full(pixels.shape[:2] + (4,), 255, dtype=np.uint8)
+    if current < 3:
+        rgba[..., :3] = pixels[..., :1]
+    else:
+        rgba[..., :3] = pixels[..., :3]
+    if current in (2, 4):
+        rgba[..., 3] = pixels[..., -1]
+
+    if components == 2:
+        return rgba[..., [0, 3]]
+    return rgba[..., :components]
+
+
+def build_atlas(images, size, padding, extrude, components):
+    """Pack images into pages
+
+    Args:
+        images (list): List of tuple(name, path)
+        size (int): Width and height of pages
+        padding (int): Empty pixels between images
+        extrude (int): Border pixels repeated around images
+        components (int): Components per pixel of pages
+
+    Returns:
+        tuple(pages, regions) with pages a list of ndarray and regions a
+        list of tuple(name, page, x, y, width, height)
+    """
+    loaded = []
+    for name, path in images:
+        raw_bitmap, width, height, image_components = Texture.load_file(path)
+        pixels = np.frombuffer(raw_bitmap, dtype=np.uint8).reshape(
+            height, width, image_components)
+        loaded.append((name, convert_components(pixels, components)))
+
+    # Tallest images first, it wastes less space
+    loaded.sort(key=lambda image: image[1].shape[:2], reverse=True)
+
+    pages = []
+    packers = []
+    regions = []
+    for name, pixels in loaded:
+        height, width = pixels.shape[:2]
+        cell_width = width + 2 * extrude + padding
+        cell_height = height + 2 * extrude + padding
+        if cell_width > size or cell_height > size:
+            raise VulkError("Image %s is too big for pages %sx%s" %
+                            (name, size, size))
+
+        for page, packer in enumerate(packers):
+            position = packer.insert(cell_width, cell_height)
+            if position:
+                break
+        else:
+            pages.append(np.zeros((size, size, components), dtype=np.uint8))
+            packers.append(SkylinePacker(size, size))
+            page = len(pages) - 1
+            position = packers[page].insert(cell_width, cell_height)
+
+        x, y = position
+        _blit_extruded(pages[page], pixels, x, y, extrude)
+        regions.append((name, page, x + extrude, y + extrude,
+                        width, height))
+
+    return pages, sorted(regions)
+
+
+def write_atlas(output, pages, regions, size, mip_levels):
+    """Write the manifest and the page files
+
+    Args:
+        output (str): Path of the manifest
+        pages (list): List of ndarray of shape (size, size, components)
+        regions (list): List of tuple(name, page, x, y, width, height)
+        size (int): Width and height of pages
+        mip_levels (int): Number of mip levels
+    """
+    components = pages[0].shape[2] if pages else 4
+    texture_format = Texture.components_to_format(components)
+
+    with open(output, 'wb') as f:
+        f.write(ATLAS_HEADER.pack(
+            ATLAS_MAGIC, ATLAS_VERSION, texture_format.value, size, size,
+            mip_levels, len(pages), len(regions)))
+        for name, page, x, y, width, height in regions:
+            encoded = name.encode('utf-8')
+            f.write(ATLAS_NAME.pack(len(encoded)))
+            f.write(encoded)
+            f.write(ATLAS_REGION.pack(
+                page, x, y, width, height, x / size, y / size,
+                (x + width) / size, (y + height) / size))
+
+    for index, page in enumerate(pages):
+        with open(TextureAtlas.page_path(output, index), 'wb') as f:
+            f.write(page.tobytes())
+            for level in mipmap_pyramid(page, size, size, components,
+                                        mip_levels):
+                f.write(level.tobytes())
+
+
+def main():
+    arguments = docopt(__doc__)
+    size = int(arguments['--size'])
+    mip_levels = int(arguments['--mip-levels']) or mipmap_levels(size, size)
+    components = int(arguments['--components'])
+
+    images = find_images(arguments['<directory>'])
+    pages, regions = build_atlas(
+        images, size, int(arguments['--padding']),
+        int(arguments['--extrude']), components)
+    write_atlas(arguments['<output>'], pages, regions, size, mip_levels)
+
+    print("%d images packed in %d pages of %dx%d (%d mip levels)" %
+          (len(regions), len(pages), size, size, mip_levels))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,10 @@
+import logging
 import time
 
+from vulk.exception import VulkError
+
+logger = logging.getLogger()
+
 
 def millis():
     """Return the time in milliseconds"""
@@ -59,6 +64,131 @@ def mipmap_levels(base_width, base_height):
     return levels
 
 
+class FrameLimiter():
+    """Limit the number of frames per second
+
+    `wait` sleeps until the deadline of the frame minus `spin`
+    milliseconds, then spins until the deadline. Sleeping saves CPU and
+    spinning gives a precise frame pacing despite the sleep granularity
+    of the OS.
+    """
+
+    def __init__(self, fps=0, spin=2):
+        """
+        Args:
+            fps (int): Max number of frames per second (0 = unlimited)
+            spin (float): Milliseconds spent spinning before the deadline
+        """
+        self.fps = fps
+        self.spin = spin
+        self.deadline = None
+
+    @property
+    def frame_time(self):
+        """Duration of a frame in milliseconds (0 if unlimited)"""
+        return 1000 / self.fps if self.fps else 0
+
+    def wait(self):
+        """Wait for the end of the current frame"""
+        if not self.fps:
+            return
+
+        now = millis()
+        if self.deadline is None:
+            self.deadline = now
+        self.deadline += self.frame_time
+
+        # Too late, don't try to catch up with several fast frames
+        if self.deadline < now - self.frame_time:
+            self.deadline = now
+            return
+
+        sleep_time = self.deadline - now - self.spin
+        if sleep_time > 0:
+            time.sleep(sleep_time / 1000)
+
+        while millis() < self.deadline:
+            pass
+
+
+class ResolutionController():
+    """Adjust the render scale from the frame times
+
+    The smoothed frame time is compared to the budget of `target_fps`.
+    Over budget, the scale decreases by `step`, under `headroom` times the
+    budget, it increases by `step`. Since a new scale recreates the final
+    image, the scale changes at most every `cooldown` frames.
+    """
+
+    def __init__(self, target_fps=60, min_scale=0.5, max_scale=1,
+                 step=0.1, headroom=0.8, cooldown=30, smoothing=0.1):
+        """
+        Args:
+            target_fps (int): Wanted number of frames per second
+            min_scale (float): Lowest scale of the window size
+            max_scale (float): Highest scale of the window size
+            step (float): Scale change when adjusting
+            headroom (float): Fraction of the budget under which the scale
+                              increases
+            cooldown (int): Minimum number of frames between two changes
+            smoothing (float): Weight of the last frame time in the
+                               average (0 < smoothing <= 1)
+        """
+        if not 0 < min_scale <= max_scale:
+            msg = "Resolution scales must be 0 < min_scale <= max_scale"
+            logger.error(msg)
+            raise VulkError(msg)
+
+        self.target_fps = target_fps
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.step = step
+        self.headroom = headroom
+        self.cooldown = cooldown
+        self.smoothing = smoothing
+        self.scale = max_scale
+        self.average = None
+        self.frames = 0
+
+    @property
+    def frame_time(self):
+        """Budget of a frame in milliseconds"""
+        return 1000 / self.target_fps
+
+    def update(self, frame_time):
+        """Register the duration of a frame and return the scale to use
+
+        Args:
+            frame_time (float): Duration of the frame in milliseconds
+
+        Returns:
+            float: Scale of the window size
+        """
+        if self.average is None:
+            self.average = frame_time
+        else:
+            self.average += self.smoothing * (frame_time - self.average)
+
+        self.frames += 1
+        if self.frames < self.cooldown:
+            return self.scale
+
+        scale = self.scale
+        if self.average > self.frame_time:
+            scale -= self.step
+        elif self.average < self.frame_time * self.headroom:
+            scale += self.step
+        scale = round(min(max(scale, self.min_scale), self.max_scale), 4)
+
+        if scale != self.scale:
+            # Previous frame times are not relevant at the new scale
+            self.scale = scale
+            self.average = None
+            self.frames = 0
+
+        return self.scale
+
+
 def next_multiple(query, multiple):
     """Get the next multiple
 
@@ -419,6 +419,23 @@ class Format(IntEnum):
     ASTC_12x12_SRGB_BLOCK = vk.VK_FORMAT_ASTC_12x12_SRGB_BLOCK
 
 
+class FormatFeature(IntFlag):
+    NONE = 0
+    SAMPLED_IMAGE = vk.VK_FORMAT_FEATURE_SAMPLED_IMAGE_BIT
+    STORAGE_IMAGE = vk.VK_FORMAT_FEATURE_STORAGE_IMAGE_BIT
+    STORAGE_IMAGE_ATOMIC = vk.VK_FORMAT_FEATURE_STORAGE_IMAGE_ATOMIC_BIT
+    UNIFORM_TEXEL_BUFFER = vk.VK_FORMAT_FEATURE_UNIFORM_TEXEL_BUFFER_BIT
+    STORAGE_TEXEL_BUFFER = vk.VK_FORMAT_FEATURE_STORAGE_TEXEL_BUFFER_BIT
+    STORAGE_TEXEL_BUFFER_ATOMIC = vk.VK_FORMAT_FEATURE_STORAGE_TEXEL_BUFFER_ATOMIC_BIT # noqa
+    VERTEX_BUFFER = vk.VK_FORMAT_FEATURE_VERTEX_BUFFER_BIT
+    COLOR_ATTACHMENT = vk.VK_FORMAT_FEATURE_COLOR_ATTACHMENT_BIT
+    COLOR_ATTACHMENT_BLEND = vk.VK_FORMAT_FEATURE_COLOR_ATTACHMENT_BLEND_BIT
+    DEPTH_STENCIL_ATTACHMENT = vk.VK_FORMAT_FEATURE_DEPTH_STENCIL_ATTACHMENT_BIT # noqa
+    BLIT_SRC = vk.VK_FORMAT_FEATURE_BLIT_SRC_BIT
+    BLIT_DST = vk.VK_FORMAT_FEATURE_BLIT_DST_BIT
+    SAMPLED_IMAGE_FILTER_LINEAR = vk.VK_FORMAT_FEATURE_SAMPLED_IMAGE_FILTER_LINEAR_BIT # noqa
+
+
 class FormatType(Enum):
     '''Mapping between `Format` and `(DataType, num_components)`'''
     R8_UNORM = (DataType.UNORM8, 1)
@@ -598,6 +615,13 @@ class PolygonMode(IntEnum):
     POINT = vk.VK_POLYGON_MODE_POINT
 
 
+class PresentMode(IntEnum):
+    IMMEDIATE = vk.VK_PRESENT_MODE_IMMEDIATE_KHR
+    MAILBOX = vk.VK_PRESENT_MODE_MAILBOX_KHR
+    FIFO = vk.VK_PRESENT_MODE_FIFO_KHR
+    FIFO_RELAXED = vk.VK_PRESENT_MODE_FIFO_RELAXED_KHR
+
+
 class PrimitiveTopology(IntEnum):
     NONE = 0
     POINT_LIST = vk.VK_PRIMITIVE_TOPOLOGY_POINT_LIST
@@ -613,6 +637,20 @@ class PrimitiveTopology(IntEnum):
     PATCH_LIST = vk.VK_PRIMITIVE_TOPOLOGY_PATCH_LIST
 
 
+class QueryResult(IntFlag):
+    NONE = 0
+    RESULT_64 = vk.VK_QUERY_RESULT_64_BIT
+    WAIT = vk.VK_QUERY_RESULT_WAIT_BIT
+    WITH_AVAILABILITY = vk.VK_QUERY_RESULT_WITH_AVAILABILITY_BIT
+    PARTIAL = vk.VK_QUERY_RESULT_PARTIAL_BIT
+
+
+class QueryType(IntEnum):
+    OCCLUSION = vk.VK_QUERY_TYPE_OCCLUSION
+    PIPELINE_STATISTICS = vk.VK_QUERY_TYPE_PIPELINE_STATISTICS
+    TIMESTAMP = vk.VK_QUERY_TYPE_TIMESTAMP
+
+
 class SampleCount(IntFlag):
     NONE = 0
     COUNT_1 = vk.VK_SAMPLE_COUNT_1_BIT
@@ -738,6 +776,65 @@ def format_info(f):
     return data_type, num_components, size
 
 
+def format_block_info(f):
+    '''Return the block size of format `f`
+
+    Compressed formats store pixels by blocks, uncompressed formats are
+    considered as 1x1 blocks.
+
+    *Parameters:*
+
+    - `f`: `Format`
+
+    *Returns:*
+
+    Tuple containing:
+
+    - Block width in pixels
+    - Block height in pixels
+    - Block size in bytes
+    '''
+    name = f.name
+    if name.startswith(('BC1', 'BC4')):
+        return 4, 4, 8
+    if name.startswith('BC'):
+        return 4, 4, 16
+    if name.startswith(('ETC2_R8G8B8_', 'ETC2_R8G8B8A1', 'EAC_R11_')):
+        return 4, 4, 8
+    if name.startswith(('ETC2', 'EAC')):
+        return 4, 4, 16
+    if name.startswith('ASTC'):
+        width, height = name.split('_')[1].split('x')
+        return int(width), int(height), 16
+
+    return 1, 1, format_info(f)[2]
+
+
+def format_compressed(f):
+    '''Return `True` if format `f` is block compressed
+
+    *Parameters:*
+
+    - `f`: `Format`
+    '''
+    return f.name.endswith('_BLOCK')
+
+
+def format_size(f, width, height):
+    '''Return the size in bytes of an image of format `f`
+
+    *Parameters:*
+
+    - `f`: `Format`
+    - `width`: Image width
+    - `height`: Image height
+    '''
+    block_width, block_height, block_size = format_block_info(f)
+    blocks_x = (width + block_width - 1) // block_width
+    blocks_y = (height + block_height - 1) // block_height
+    return blocks_x * blocks_y * block_size
+
+
 def index_type_size(t):
     '''Return the size in byte of the index type
 
@@ -26,6 +26,7 @@ import vulkan as vk  # pylint: disable=import-error
 import pyvma as vma
 
 from vulk.exception import VulkError
+from vulk import profile
 from vulk import vulkanconstant as vc
 from vulk.util import mipmap_size, next_multiple
 
@@ -40,8 +41,126 @@ def btov(b):
     return vk.VK_TRUE if b else vk.VK_FALSE
 
 
+def current_upload_queue(context):
+    '''Return the upload queue of the context if a batch is open
+
+    *Parameters:*
+
+    - `context`: `VulkContext`
+
+    *Returns:*
+
+    `UploadQueue` or `None`
+    '''
+    upload_queue = getattr(context, 'upload_queue', None)
+    if upload_queue and upload_queue.batching:
+        return upload_queue
+    return None
+
+
+def first_upload_queue(context, upload_queue, sharing_mode):
+    '''Return the upload queue to record the first upload of a resource
+
+    First uploads go to the dedicated transfer queue when it exists. Next
+    uploads stay on the graphic queue, which owns the resource and may still
+    read it. Resources shared between queues are never transferred.
+
+    *Parameters:*
+
+    - `context`: `VulkContext`
+    - `upload_queue`: `UploadQueue` of the open batch or `None`
+    - `sharing_mode`: `SharingMode` of the resource
+
+    *Returns:*
+
+    `UploadQueue` or `None` if the upload doesn't use the transfer queue
+    '''
+    upload_queue = upload_queue or getattr(context, 'upload_queue', None)
+    if upload_queue and upload_queue.transfer and \
+       sharing_mode == vc.SharingMode.EXCLUSIVE:
+        return upload_queue
+    return None
+
+
+def find_memory_type_index(context, memory_type_bits, vma_usage):
+    '''Return the memory type VMA would choose for an usage
+
+    *Parameters:*
+
+    - `context`: `VulkContext`
+    - `memory_type_bits`: Bitmask of acceptable memory types (from
+                          `VkMemoryRequirements`)
+    - `vma_usage`: `VmaMemoryUsage` vulk constant
+
+    *Returns:*
+
+    Index of the memory type
+    '''
+    vma_alloc_info = vma.VmaAllocationCreateInfo(usage=vma_usage)
+    return vma.vmaFindMemoryTypeIndex(context.vma_allocator,
+                                      memory_type_bits, vma_alloc_info)
+
+
+def format_features(context, image_format, tiling=vc.ImageTiling.OPTIMAL):
+    '''Return the features supported by the physical device for a format
+
+    *Parameters:*
+
+    - `context`: `VulkContext`
+    - `image_format`: `Format` vulk constant
+    - `tiling`: `ImageTiling` vulk constant
+
+    *Returns:*
+
+    `FormatFeature` vulk constant
+    '''
+    properties = vk.vkGetPhysicalDeviceFormatProperties(
+        context.physical_device, image_format)
+    if tiling == vc.ImageTiling.LINEAR:
+        return vc.FormatFeature(properties.linearTilingFeatures)
+    return vc.FormatFeature(properties.optimalTilingFeatures)
+
+
+@contextmanager
+def immediate_buffer(context, commandpool=None, wait=True):
+    '''
+    Manage a commandbuffer for one time submit.
+
+    The commandbuffer and its fence come from the `ImmediatePool` of the
+    context, only this submission is waited, not the whole queue. With
+    `wait=False`, the function returns once the commandbuffer is submitted
+    and the `UploadToken` of the submission is stored in
+    `context.immediate_pool.last_token`, it allows to overlap many one time
+    operations. If commandpool is given, the commandbuffer is allocated in
+    it and always waited.
+
+    *Parameters:*
+
+    - `context`: `VulkContext`
+    - `commandpool`: `CommandPool` (optional)
+    - `wait`: Wait for the end of the submission
+    '''
+    with profile.zone('immediate_buffer'):
+        immediate_pool = getattr(context, 'immediate_pool', None)
+        if commandpool or not immediate_pool:
+            with _pool_immediate_buffer(context, commandpool) as cmd:
+                yield cmd
+            return
+
+        commandbuffer, fence = immediate_pool.acquire()
+        try:
+            flags = vc.CommandBufferUsage.ONE_TIME_SUBMIT
+            with commandbuffer.bind(flags) as cmd:
+                yield cmd
+        finally:
+            token = immediate_pool.submit(commandbuffer, fence)
+
+        if wait:
+            token.wait()
+
+
 @contextmanager
-def immediate_buffer(context, commandpool=None):
+def _pool_immediate_buffer(context, commandpool=None):
     '''
     Manage creation and destruction of commandbuffer for one time submit.
     If commandpool is not given, it is created here.
@@ -58,6 +177,7 @@ def immediate_buffer(context, commandpool=None):
             vc.CommandPoolCreate.TRANSIENT)
         own_commandpool = True
 
+    fence = Fence(context)
     try:
         commandbuffers = commandpool.allocate_buffers(
             context, vc.CommandBufferLevel.PRIMARY, 1)
@@ -65,26 +185,17 @@ def immediate_buffer(context, commandpool=None):
         with commandbuffers[0].bind(flags) as cmd:
             yield cmd
     finally:
-        submit = vk.VkSubmitInfo(
-            sType=vk.VK_STRUCTURE_TYPE_SUBMIT_INFO,
-            waitSemaphoreCount=0,
-            pWaitSemaphores=None,
-            pWaitDstStageMask=None,
-            commandBufferCount=1,
-            pCommandBuffers=[c.commandbuffer for c in commandbuffers],
-            signalSemaphoreCount=0,
-            pSignalSemaphores=None
-        )
-
-        vk.vkQueueSubmit(context.graphic_queue, 1, [submit], None)
-        vk.vkQueueWaitIdle(context.graphic_queue)
+        submit = SubmitInfo([], [], [], commandbuffers)
+        submit_to_graphic_queue(context, [submit], fence)
+        fence.wait(context)
+        fence.destroy(context)
         commandpool.free_buffers(context, commandbuffers)
 
         if own_commandpool:
             commandpool.destroy(context)
 
 
-def submit_to_graphic_queue(context, submits):
+def submit_to_graphic_queue(context, submits, fence=None):
     '''
     Convenient function to submit commands to graphic queue
 
@@ -92,11 +203,12 @@ def submit_to_graphic_queue(context, submits):
 
     - `context`: `VulkContext`
     - `submits`: `list` of `SubmitInfo`
+    - `fence`: `Fence` signaled when all submits are done (optional)
     '''
-    submit_to_queue(context.graphic_queue, submits)
+    submit_to_queue(context.graphic_queue, submits, fence)
 
 
-def submit_to_queue(queue, submits):
+def submit_to_queue(queue, submits, fence=None):
     '''
     Submit commands to queue
 
@@ -104,6 +216,7 @@ def submit_to_queue(queue, submits):
 
     - `queue`: `VkQueue`
     - `submits`: `list` of `SubmitInfo`
+    - `fence`: `Fence` signaled when all submits are done (optional)
     '''
     vk_submits = []
     for s in submits:
@@ -130,7 +243,8 @@ def submit_to_queue(queue, submits):
             pSignalSemaphores=signal_semaphores
         ))
 
-    vk.vkQueueSubmit(queue, len(vk_submits), vk_submits, None)
+    vk_fence = fence.fence if fence else None
+    vk.vkQueueSubmit(queue, len(vk_submits), vk_submits, vk_fence)
 
 
 def update_descriptorsets(context, writes, copies):
@@ -469,6 +583,19 @@ PipelineViewportState.__doc__ = '''
     '''
 
 
+PushConstantRange = namedtuple('PushConstantRange',
+                               ['stage', 'offset', 'size'])
+PushConstantRange.__doc__ = '''
+    Range of push constants accessible by shader stages
+
+    *Parameters:*
+
+    - `stage`: `ShaderStage` vulk constant
+    - `offset`: Start of the range in bytes (multiple of 4)
+    - `size`: Size of the range in bytes (multiple of 4)
+    '''
+
+
 Rect2D = namedtuple('Rect2d', ['offset', 'extent'])
 Rect2D.__doc__ = '''
     2D surface with offset.
@@ -607,7 +734,7 @@ class Buffer():
     """`Buffer` wrap a `VkBuffer` and a `VkMemory`"""
 
     def __init__(self, context, flags, size, usage, sharing_mode,
-                 queue_families, vma_usage):
+                 queue_families, vma_usage, dedicated=False, pool=None):
         """Create a new buffer
 
         Creating a buffer is made of several steps:
@@ -615,6 +742,10 @@ class Buffer():
             - Allocate the memory
             - Bind the memory to the buffer
 
+        By default, memory is sub-allocated by VMA from big memory blocks,
+        it can be allocated from a custom `MemoryPool` or, for big
+        buffers, in its own dedicated `VkDeviceMemory`.
+
         Args:
             context (VulkContext)
             flags (BufferCreate): Set sparse properties
@@ -625,7 +756,12 @@ class Buffer():
                                    buffer (ignored if sharingMode is not
                                    `CONCURRENT` - can be [])
             vma_usage (VmaMemoryUsage): Usage of this buffer
+            dedicated (bool): Allocate a dedicated `VkDeviceMemory`
+            pool (MemoryPool): Pool to allocate from (can be None)
         """
+        self.size = size
+        self.pool = pool
+
         # Create VkBuffer
         buffer_create = vk.VkBufferCreateInfo(
             flags=flags.value,
@@ -635,16 +771,51 @@ class Buffer():
             queueFamilyIndexCount=len(queue_families),
             pQueueFamilyIndices=queue_families if queue_families else None
         )
+        vma_flags = 0
+        if dedicated:
+            vma_flags |= vma.VMA_ALLOCATION_CREATE_DEDICATED_MEMORY_BIT
         vma_alloc_info = vma.VmaAllocationCreateInfo(
             usage=vma_usage,
-            # TODO: I don't know exactly how VMA works but I need that flag
-            flags=vma.VMA_ALLOCATION_CREATE_DEDICATED_MEMORY_BIT
+            flags=vma_flags,
+            pool=pool.pool if pool else None
         )
         self.buffer, self.allocation, self.info = vma.vmaCreateBuffer(
             context.vma_allocator,
             buffer_create,
             vma_alloc_info)
 
+    def barrier(self, cmd, src_stage, dst_stage, src_access, dst_access,
+                src_queue_family=vc.QUEUE_FAMILY_IGNORED,
+                dst_queue_family=vc.QUEUE_FAMILY_IGNORED):
+        """Record a memory barrier on the whole buffer
+
+        With queue families, the barrier transfers the ownership of the
+        buffer. It must be recorded on both queues: it releases the buffer
+        on the source queue and acquires it on the destination queue.
+
+        Args:
+            cmd (CommandBufferRegister): Register commands
+            src_stage (PipelineStage): Source stage
+            dst_stage (PipelineStage): Destination stage
+            src_access (Access): Source access
+            dst_access (Access): Destination access
+            src_queue_family (int): Releasing queue family
+            dst_queue_family (int): Acquiring queue family
+        """
+        barrier = vk.VkBufferMemoryBarrier(
+            sType=vk.VK_STRUCTURE_TYPE_BUFFER_MEMORY_BARRIER,
+            srcAccessMask=src_access.value,
+            dstAccessMask=dst_access.value,
+            srcQueueFamilyIndex=src_queue_family,
+            dstQueueFamilyIndex=dst_queue_family,
+            buffer=self.buffer,
+            offset=0,
+            size=vk.VK_WHOLE_SIZE
+        )
+
+        cmd.pipeline_barrier(src_stage, dst_stage, vc.Dependency.NONE,
+                             [], [barrier], [])
+
     def copy_to(self, cmd, dst_buffer):
         """Copy this buffer to the destination buffer
 
@@ -657,36 +828,50 @@ class Buffer():
 
         **Note: Buffers must have the same size**
         """
-        if self.info.size != dst_buffer.info.size:
+        if self.size != dst_buffer.size:
             msg = "Buffers must have the same size"
             logger.error(msg)
             raise VulkError(msg)
 
+        # Offsets are relative to the buffers, not to their memory
         region = vk.VkBufferCopy(
-            srcOffset=self.info.offset,
-            dstOffset=dst_buffer.info.offset,
-            size=self.info.size
+            srcOffset=0,
+            dstOffset=0,
+            size=self.size
         )
 
         cmd.copy_buffer(self, dst_buffer, [region])
 
-    def copy_to_image(self, cmd, dst_image, mip_level):
+    def copy_to_image(self, cmd, dst_image, mip_level, x=0, y=0,
+                      width=0, height=0, offset=0):
         """Copy this buffer to the destination image
 
         Commands to copy are registered in the commandbuffer but it's up to
         you to start and submit the command buffer to the execution queue.
+        The buffer must contain the whole mip level, tightly packed. When
+        a region is given, only this region is copied.
 
         Args:
             cmd (CommandBufferRegister): used to register commands
             dst_image (Image): Destination image
-            mip_infos (list): List containing for each mipmap a dict like
-                              {'offset':, 'size':, 'width':, 'height':}
+            mip_level (int): Mip level to copy
+            x (int): X offset of the region in the mip level
+            y (int): Y offset of the region in the mip level
+            width (int): Width of the region (0 = whole mip level)
+            height (int): Height of the region (0 = whole mip level)
+            offset (int): Offset of the mip level in this buffer
 
         **Note: Layout of destination image must be `TRANSFERT_DST_OPTIMAL`.
                 It's up to you.**
         """
-        width, height = mipmap_size(
+        level_width, level_height = mipmap_size(
             dst_image.width, dst_image.height, mip_level)
+        width = width or level_width - x
+        height = height or level_height - y
+        block_height = vc.format_block_info(dst_image.format)[1]
+        row_length = 0
+        if width != level_width or height != level_height:
+            row_length = level_width
 
         subresource = vk.VkImageSubresourceLayers(
             aspectMask=vc.ImageAspect.COLOR,
@@ -696,13 +881,15 @@ class Buffer():
         )
         extent = vk.VkExtent3D(width=width, height=height,
                                depth=dst_image.depth)
-        offset = vk.VkOffset3D(x=0, y=0, z=0)
+        image_offset = vk.VkOffset3D(x=x, y=y, z=0)
         region = vk.VkBufferImageCopy(
-            bufferOffset=self.info.offset,
-            bufferRowLength=0,
+            bufferOffset=offset +
+            vc.format_size(dst_image.format, level_width, y) +
+            vc.format_size(dst_image.format, x, block_height),
+            bufferRowLength=row_length,
             bufferImageHeight=0,
             imageSubresource=subresource,
-            imageOffset=offset,
+            imageOffset=image_offset,
             imageExtent=extent
         )
 
@@ -731,6 +918,44 @@ class Buffer():
         finally:
             vma.vmaUnmapMemory(context.vma_allocator, self.allocation)
 
+    def invalidate(self, context):
+        """Make device writes visible to the host
+
+        Must be called while the buffer is mapped (in `bind`) before
+        reading memory written by the device. Nothing is done if the
+        memory is host coherent.
+
+        Args:
+            context (VulkContext)
+        """
+        properties = vk.vkGetPhysicalDeviceMemoryProperties(
+            context.physical_device)
+        flags = properties.memoryTypes[self.info.memoryType].propertyFlags
+        if flags & vk.VK_MEMORY_PROPERTY_HOST_COHERENT_BIT:
+            return
+
+        # Range must be aligned on the atom size of the device
+        atom = context.physical_device_properties.limits.nonCoherentAtomSize
+        offset = self.info.offset - self.info.offset % atom
+        size = next_multiple(self.info.offset + self.info.size, atom) - offset
+        memory_range = vk.VkMappedMemoryRange(
+            sType=vk.VK_STRUCTURE_TYPE_MAPPED_MEMORY_RANGE,
+            memory=self.info.deviceMemory,
+            offset=offset,
+            size=size
+        )
+        vk.vkInvalidateMappedMemoryRanges(context.device, 1, [memory_range])
+
+    def destroy(self, context):
+        """Destroy this buffer and free its memory
+
+        Args:
+            context (VulkContext)
+        """
+        vma.vmaDestroyBuffer(context.vma_allocator, self.buffer,
+                             self.allocation)
+        self.buffer = None
+
 
 class ClearColorValue():
     '''ClearValue for color clearing'''
@@ -1084,6 +1309,23 @@ class CommandBufferRegister():
             vk_buffers, len(images), vk_images
         )
 
+    def push_constants(self, layout, stage, offset, data):
+        '''
+        Update push constants
+
+        *Parameters:*
+
+        - `layout`: `PipelineLayout` declaring the push constant range
+        - `stage`: `ShaderStage` vulk constant
+        - `offset`: Offset in bytes of the update in the range
+        - `data`: Object supporting the buffer protocol (`numpy` array,
+                  `bytes`...), its size must be a multiple of 4
+        '''
+        size = memoryview(data).nbytes
+        vk.vkCmdPushConstants(
+            self.commandbuffer, layout.layout, stage.value, offset, size,
+            vk.ffi.from_buffer(data))
+
     def copy_image(self, src_image, src_layout, dst_image,
                    dst_layout, regions):
         '''
@@ -1103,6 +1345,40 @@ class CommandBufferRegister():
             dst_image.image, dst_layout.value, len(regions), regions
         )
 
+    def blit_image(self, src_image, src_layout, dst_image, dst_layout,
+                   regions, image_filter):
+        """Copy regions of an image, potentially performing format
+        conversion and scaling
+
+        Args:
+            src_image (Image): Source image
+            src_layout (ImageLayout): Source image layout
+            dst_image (Image): Destination image
+            dst_layout (ImageLayout): Destination image layout
+            regions (list): List of `VkImageBlit`
+            image_filter (Filter): Filter used when scaling
+        """
+        vk.vkCmdBlitImage(
+            self.commandbuffer, src_image.image, src_layout.value,
+            dst_image.image, dst_layout.value, len(regions), regions,
+            image_filter.value
+        )
+
+    def copy_image_to_buffer(self, src_image, src_layout, dst_buffer,
+                             regions):
+        """Copy an image into a buffer
+
+        Args:
+            src_image (Image): Source image
+            src_layout (ImageLayout): Image layout
+            dst_buffer (Buffer): Destination buffer
+            regions (list): List of `VkBufferImageCopy`
+        """
+        vk.vkCmdCopyImageToBuffer(
+            self.commandbuffer, src_image.image, src_layout.value,
+            dst_buffer.buffer, len(regions), regions
+        )
+
     def copy_buffer_to_image(self, src_buffer, dst_image, dst_layout,
                              regions):
         """Copy a buffer into an image
@@ -1135,6 +1411,55 @@ class CommandBufferRegister():
         '''End the current render pass'''
         vk.vkCmdEndRenderPass(self.commandbuffer)
 
+    def reset_query_pool(self, querypool, first_query, query_count):
+        '''
+        Reset queries of a query pool, must be called outside a renderpass
+
+        *Parameters:*
+
+        - `querypool`: `QueryPool`
+        - `first_query`: Index of the first query to reset
+        - `query_count`: Number of queries to reset
+        '''
+        vk.vkCmdResetQueryPool(self.commandbuffer, querypool.querypool,
+                               first_query, query_count)
+
+    def write_timestamp(self, stage, querypool, query):
+        '''
+        Write a timestamp in a query when all previous commands completed
+        `stage`
+
+        *Parameters:*
+
+        - `stage`: `PipelineStage` vulk constant
+        - `querypool`: `QueryPool` of `TIMESTAMP` type
+        - `query`: Index of the query
+        '''
+        vk.vkCmdWriteTimestamp(self.commandbuffer, stage.value,
+                               querypool.querypool, query)
+
+    @contextmanager
+    def profile(self, profiler, name):
+        '''
+        Measure the GPU time of the commands registered in the scope.
+        This function is a context manager, it does nothing if `profiler`
+        is `None`.
+
+        *Parameters:*
+
+        - `profiler`: `GpuProfiler` or `None`
+        - `name`: Name of the scope
+        '''
+        if not profiler:
+            yield
+            return
+
+        scope = profiler.begin_scope(self, name)
+        try:
+            yield
+        finally:
+            profiler.end_scope(self, scope)
+
 
 class CommandPool():
     '''
@@ -1354,6 +1679,80 @@ class DescriptorSetLayout():
             context.device, layout_create, None)
 
 
+class Fence():
+    '''
+    Fences are a synchronization primitive that can be used to insert a
+    dependency from a queue to the host. A fence is signaled when all the
+    commands of the submission it's given to are completed, the host can
+    then wait for it or check its status.
+    '''
+
+    def __init__(self, context, signaled=False):
+        '''
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        - `signaled`: Create the fence in signaled state
+        '''
+        flags = vk.VK_FENCE_CREATE_SIGNALED_BIT if signaled else 0
+        fence_create = vk.VkFenceCreateInfo(
+            sType=vk.VK_STRUCTURE_TYPE_FENCE_CREATE_INFO,
+            flags=flags
+        )
+
+        self.fence = vk.vkCreateFence(context.device, fence_create, None)
+
+    def signaled(self, context):
+        '''Return `True` if the fence is signaled, without waiting
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        try:
+            vk.vkGetFenceStatus(context.device, self.fence)
+        except vk.VkNotReady:
+            return False
+        return True
+
+    def wait(self, context, timeout=vk.UINT64_MAX):
+        '''Wait for the fence to be signaled
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        - `timeout`: Timeout in nanoseconds
+
+        *Returns:*
+
+        `True` if the fence is signaled, `False` on timeout
+        '''
+        try:
+            vk.vkWaitForFences(context.device, 1, [self.fence], vk.VK_TRUE,
+                               timeout)
+        except vk.VkTimeout:
+            return False
+        return True
+
+    def reset(self, context):
+        '''Set the fence to the unsignaled state
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        vk.vkResetFences(context.device, 1, [self.fence])
+
+    def destroy(self, context):
+        '''Destroy the fence
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        vk.vkDestroyFence(context.device, self.fence, None)
+
+
 class Framebuffer():
     """
     In Vulkan, a `Framebuffer` references all of the `VkImageView` objects that
@@ -1425,18 +1824,29 @@ class HighPerformanceBuffer():
                             (can be [])
         '''
         queue_families = queue_families if queue_families else []
+        staging_usage = vc.BufferUsage.TRANSFER_SRC
+        final_usage = vc.BufferUsage.TRANSFER_DST | usage
+        staging_pool = final_pool = None
+        buffer_pools = getattr(context, 'buffer_pools', None)
+        if buffer_pools:
+            staging_pool = buffer_pools.get(
+                context, staging_usage, vc.VmaMemoryUsage.CPU_ONLY, size)
+            final_pool = buffer_pools.get(
+                context, final_usage, vc.VmaMemoryUsage.GPU_ONLY, size)
 
         self.staging_buffer = Buffer(
-            context, vc.BufferCreate.NONE, size, vc.BufferUsage.TRANSFER_SRC,
-            sharing_mode, queue_families, vc.VmaMemoryUsage.CPU_ONLY
+            context, vc.BufferCreate.NONE, size, staging_usage,
+            sharing_mode, queue_families, vc.VmaMemoryUsage.CPU_ONLY,
+            pool=staging_pool
         )
 
         self.final_buffer = Buffer(
-            context, vc.BufferCreate.NONE, size,
-            vc.BufferUsage.TRANSFER_DST | usage,
-            sharing_mode, queue_families,
-            vc.VmaMemoryUsage.GPU_ONLY
+            context, vc.BufferCreate.NONE, size, final_usage,
+            sharing_mode, queue_families, vc.VmaMemoryUsage.GPU_ONLY,
+            pool=final_pool
         )
+        self.sharing_mode = sharing_mode
+        self.uploaded = False
 
     def upload(self, context, cmd):
         '''
@@ -1459,15 +1869,71 @@ class HighPerformanceBuffer():
         *Parameters:*
 
         - `context`: `VulkContext`
-        - `auto_upload`: Automatically upload this buffer after the write
+        - `auto_upload`: Automatically upload this buffer after the write,
+                         recorded in the upload queue if a batch is open
         '''
         try:
             with self.staging_buffer.bind(context) as b:
                 yield b
         finally:
             if auto_upload:
-                with immediate_buffer(context) as cmd:
-                    self.upload(context, cmd)
+                self._auto_upload(context)
+
+    def _auto_upload(self, context):
+        '''Upload the buffer in the upload queue or immediately
+
+        The first upload goes to the transfer queue when there is one.
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        upload_queue = current_upload_queue(context)
+        transfer_queue = None
+        if not self.uploaded:
+            transfer_queue = first_upload_queue(context, upload_queue,
+                                                self.sharing_mode)
+
+        if transfer_queue and upload_queue:
+            self._record_transfer(context, transfer_queue)
+        elif transfer_queue:
+            # Submitted and waited like an immediate upload
+            with transfer_queue.batch():
+                self._record_transfer(context, transfer_queue)
+            transfer_queue.last_token.wait()
+        elif upload_queue:
+            with upload_queue.record() as cmd:
+                self.upload(context, cmd)
+        else:
+            with immediate_buffer(context) as cmd:
+                self.upload(context, cmd)
+
+        self.uploaded = True
+
+    def _record_transfer(self, context, upload_queue):
+        '''Record the upload on the transfer queue
+
+        The final buffer is then given to the graphic queue.
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        - `upload_queue`: `UploadQueue` recording the commands
+        '''
+        with upload_queue.record_transfer() as cmd:
+            self.upload(context, cmd)
+        upload_queue.transfer_buffer(self.final_buffer,
+                                     vc.PipelineStage.ALL_COMMANDS,
+                                     vc.Access.MEMORY_READ)
+
+    def destroy(self, context):
+        """Destroy staging and final buffers
+
+        Args:
+            context (VulkContext)
+        """
+        self.staging_buffer.destroy(context)
+        self.final_buffer.destroy(context)
 
 
 class HighPerformanceImage():
@@ -1480,6 +1946,9 @@ class HighPerformanceImage():
     fast memory that we will use in shaders. When we create an image, we first
     upload the pixels in the staging buffer and then copy the memory in the
     final image.
+
+    All mip levels share one staging buffer, each level at an aligned offset.
+    Immutable images can release the staging buffer once finalized.
     """
 
     def __init__(self, context, image_type, image_format, width, height,
@@ -1508,9 +1977,15 @@ class HighPerformanceImage():
 
         self.copied = False
         self.mip_levels = mip_levels
-        self.buffers = self._init_buffers(
-            context, width, height, image_format, sharing_mode,
-            queue_families)
+        self.sharing_mode = sharing_mode
+        # Bytes of staging memory released after finalization
+        self.released_memory = 0
+        self.buffer_infos, staging_size = self._get_buffer_infos(
+            width, height, image_format)
+        self.staging_buffer = Buffer(
+            context, vc.BufferCreate.NONE, staging_size,
+            vc.BufferUsage.TRANSFER_SRC, sharing_mode, queue_families,
+            vc.VmaMemoryUsage.CPU_ONLY)
 
         self.final_image = Image(
             context, image_type, image_format, width, height, depth,
@@ -1520,127 +1995,300 @@ class HighPerformanceImage():
             vc.VmaMemoryUsage.GPU_ONLY
         )
 
-    def _init_buffers(self, context, width, height, image_format,
-                      sharing_mode, queue_families):
-        buffers = []
-        components = vc.format_info(image_format)[1]
-
-        for mip_level in range(self.mip_levels):
-            w, h = mipmap_size(width, height, mip_level)
-            size = w * h * components
-            buffers.append(Buffer(
-                context, vc.BufferCreate.NONE, size,
-                vc.BufferUsage.TRANSFER_SRC, sharing_mode, queue_families,
-                vc.VmaMemoryUsage.CPU_ONLY))
-
-        return buffers
-
     def _get_buffer_infos(self, width, height, image_format):
-        """
-        TODO: Delete this method
-        Get buffer infos for construction
+        """Get the layout of mip levels in the staging buffer
+
+        Offsets are aligned on a multiple of 4 and of the texel block size
+        as required by `vkCmdCopyBufferToImage`.
 
         Args:
             width (int): Image width
             height (int): Image height
             image_format (Format): Format of image
+
+        Returns:
+            tuple(mapping, total_size) with mapping a list containing for
+            each mip level a dict like
+            {'offset':, 'size':, 'width':, 'height':}
         """
         mapping = []
         offset = 0
         total_size = 0
-        components = vc.format_info(image_format)[1]
+        block_size = vc.format_block_info(image_format)[2]
 
         for mip_level in range(self.mip_levels):
             w, h = mipmap_size(width, height, mip_level)
-            size = w * h * components
+            size = vc.format_size(image_format, w, h)
 
             mapping.append({'offset': offset, 'size': size,
                             'width': w, 'height': h})
 
             tmp_offset = offset + size
-            offset = next_multiple(tmp_offset, 4 * components)
+            offset = next_multiple(tmp_offset, 4 * block_size)
             diff_offset = offset - tmp_offset
 
             total_size += size + diff_offset
 
         return mapping, total_size
 
-    def _copy_staging_to_final(self, context):
-        """Prepare and copy staging buffer to final image
+    def _record_staging_to_final(self, cmd):
+        """Record the copy of staging buffer to final image
 
         Args:
-            context (VulkContext)
+            cmd (CommandBufferRegister): Register commands
         """
-        commandpool = CommandPool(
-            context, context.queue_family_indices['graphic'])
-
         # Transition final image to optimal destination transfert layout
         if not self.copied:
-            with immediate_buffer(context, commandpool) as cmd:
-                self.final_image.update_layout(
-                    cmd, vc.ImageLayout.PREINITIALIZED,
-                    vc.ImageLayout.TRANSFER_DST_OPTIMAL,
-                    vc.PipelineStage.HOST,
-                    vc.PipelineStage.TRANSFER,
-                    vc.Access.HOST_WRITE,
-                    vc.Access.TRANSFER_WRITE,
-                    mip_levels=self.mip_levels
-                )
+            self.final_image.update_layout(
+                cmd, vc.ImageLayout.PREINITIALIZED,
+                vc.ImageLayout.TRANSFER_DST_OPTIMAL,
+                vc.PipelineStage.HOST,
+                vc.PipelineStage.TRANSFER,
+                vc.Access.HOST_WRITE,
+                vc.Access.TRANSFER_WRITE,
+                mip_levels=self.mip_levels
+            )
             self.copied = True
         else:
-            with immediate_buffer(context, commandpool) as cmd:
-                self.final_image.update_layout(
-                    cmd, vc.ImageLayout.SHADER_READ_ONLY_OPTIMAL,
-                    vc.ImageLayout.TRANSFER_DST_OPTIMAL,
-                    vc.PipelineStage.FRAGMENT_SHADER,
-                    vc.PipelineStage.TRANSFER,
-                    vc.Access.SHADER_READ,
-                    vc.Access.TRANSFER_WRITE,
-                    mip_levels=self.mip_levels
-                )
-
-        # Copy staging buffer into final image
-        with immediate_buffer(context, commandpool) as cmd:
-            for mip_level, buf in enumerate(self.buffers):
-                buf.copy_to_image(cmd, self.final_image, mip_level)
+            self.final_image.update_layout(
+                cmd, vc.ImageLayout.SHADER_READ_ONLY_OPTIMAL,
+                vc.ImageLayout.TRANSFER_DST_OPTIMAL,
+                vc.PipelineStage.FRAGMENT_SHADER,
+                vc.PipelineStage.TRANSFER,
+                vc.Access.SHADER_READ,
+                vc.Access.TRANSFER_WRITE,
+                mip_levels=self.mip_levels
+            )
+
+        self._record_copies(cmd)
 
         # Set the best layout for the final image
-        with immediate_buffer(context, commandpool) as cmd:
+        self.final_image.update_layout(
+            cmd, vc.ImageLayout.TRANSFER_DST_OPTIMAL,
+            vc.ImageLayout.SHADER_READ_ONLY_OPTIMAL,
+            vc.PipelineStage.TRANSFER,
+            vc.PipelineStage.FRAGMENT_SHADER,
+            vc.Access.TRANSFER_WRITE,
+            vc.Access.SHADER_READ,
+            mip_levels=self.mip_levels
+        )
+
+    def _record_copies(self, cmd):
+        """Record the copy of all mip levels of staging buffer
+
+        Args:
+            cmd (CommandBufferRegister): Register commands
+        """
+        for mip_level, info in enumerate(self.buffer_infos):
+            self.staging_buffer.copy_to_image(
+                cmd, self.final_image, mip_level, offset=info['offset'])
+
+    def _record_transfer(self, upload_queue):
+        """Record the first copy on the transfer queue
+
+        The final image is then given to the graphic queue in the
+        `SHADER_READ_ONLY_OPTIMAL` layout.
+
+        Args:
+            upload_queue (UploadQueue): Queue recording the commands
+        """
+        with upload_queue.record_transfer() as cmd:
             self.final_image.update_layout(
-                cmd, vc.ImageLayout.TRANSFER_DST_OPTIMAL,
-                vc.ImageLayout.SHADER_READ_ONLY_OPTIMAL,
+                cmd, vc.ImageLayout.PREINITIALIZED,
+                vc.ImageLayout.TRANSFER_DST_OPTIMAL,
+                vc.PipelineStage.HOST,
                 vc.PipelineStage.TRANSFER,
-                vc.PipelineStage.FRAGMENT_SHADER,
+                vc.Access.HOST_WRITE,
                 vc.Access.TRANSFER_WRITE,
-                vc.Access.SHADER_READ,
                 mip_levels=self.mip_levels
             )
+            self._record_copies(cmd)
+
+        upload_queue.transfer_image(
+            self.final_image, vc.ImageLayout.TRANSFER_DST_OPTIMAL,
+            vc.ImageLayout.SHADER_READ_ONLY_OPTIMAL,
+            vc.PipelineStage.FRAGMENT_SHADER, vc.Access.SHADER_READ,
+            mip_levels=self.mip_levels)
+        self.copied = True
+
+    def _copy_staging_to_final(self, context, upload_queue=None):
+        """Prepare and copy staging buffer to final image
+
+        All commands are recorded in one command buffer, submitted at once
+        or recorded in `upload_queue`. The first copy goes to the transfer
+        queue when there is one.
+
+        Args:
+            context (VulkContext)
+            upload_queue (UploadQueue): Queue recording the commands
+                                        (optional)
+        """
+        transfer_queue = None
+        if not self.copied:
+            transfer_queue = first_upload_queue(context, upload_queue,
+                                                self.sharing_mode)
+
+        if transfer_queue and upload_queue:
+            self._record_transfer(transfer_queue)
+        elif transfer_queue:
+            # Submitted and waited like an immediate upload
+            with transfer_queue.batch():
+                self._record_transfer(transfer_queue)
+            transfer_queue.last_token.wait()
+        elif upload_queue:
+            with upload_queue.record() as cmd:
+                self._record_staging_to_final(cmd)
+        else:
+            with immediate_buffer(context) as cmd:
+                self._record_staging_to_final(cmd)
 
-    def finalize(self, context):
+    def _check_staging(self):
+        """Raise an error if the staging buffer is released"""
+        if not self.staging_buffer:
+            msg = "Staging buffer released, this image is immutable"
+            logger.error(msg)
+            raise VulkError(msg)
+
+    def finalize(self, context, release_staging=False, upload_queue=None):
         """Copy staging buffer to final image
 
+        Without `upload_queue`, the copy is recorded in the upload queue of
+        the context if a batch is open, else it's submitted immediately.
+
         Args:
             context (VulkContext)
+            release_staging (bool): Free the staging buffer once copied, the
+                                    image can't be updated anymore
+            upload_queue (UploadQueue): Queue recording the copy, it's
+                                        executed at the queue submit
+                                        (optional)
+
+        Returns:
+            int: Bytes of staging memory released
         """
-        self._copy_staging_to_final(context)
+        self._check_staging()
+        upload_queue = upload_queue or current_upload_queue(context)
+        self._copy_staging_to_final(context, upload_queue)
+
+        if not release_staging:
+            return 0
+
+        staging_buffer = self.staging_buffer
+        self.staging_buffer = None
+        self.released_memory = staging_buffer.info.size
+        if upload_queue:
+            upload_queue.defer(lambda: staging_buffer.destroy(context))
+        else:
+            staging_buffer.destroy(context)
+        logger.debug("%s bytes of staging memory released",
+                     self.released_memory)
+        return self.released_memory
+
+    def upload_region(self, context, x, y, width, height, mip_level=0):
+        """Copy a region of a staging buffer to the final image
+
+        Only the region is copied and only its mip level changes of layout,
+        it's much faster than `finalize` to update a small part of a big
+        image. The region must already be written in the staging buffer
+        (see `bind_buffer`). If the image has never been finalized, it is
+        fully finalized instead.
+
+        Args:
+            context (VulkContext)
+            x (int): X offset of the region
+            y (int): Y offset of the region
+            width (int): Width of the region
+            height (int): Height of the region
+            mip_level (int): Mip level of the region
+        """
+        self._check_staging()
+        if not self.copied:
+            self.finalize(context)
+            return
+
+        # Buffer offset must be a multiple of 4, extend the region
+        # on the left until it is
+        level_width = mipmap_size(self.final_image.width,
+                                  self.final_image.height, mip_level)[0]
+        pixel_size = vc.format_info(self.final_image.format)[2]
+        while (y * level_width + x) * pixel_size % 4 and x > 0:
+            x -= 1
+            width += 1
+
+        if (y * level_width + x) * pixel_size % 4:
+            x, y, width, height = 0, 0, 0, 0
+
+        upload_queue = current_upload_queue(context)
+        if upload_queue:
+            with upload_queue.record() as cmd:
+                self._record_region(cmd, x, y, width, height, mip_level)
+        else:
+            with immediate_buffer(context) as cmd:
+                self._record_region(cmd, x, y, width, height, mip_level)
+
+    def _record_region(self, cmd, x, y, width, height, mip_level):
+        """Record the copy of a region of staging buffer to final image"""
+        self.final_image.update_layout(
+            cmd, vc.ImageLayout.SHADER_READ_ONLY_OPTIMAL,
+            vc.ImageLayout.TRANSFER_DST_OPTIMAL,
+            vc.PipelineStage.FRAGMENT_SHADER,
+            vc.PipelineStage.TRANSFER,
+            vc.Access.SHADER_READ,
+            vc.Access.TRANSFER_WRITE,
+            base_mip_level=mip_level
+        )
+        self.staging_buffer.copy_to_image(
+            cmd, self.final_image, mip_level, x, y, width, height,
+            self.buffer_infos[mip_level]['offset'])
+        self.final_image.update_layout(
+            cmd, vc.ImageLayout.TRANSFER_DST_OPTIMAL,
+            vc.ImageLayout.SHADER_READ_ONLY_OPTIMAL,
+            vc.PipelineStage.TRANSFER,
+            vc.PipelineStage.FRAGMENT_SHADER,
+            vc.Access.TRANSFER_WRITE,
+            vc.Access.SHADER_READ,
+            base_mip_level=mip_level
+        )
 
     @contextmanager
     def bind_buffer(self, context, mip_level):
         """Bind staging buffer
 
-        It calls `bind` method of the staging buffer to allow writing.
+        It maps the staging buffer and returns the part of the mip level.
 
         Args:
             context (VulkContext)
-            offset (int): Offset in buffer
-            size (int): Bytes to reserve in buffer
             mip_level (int): Mip level to copy image to
+
+        Returns:
+            memoryview: Writable view on the mip level
         """
         if mip_level > self.mip_levels - 1:
             raise VulkError("Can't upload more mipmap than possible")
+        self._check_staging()
+
+        info = self.buffer_infos[mip_level]
+        with self.staging_buffer.bind(context) as b:
+            yield memoryview(b)[info['offset']:info['offset'] + info['size']]
+
+    @property
+    def memory_size(self):
+        """Bytes allocated for the final image and the staging buffer"""
+        size = self.final_image.info.size
+        if self.staging_buffer:
+            size += self.staging_buffer.info.size
+        return size
+
+    def destroy(self, context):
+        """Destroy staging buffer and final image
 
-        with self.buffers[mip_level].bind(context) as b:
-            yield b
+        Args:
+            context (VulkContext)
+        """
+        if self.staging_buffer:
+            self.staging_buffer.destroy(context)
+            self.staging_buffer = None
+        self.final_image.destroy(context)
 
 
 class Image():
@@ -1729,13 +2377,17 @@ class Image():
 
     def update_layout(self, cmd, old_layout, new_layout, src_stage,
                       dst_stage, src_access, dst_access, base_mip_level=0,
-                      mip_levels=1):
+                      mip_levels=1, src_queue_family=vc.QUEUE_FAMILY_IGNORED,
+                      dst_queue_family=vc.QUEUE_FAMILY_IGNORED):
         """Update the image layout
 
         Command to update layout are registered in the commandbuffer
         but it's up to you to start and submit the command buffer to
         the execution queue.
 
+        With queue families, the barrier transfers the ownership of the
+        image. It must be recorded with the same layouts on both queues.
+
         Args:
             cmd (CommandBufferRegister): Register commands
             old_layout (ImageLayout): Previous layout
@@ -1746,6 +2398,8 @@ class Image():
             dst_access (Access): Destination access
             base_mip_level (int): Starting mip level
             mip_levels (int): Number of mip levels
+            src_queue_family (int): Releasing queue family
+            dst_queue_family (int): Acquiring queue family
         """
         subresource_range = vk.VkImageSubresourceRange(
             aspectMask=vc.ImageAspect.COLOR,
@@ -1761,8 +2415,8 @@ class Image():
             dstAccessMask=dst_access.value,
             oldLayout=old_layout.value,
             newLayout=new_layout.value,
-            srcQueueFamilyIndex=vc.QUEUE_FAMILY_IGNORED,
-            dstQueueFamilyIndex=vc.QUEUE_FAMILY_IGNORED,
+            srcQueueFamilyIndex=src_queue_family,
+            dstQueueFamilyIndex=dst_queue_family,
             image=self.image,
             subresourceRange=subresource_range
         )
@@ -1809,6 +2463,80 @@ class Image():
         cmd.copy_image(self, src_layout, dst_image,
                        dst_layout, [region])
 
+    def blit_to(self, cmd, dst_image, image_filter=vc.Filter.LINEAR):
+        """Scale this image into the destination image
+
+        Commands to blit are registered in the commandbuffer but it's up to
+        you to start and submit the command buffer to the execution queue.
+        The whole image is stretched over the whole destination image.
+
+        Args:
+            cmd (CommandBufferRegister): Command used to register commands
+            dst_image (Image): Destination image
+            image_filter (Filter): Filter used when scaling
+
+        **Note: Layout of source image must be `TRANSFERT_SRC_OPTIMAL` and
+                layout of destination image must be `TRANSFERT_DST_OPTIMAL`.
+                It's up to you.**
+        """
+        subresource = vk.VkImageSubresourceLayers(
+            aspectMask=vc.ImageAspect.COLOR,
+            baseArrayLayer=0,
+            mipLevel=0,
+            layerCount=1
+        )
+        region = vk.VkImageBlit(
+            srcSubresource=subresource,
+            srcOffsets=[vk.VkOffset3D(x=0, y=0, z=0),
+                        vk.VkOffset3D(x=self.width, y=self.height, z=1)],
+            dstSubresource=subresource,
+            dstOffsets=[vk.VkOffset3D(x=0, y=0, z=0),
+                        vk.VkOffset3D(x=dst_image.width,
+                                      y=dst_image.height, z=1)]
+        )
+
+        src_layout = vc.ImageLayout.TRANSFER_SRC_OPTIMAL
+        dst_layout = vc.ImageLayout.TRANSFER_DST_OPTIMAL
+
+        cmd.blit_image(self, src_layout, dst_image, dst_layout, [region],
+                       image_filter)
+
+    def copy_to_buffer(self, cmd, dst_buffer, mip_level=0):
+        """Copy a mip level of this image to the destination buffer
+
+        Commands to copy are registered in the commandbuffer but it's up to
+        you to start and submit the command buffer to the execution queue.
+        Pixels are tightly packed in the buffer.
+
+        Args:
+            cmd (CommandBufferRegister): Command used to register commands
+            dst_buffer (Buffer): Destination buffer
+            mip_level (int): Mip level to copy
+
+        **Note: Layout of source image must be `TRANSFERT_SRC_OPTIMAL`.
+                It's up to you.**
+        """
+        width, height = mipmap_size(self.width, self.height, mip_level)
+        subresource = vk.VkImageSubresourceLayers(
+            aspectMask=vc.ImageAspect.COLOR,
+            baseArrayLayer=0,
+            mipLevel=mip_level,
+            layerCount=1
+        )
+        region = vk.VkBufferImageCopy(
+            bufferOffset=0,
+            bufferRowLength=0,
+            bufferImageHeight=0,
+            imageSubresource=subresource,
+            imageOffset=vk.VkOffset3D(x=0, y=0, z=0),
+            imageExtent=vk.VkExtent3D(width=width, height=height,
+                                      depth=self.depth)
+        )
+
+        src_layout = vc.ImageLayout.TRANSFER_SRC_OPTIMAL
+
+        cmd.copy_image_to_buffer(self, src_layout, dst_buffer, [region])
+
     @contextmanager
     def bind(self, context):
         '''
@@ -1914,6 +2642,78 @@ class ImageView():
         vk.vkDestroyImageView(context.device, self.imageview, None)
 
 
+class MemoryPool():
+    '''Custom VMA pool
+
+    A memory pool allocates big `VkDeviceMemory` blocks of a single memory
+    type and sub-allocates resources in them. It reduces the number of
+    `vkAllocateMemory` calls (limited by `maxMemoryAllocationCount`) and
+    groups resources of the same kind together.
+    '''
+
+    def __init__(self, context, memory_type_index, block_size=0,
+                 min_block_count=0, max_block_count=0):
+        '''
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        - `memory_type_index`: Memory type of the pool (see
+                               `find_memory_type_index`)
+        - `block_size`: Size of a block in bytes (0 = VMA default)
+        - `min_block_count`: Blocks always allocated
+        - `max_block_count`: Maximum number of blocks (0 = unlimited)
+        '''
+        self.memory_type_index = memory_type_index
+        self.block_size = block_size
+
+        pool_create = vma.VmaPoolCreateInfo(
+            memoryTypeIndex=memory_type_index,
+            flags=0,
+            blockSize=block_size,
+            minBlockCount=min_block_count,
+            maxBlockCount=max_block_count,
+            frameInUseCount=0
+        )
+        self.pool = vma.vmaCreatePool(context.vma_allocator, pool_create)
+
+    def stats(self, context):
+        '''Return the statistics of the pool
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+
+        *Returns:*
+
+        `dict` with `size` and `unused_size` in bytes, `allocations`,
+        `unused_ranges`, `unused_range_max` in bytes and `fragmentation`
+        (0 when all free memory is contiguous, near 1 when it's scattered)
+        '''
+        stats = vma.vmaGetPoolStats(context.vma_allocator, self.pool)
+        fragmentation = 0
+        if stats.unusedSize:
+            fragmentation = 1 - stats.unusedRangeSizeMax / stats.unusedSize
+
+        return {
+            'size': stats.size,
+            'unused_size': stats.unusedSize,
+            'allocations': stats.allocationCount,
+            'unused_ranges': stats.unusedRangeCount,
+            'unused_range_max': stats.unusedRangeSizeMax,
+            'fragmentation': fragmentation
+        }
+
+    def destroy(self, context):
+        '''Destroy the pool, all its allocations must be freed
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        vma.vmaDestroyPool(context.vma_allocator, self.pool)
+        self.pool = None
+
+
 class Pipeline():
     """Pipeline (graphic) object
 
@@ -2156,31 +2956,104 @@ class PipelineLayout():
     Each pipeline is created using a pipeline layout.
     '''
 
-    def __init__(self, context, descriptors):
+    def __init__(self, context, descriptors, push_constant_ranges=None):
         '''
         *Parameters:*
 
         - `context`: `VulkContext`
         - `descriptors`: `list` of `DescriptorSetLayout`
-
-        **Todo: push constants must be implemented**
+        - `push_constant_ranges`: `list` of `PushConstantRange` (can be
+                                  `None`)
         '''
         vk_descriptors = []
         for d in descriptors:
             vk_descriptors.append(d.descriptorsetlayout)
 
+        vk_ranges = []
+        for r in push_constant_ranges or []:
+            vk_ranges.append(vk.VkPushConstantRange(
+                stageFlags=r.stage.value,
+                offset=r.offset,
+                size=r.size
+            ))
+
         layout_create = vk.VkPipelineLayoutCreateInfo(
             sType=vk.VK_STRUCTURE_TYPE_PIPELINE_LAYOUT_CREATE_INFO,
             flags=0,
             setLayoutCount=len(vk_descriptors),
             pSetLayouts=vk_descriptors if vk_descriptors else None,
-            pushConstantRangeCount=0,
-            pPushConstantRanges=None
+            pushConstantRangeCount=len(vk_ranges),
+            pPushConstantRanges=vk_ranges if vk_ranges else None
         )
         self.layout = vk.vkCreatePipelineLayout(context.device,
                                                 layout_create, None)
 
 
+class QueryPool():
+    '''Pool of queries
+
+    Queries are used to get statistics from the GPU, like timestamps. They
+    must be reset before being written and results are read later by the
+    host.
+    '''
+
+    def __init__(self, context, query_type, query_count):
+        '''
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        - `query_type`: `QueryType` vulk constant
+        - `query_count`: Number of queries in the pool
+        '''
+        querypool_create = vk.VkQueryPoolCreateInfo(
+            sType=vk.VK_STRUCTURE_TYPE_QUERY_POOL_CREATE_INFO,
+            flags=0,
+            queryType=query_type.value,
+            queryCount=query_count,
+            pipelineStatistics=0
+        )
+        self.querypool = vk.vkCreateQueryPool(context.device,
+                                              querypool_create, None)
+        self.query_count = query_count
+
+    def get_results(self, context, first_query, query_count,
+                    flags=vc.QueryResult.RESULT_64):
+        '''Read 64 bits results of queries
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        - `first_query`: Index of the first query to read
+        - `query_count`: Number of queries to read
+        - `flags`: `QueryResult` vulk constant
+
+        *Returns:*
+
+        `list` of `int` or `None` if results are not all available
+        '''
+        if not query_count:
+            return []
+
+        flags |= vc.QueryResult.RESULT_64
+        data = vk.ffi.new('uint64_t[]', query_count)
+        try:
+            vk.vkGetQueryPoolResults(
+                context.device, self.querypool, first_query, query_count,
+                query_count * 8, data, 8, flags.value)
+        except vk.VkNotReady:
+            return None
+        return list(data)
+
+    def destroy(self, context):
+        '''Destroy the query pool
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        vk.vkDestroyQueryPool(context.device, self.querypool, None)
+
+
 class Renderpass():
     '''Renderpass object
 
@@ -2424,6 +3297,15 @@ class Semaphore():
         self.semaphore = vk.vkCreateSemaphore(context.device,
                                               semaphore_create, None)
 
+    def destroy(self, context):
+        '''Destroy the semaphore
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        vk.vkDestroySemaphore(context.device, self.semaphore, None)
+
 
 class ShaderModule():
     '''ShaderModule Vulkan object
@@ -1,8 +1,16 @@
-from contextlib import contextmanager
+from collections import deque, OrderedDict
+from contextlib import contextmanager, ExitStack
+import logging
+import numpy as np
+import pyvma as vma
+import vulkan as vk
 
+from vulk.exception import VulkError
 from vulk import vulkanconstant as vc
 from vulk import vulkanobject as vo
 
+logger = logging.getLogger()
+
 
 class CommandBufferSynchronizedPool():
     '''This class allows to synchronize command buffers with semaphores.
@@ -147,3 +155,994 @@ class CommandBufferSynchronizedPool():
             return None
 
         return self.semaphores[self.semaphore_id]
+
+
+class UploadToken():
+    '''Completion token of an `UploadQueue` or `ImmediatePool` submission
+
+    It allows to know if uploads are done without stalling the queue.
+    '''
+
+    def __init__(self, upload_queue, fence):
+        '''
+        *Parameters:*
+
+        - `upload_queue`: `UploadQueue` or `ImmediatePool` which submitted
+                          the uploads
+        - `fence`: `Fence` signaled when uploads are done (`None` if
+                   there was nothing to upload)
+        '''
+        self.upload_queue = upload_queue
+        self.fence = fence
+        self.completed = fence is None
+
+    def done(self):
+        '''Return `True` if uploads are done, never blocks'''
+        if not self.completed:
+            self.upload_queue.collect()
+        return self.completed
+
+    def wait(self):
+        '''Block until uploads are done'''
+        if not self.completed:
+            self.fence.wait(self.upload_queue.context)
+            self.upload_queue.collect()
+
+
+class UploadQueue():
+    '''Batch uploads into one command buffer
+
+    Buffer and image uploads, with their barriers, are recorded in the same
+    command buffer which is submitted once with a fence. The caller gets an
+    `UploadToken` instead of waiting for the queue. Command buffers and
+    fences are recycled when their submission is completed.
+
+    While a `batch` is open, `HighPerformanceImage.finalize` and
+    `HighPerformanceBuffer.bind` record their copies in the queue of the
+    context instead of submitting them one by one.
+
+    When the device has a dedicated transfer queue, first uploads are
+    recorded in a second command buffer executed on it. The graphic command
+    buffer waits for it with a semaphore and acquires the ownership of the
+    uploaded resources. Without transfer queue, both registers are the same.
+
+    *Exemple:*
+
+    ```
+    with context.upload_queue.batch():
+        textures = [Texture(context, f) for f in files]
+    # Uploads are submitted once here
+    token = context.upload_queue.last_token
+    ```
+    '''
+
+    def __init__(self, context):
+        '''
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        self.context = context
+        flags = vc.CommandPoolCreate.TRANSIENT | vc.CommandPoolCreate.RESET_COMMAND_BUFFER # noqa
+        self.graphic_family = context.queue_family_indices['graphic']
+        self.transfer_family = context.queue_family_indices.get(
+            'transfer', self.graphic_family)
+        self.transfer = context.transfer_queue is not None
+        self.commandpool = vo.CommandPool(context, self.graphic_family,
+                                          flags)
+        self.transfer_commandpool = None
+        if self.transfer:
+            self.transfer_commandpool = vo.CommandPool(
+                context, self.transfer_family, flags)
+        # Recycled (commandbuffer, transfer commandbuffer, semaphore, fence)
+        # Transfer commandbuffer and semaphore are None without transfer
+        # queue
+        self.free = []
+        # Submitted (submission, token, callbacks), submission is the tuple
+        # stored in `free`
+        self.pending = []
+        self.batching = 0
+        self.last_token = None
+        self._submission = None
+        self._register = None
+        self._transfer_register = None
+        self._transfer_used = False
+        self._recording = None
+        self._callbacks = []
+
+    def _begin(self):
+        '''Begin a command buffer if none is recording'''
+        if self._register:
+            return
+
+        self.collect()
+        if self.free:
+            self._submission = self.free.pop()
+        else:
+            commandbuffer = self.commandpool.allocate_buffers(
+                self.context, vc.CommandBufferLevel.PRIMARY, 1)[0]
+            transfer_commandbuffer = semaphore = None
+            if self.transfer:
+                transfer_commandbuffer = self.transfer_commandpool.allocate_buffers( # noqa
+                    self.context, vc.CommandBufferLevel.PRIMARY, 1)[0]
+                semaphore = vo.Semaphore(self.context)
+            self._submission = (commandbuffer, transfer_commandbuffer,
+                                semaphore, vo.Fence(self.context))
+
+        usage = vc.CommandBufferUsage.ONE_TIME_SUBMIT
+        commandbuffer, transfer_commandbuffer, _, _ = self._submission
+        self._recording = ExitStack()
+        self._register = self._recording.enter_context(
+            commandbuffer.bind(usage))
+        self._transfer_register = self._register
+        if transfer_commandbuffer:
+            self._transfer_register = self._recording.enter_context(
+                transfer_commandbuffer.bind(usage))
+
+    @contextmanager
+    def record(self):
+        '''Record upload commands
+
+        This function is a context manager, it returns a
+        `CommandBufferRegister`. Commands are executed at next `submit`.
+        '''
+        self._begin()
+        yield self._register
+
+    @contextmanager
+    def record_transfer(self):
+        '''Record upload commands on the transfer queue
+
+        This function is a context manager, it returns a
+        `CommandBufferRegister`. Commands are executed at next `submit`,
+        before the ones of `record`. Only transfer commands and barriers
+        can be recorded. Written resources must then be given to the
+        graphic queue with `transfer_buffer` or `transfer_image`.
+        '''
+        self._begin()
+        self._transfer_used = True
+        yield self._transfer_register
+
+    def transfer_buffer(self, buffer, dst_stage, dst_access):
+        '''Give a buffer written in `record_transfer` to the graphic queue
+
+        The ownership of the buffer is released by the transfer queue and
+        acquired by the graphic queue. Without transfer queue, the barrier
+        of `submit` is enough.
+
+        *Parameters:*
+
+        - `buffer`: `Buffer`
+        - `dst_stage`: `PipelineStage` reading the buffer
+        - `dst_access`: `Access` of the buffer
+        '''
+        if not self.transfer:
+            return
+
+        with self.record_transfer() as cmd:
+            buffer.barrier(
+                cmd, vc.PipelineStage.TRANSFER,
+                vc.PipelineStage.BOTTOM_OF_PIPE, vc.Access.TRANSFER_WRITE,
+                vc.Access.NONE, self.transfer_family, self.graphic_family)
+        with self.record() as cmd:
+            buffer.barrier(
+                cmd, vc.PipelineStage.TOP_OF_PIPE, dst_stage,
+                vc.Access.NONE, dst_access, self.transfer_family,
+                self.graphic_family)
+
+    def transfer_image(self, image, old_layout, new_layout, dst_stage,
+                       dst_access, mip_levels=1):
+        '''Give an image written in `record_transfer` to the graphic queue
+
+        The ownership of the image is released by the transfer queue and
+        acquired by the graphic queue, the layout is updated during the
+        transfer. Without transfer queue, only the layout is updated.
+
+        *Parameters:*
+
+        - `image`: `Image`
+        - `old_layout`: `ImageLayout` after the upload
+        - `new_layout`: `ImageLayout` used by the graphic queue
+        - `dst_stage`: `PipelineStage` reading the image
+        - `dst_access`: `Access` of the image
+        - `mip_levels`: Number of mip levels
+        '''
+        if not self.transfer:
+            with self.record() as cmd:
+                image.update_layout(
+                    cmd, old_layout, new_layout, vc.PipelineStage.TRANSFER,
+                    dst_stage, vc.Access.TRANSFER_WRITE, dst_access,
+                    mip_levels=mip_levels)
+            return
+
+        with self.record_transfer() as cmd:
+            image.update_layout(
+                cmd, old_layout, new_layout, vc.PipelineStage.TRANSFER,
+                vc.PipelineStage.BOTTOM_OF_PIPE, vc.Access.TRANSFER_WRITE,
+                vc.Access.NONE, mip_levels=mip_levels,
+                src_queue_family=self.transfer_family,
+                dst_queue_family=self.graphic_family)
+        with self.record() as cmd:
+            image.update_layout(
+                cmd, old_layout, new_layout, vc.PipelineStage.TOP_OF_PIPE,
+                dst_stage, vc.Access.NONE, dst_access, mip_levels=mip_levels,
+                src_queue_family=self.transfer_family,
+                dst_queue_family=self.graphic_family)
+
+    def defer(self, callback):
+        '''Call `callback` when the recorded uploads are done
+
+        Use it to release resources (staging buffers) used by the uploads.
+
+        *Parameters:*
+
+        - `callback`: Function without parameter
+        '''
+        self._begin()
+        self._callbacks.append(callback)
+
+    @contextmanager
+    def batch(self):
+        '''Record all uploads done in the `with` block and submit them once
+
+        The token of the submission is stored in `last_token`.
+        '''
+        self.batching += 1
+        try:
+            yield self
+        finally:
+            self.batching -= 1
+            if not self.batching:
+                self.submit()
+
+    def submit(self):
+        '''Submit recorded uploads
+
+        *Returns:*
+
+        `UploadToken`
+        '''
+        if not self._register:
+            self.last_token = UploadToken(self, None)
+            return self.last_token
+
+        # Make uploads visible to all next commands
+        barrier = vk.VkMemoryBarrier(
+            sType=vk.VK_STRUCTURE_TYPE_MEMORY_BARRIER,
+            srcAccessMask=vc.Access.TRANSFER_WRITE.value,
+            dstAccessMask=vc.Access.MEMORY_READ.value
+        )
+        self._register.pipeline_barrier(
+            vc.PipelineStage.TRANSFER, vc.PipelineStage.ALL_COMMANDS,
+            vc.Dependency.NONE, [barrier], [], [])
+        self._recording.close()
+
+        commandbuffer, transfer_commandbuffer, semaphore, fence = \
+            self._submission
+        submit = vo.SubmitInfo([], [], [], [commandbuffer])
+        if self.transfer and self._transfer_used:
+            transfer_submit = vo.SubmitInfo([], [], [semaphore],
+                                            [transfer_commandbuffer])
+            vo.submit_to_queue(self.context.transfer_queue,
+                               [transfer_submit])
+            submit = vo.SubmitInfo([semaphore],
+                                   [vc.PipelineStage.ALL_COMMANDS], [],
+                                   [commandbuffer])
+        vo.submit_to_graphic_queue(self.context, [submit], fence)
+
+        token = UploadToken(self, fence)
+        self.pending.append((self._submission, token, self._callbacks))
+        self._submission = None
+        self._register = self._transfer_register = self._recording = None
+        self._transfer_used = False
+        self._callbacks = []
+        self.last_token = token
+        return token
+
+    def collect(self):
+        '''Recycle completed submissions and call their callbacks
+
+        Never blocks, call it regularly (for example each frame).
+
+        *Returns:*
+
+        Number of submissions still running
+        '''
+        running = []
+        for item in self.pending:
+            submission, token, callbacks = item
+            commandbuffer, transfer_commandbuffer, _, fence = submission
+            if not fence.signaled(self.context):
+                running.append(item)
+                continue
+
+            for callback in callbacks:
+                callback()
+            token.completed = True
+            fence.reset(self.context)
+            commandbuffer.reset()
+            if transfer_commandbuffer:
+                transfer_commandbuffer.reset()
+            self.free.append(submission)
+
+        self.pending = running
+        return len(self.pending)
+
+    def wait_idle(self):
+        '''Submit recorded uploads and wait for all submissions'''
+        self.submit()
+        for submission, _, _ in self.pending:
+            submission[3].wait(self.context)
+        self.collect()
+
+    def destroy(self):
+        '''Wait for uploads and destroy the queue'''
+        self.wait_idle()
+        for _, _, semaphore, fence in self.free:
+            fence.destroy(self.context)
+            if semaphore:
+                semaphore.destroy(self.context)
+        self.free = []
+        self.commandpool.destroy(self.context)
+        if self.transfer_commandpool:
+            self.transfer_commandpool.destroy(self.context)
+
+
+class ImmediatePool():
+    '''Recycle commandbuffers of one time submissions
+
+    `immediate_buffer` takes its commandbuffers from this transient pool
+    instead of creating a `CommandPool` at each call. Each submission has
+    its own fence, waiting for it doesn't wait for unrelated work of the
+    graphic queue. Commandbuffers and fences are recycled when their
+    submission is completed.
+    '''
+
+    def __init__(self, context):
+        '''
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        self.context = context
+        flags = vc.CommandPoolCreate.TRANSIENT | vc.CommandPoolCreate.RESET_COMMAND_BUFFER # noqa
+        self.commandpool = vo.CommandPool(
+            context, context.queue_family_indices['graphic'], flags)
+        # Recycled (commandbuffer, fence)
+        self.free = []
+        # Submitted (commandbuffer, fence, token)
+        self.pending = []
+        self.last_token = None
+
+    def acquire(self):
+        '''Get a free commandbuffer and its fence
+
+        *Returns:*
+
+        Tuple (`CommandBuffer`, `Fence`)
+        '''
+        self.collect()
+        if self.free:
+            return self.free.pop()
+
+        commandbuffer = self.commandpool.allocate_buffers(
+            self.context, vc.CommandBufferLevel.PRIMARY, 1)[0]
+        return commandbuffer, vo.Fence(self.context)
+
+    def submit(self, commandbuffer, fence):
+        '''Submit a commandbuffer given by `acquire`
+
+        *Parameters:*
+
+        - `commandbuffer`: `CommandBuffer` recorded
+        - `fence`: `Fence` of the commandbuffer
+
+        *Returns:*
+
+        `UploadToken`, also stored in `last_token`
+        '''
+        submit = vo.SubmitInfo([], [], [], [commandbuffer])
+        vo.submit_to_graphic_queue(self.context, [submit], fence)
+
+        token = UploadToken(self, fence)
+        self.pending.append((commandbuffer, fence, token))
+        self.last_token = token
+        return token
+
+    def collect(self):
+        '''Recycle completed submissions
+
+        Never blocks.
+
+        *Returns:*
+
+        Number of submissions still running
+        '''
+        running = []
+        for item in self.pending:
+            commandbuffer, fence, token = item
+            if not fence.signaled(self.context):
+                running.append(item)
+                continue
+
+            token.completed = True
+            fence.reset(self.context)
+            commandbuffer.reset()
+            self.free.append((commandbuffer, fence))
+
+        self.pending = running
+        return len(self.pending)
+
+    def wait_idle(self):
+        '''Wait for all submissions'''
+        for _, fence, _ in self.pending:
+            fence.wait(self.context)
+        self.collect()
+
+    def destroy(self):
+        '''Wait for submissions and destroy the pool'''
+        self.wait_idle()
+        for _, fence in self.free:
+            fence.destroy(self.context)
+        self.free = []
+        self.commandpool.destroy(self.context)
+
+
+class SamplerCache():
+    '''Share samplers between textures
+
+    Samplers are identified by all their parameters, textures using the
+    same configuration share the same `Sampler`. Unused samplers are kept
+    for later use and destroyed only when the device limit
+    `maxSamplerAllocationCount` would be exceeded.
+    '''
+
+    def __init__(self, context):
+        '''
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        limits = context.physical_device_properties.limits
+        self.max_samplers = limits.maxSamplerAllocationCount
+        self.max_anisotropy = limits.maxSamplerAnisotropy
+        self.anisotropy_supported = bool(
+            context.physical_device_features.samplerAnisotropy)
+        # key: [Sampler, refcount], least recently used first
+        self.samplers = OrderedDict()
+        # Sampler id to key
+        self.keys = {}
+
+    def get(self, context, mag_filter, min_filter, mipmap_mode,
+            address_mode_u, address_mode_v, address_mode_w, mip_lod_bias,
+            anisotropy_enable, max_anisotropy, compare_enable, compare_op,
+            min_lod, max_lod, border_color, unnormalized_coordinates):
+        '''Return a sampler with these parameters
+
+        Parameters are the ones of `Sampler`. Anisotropy is disabled if not
+        supported by the device and clamped to its limit.
+        You must call `release` when you don't need the sampler anymore.
+
+        *Returns:*
+
+        `Sampler`
+        '''
+        if not self.anisotropy_supported:
+            anisotropy_enable = False
+        if not anisotropy_enable:
+            max_anisotropy = 1
+        max_anisotropy = min(max_anisotropy, self.max_anisotropy)
+
+        key = (mag_filter, min_filter, mipmap_mode, address_mode_u,
+               address_mode_v, address_mode_w, mip_lod_bias,
+               anisotropy_enable, max_anisotropy, compare_enable,
+               compare_op, min_lod, max_lod, border_color,
+               unnormalized_coordinates)
+
+        entry = self.samplers.get(key)
+        if not entry:
+            if len(self.samplers) >= self.max_samplers:
+                self._evict(context)
+            entry = [vo.Sampler(context, *key), 0]
+            self.samplers[key] = entry
+            self.keys[id(entry[0])] = key
+
+        self.samplers.move_to_end(key)
+        entry[1] += 1
+        return entry[0]
+
+    def _evict(self, context):
+        '''Destroy the least recently used unreferenced sampler'''
+        for key, (sampler, refcount) in self.samplers.items():
+            if not refcount:
+                sampler.destroy(context)
+                del self.samplers[key]
+                del self.keys[id(sampler)]
+                return
+
+        msg = "Can't create more than %s samplers" % self.max_samplers
+        logger.error(msg)
+        raise VulkError(msg)
+
+    def release(self, context, sampler):
+        '''Release a sampler returned by `get`
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        - `sampler`: `Sampler`
+        '''
+        # pylint: disable=unused-argument
+        self.samplers[self.keys[id(sampler)]][1] -= 1
+
+    def destroy(self, context):
+        '''Destroy all samplers
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        for sampler, _ in self.samplers.values():
+            sampler.destroy(context)
+        self.samplers.clear()
+        self.keys.clear()
+
+
+class BufferPools():
+    '''Sub-allocate buffers from memory pools
+
+    One `MemoryPool` is created for each buffer usage (vertex, index,
+    uniform, staging...) so that buffers are sub-allocated from big blocks
+    instead of allocating their own `VkDeviceMemory`. Buffers bigger than
+    half a block are not pooled, they are allocated by VMA directly.
+    '''
+
+    def __init__(self, block_size=64 * 1024 * 1024):
+        '''
+        *Parameters:*
+
+        - `block_size`: Size in bytes of the memory blocks of each pool
+        '''
+        self.block_size = block_size
+        # (BufferUsage, VmaMemoryUsage): MemoryPool
+        self.pools = {}
+
+    @staticmethod
+    def _memory_type_bits(context, usage):
+        '''Return the memory types compatible with a buffer usage'''
+        buffer_create = vk.VkBufferCreateInfo(
+            flags=0,
+            size=1,
+            usage=usage.value,
+            sharingMode=vc.SharingMode.EXCLUSIVE.value,
+            queueFamilyIndexCount=0,
+            pQueueFamilyIndices=None
+        )
+        buffer = vk.vkCreateBuffer(context.device, buffer_create, None)
+        requirements = vk.vkGetBufferMemoryRequirements(context.device,
+                                                        buffer)
+        vk.vkDestroyBuffer(context.device, buffer, None)
+        return requirements.memoryTypeBits
+
+    def get(self, context, usage, vma_usage, size):
+        '''Return the pool to use for a buffer
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        - `usage`: `BufferUsage` vulk constant
+        - `vma_usage`: `VmaMemoryUsage` vulk constant
+        - `size`: Size of the buffer in bytes
+
+        *Returns:*
+
+        `MemoryPool` or `None` if the buffer is too big to be pooled
+        '''
+        if size > self.block_size // 2:
+            return None
+
+        key = (int(usage), int(vma_usage))
+        pool = self.pools.get(key)
+        if not pool:
+            memory_type_bits = BufferPools._memory_type_bits(context, usage)
+            memory_type_index = vo.find_memory_type_index(
+                context, memory_type_bits, vma_usage)
+            pool = vo.MemoryPool(context, memory_type_index,
+                                 self.block_size)
+            self.pools[key] = pool
+
+        return pool
+
+    def stats(self, context):
+        '''Return allocation statistics
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+
+        *Returns:*
+
+        `dict` with `pools`, a list of `(usage, vma_usage, stats)` (see
+        `MemoryPool.stats`) and `total`, a `dict` with the number of
+        `VkDeviceMemory` blocks, the number of allocations, the number of
+        free ranges and the used and unused bytes of the whole allocator
+        '''
+        total = vma.vmaCalculateStats(context.vma_allocator).total
+        return {
+            'pools': [(vc.BufferUsage(usage), vc.VmaMemoryUsage(vma_usage),
+                       pool.stats(context))
+                      for (usage, vma_usage), pool in self.pools.items()],
+            'total': {
+                'blocks': total.blockCount,
+                'allocations': total.allocationCount,
+                'unused_ranges': total.unusedRangeCount,
+                'used_bytes': total.usedBytes,
+                'unused_bytes': total.unusedBytes
+            }
+        }
+
+    def destroy(self, context):
+        '''Destroy all pools, buffers must be destroyed before
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        for pool in self.pools.values():
+            pool.destroy(context)
+        self.pools.clear()
+
+
+class UniformAllocator():
+    '''Linear allocator of uniform data for the current frame
+
+    All uniform blocks of a frame are written in one host visible buffer
+    which stays mapped. Each upload bump-allocates a new range, aligned on
+    `minUniformBufferOffsetAlignment`, and is a simple memory copy.
+    Descriptors use `UNIFORM_BUFFER_DYNAMIC` with the range offset.
+    The allocator is reset by `VulkContext.swap` once the GPU is idle,
+    uniforms must be uploaded again at each frame.
+
+    **Note: there is only one region, shared by all frames. It's safe only
+    because `VulkContext` waits for the device before each `reset`, frames
+    are never in flight at the same time. Overlapping frames would need one
+    region per frame, each guarded by a fence.**
+    '''
+
+    def __init__(self, context, size=1024 * 1024):
+        '''
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        - `size`: Bytes of uniform data available per frame
+        '''
+        limits = context.physical_device_properties.limits
+        self.alignment = max(limits.minUniformBufferOffsetAlignment, 1)
+        self.size = size
+        self.offset = 0
+        # Incremented at each reset, allow to know if uploads are outdated
+        self.frame = 0
+
+        # CPU_ONLY memory is host coherent, no flush needed
+        self.buffer = vo.Buffer(
+            context, vc.BufferCreate.NONE, size,
+            vc.BufferUsage.UNIFORM_BUFFER, vc.SharingMode.EXCLUSIVE, [],
+            vc.VmaMemoryUsage.CPU_ONLY)
+        self.mapped = vma.vmaMapMemory(context.vma_allocator,
+                                       self.buffer.allocation)
+        self.array = np.frombuffer(self.mapped, dtype=np.uint8)
+
+    def allocate(self, size):
+        '''Allocate `size` bytes for the current frame
+
+        *Parameters:*
+
+        - `size`: Bytes to allocate
+
+        *Returns:*
+
+        Offset of the allocation in `buffer`
+        '''
+        offset = -(-self.offset // self.alignment) * self.alignment
+        if offset + size > self.size:
+            msg = "Uniform allocator full (%s bytes per frame)" % self.size
+            logger.error(msg)
+            raise VulkError(msg)
+
+        self.offset = offset + size
+        return offset
+
+    def write(self, data):
+        '''Allocate and copy `data` for the current frame
+
+        *Parameters:*
+
+        - `data`: `numpy` array of bytes (`uint8`)
+
+        *Returns:*
+
+        Offset of the data in `buffer`
+        '''
+        offset = self.allocate(data.nbytes)
+        np.copyto(self.array[offset:offset + data.nbytes], data,
+                  casting='no')
+        return offset
+
+    def reset(self):
+        '''Free all allocations
+
+        The device must be idle, no submitted command can still read them.
+        '''
+        self.offset = 0
+        self.frame += 1
+
+    def destroy(self, context):
+        '''Unmap and destroy the buffer
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        self.array = None
+        vma.vmaUnmapMemory(context.vma_allocator, self.buffer.allocation)
+        self.buffer.destroy(context)
+
+
+class GpuProfiler():
+    '''GPU timestamp profiler
+
+    Each frame in flight has its own timestamp query pool. Scopes opened
+    with `CommandBufferRegister.profile` write a timestamp before and after
+    their commands. Results of a frame are read without waiting when its
+    query pool is reused, `frames` frames later. If they are not available
+    yet, the current frame is not profiled.
+
+    *Exemple:*
+
+    ```
+    profiler = context.start_gpu_profiler()
+    with cmd.profile(context.gpu_profiler, 'shadows'):
+        # Register commands
+    ...
+    print(profiler.table())
+    ```
+    '''
+
+    def __init__(self, context, frames=3, max_scopes=256, window=120):
+        '''
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        - `frames`: Number of frames in flight (query pools)
+        - `max_scopes`: Maximum number of scopes per frame
+        - `window`: Number of frames kept for percentiles
+        '''
+        limits = context.physical_device_properties.limits
+        family = vk.vkGetPhysicalDeviceQueueFamilyProperties(
+            context.physical_device)[context.queue_family_indices['graphic']]
+        valid_bits = family.timestampValidBits
+        if not valid_bits:
+            msg = "Timestamps not supported by the graphic queue"
+            logger.error(msg)
+            raise VulkError(msg)
+
+        # Nanoseconds per tick
+        self.period = limits.timestampPeriod
+        self.mask = (1 << valid_bits) - 1
+        self.max_scopes = max_scopes
+        self.window = window
+        self.querypools = [
+            vo.QueryPool(context, vc.QueryType.TIMESTAMP, max_scopes * 2)
+            for _ in range(frames)]
+        self.commandpool = vo.CommandPool(
+            context, context.queue_family_indices['graphic'],
+            vc.CommandPoolCreate.RESET_COMMAND_BUFFER)
+        # Per frame in flight: scope names, command buffers and the frame
+        # whose results are pending (None if nothing to read)
+        self.scopes = [[] for _ in range(frames)]
+        self.commandbuffers = [[] for _ in range(frames)]
+        self.pending = [None] * frames
+        self.commandbuffer_id = 0
+        self.frame = 0
+        self.slot = 0
+        self.active = False
+        self.dropped = 0
+        # Last resolved frame: name -> milliseconds
+        self.results = {}
+        self.result_frame = None
+        # Durations of the last frames: name -> deque of milliseconds
+        self.history = OrderedDict()
+
+        self._begin_slot(context)
+
+    def _pull_commandbuffer(self, context):
+        '''Return a reset command buffer of the current frame'''
+        commandbuffers = self.commandbuffers[self.slot]
+        if self.commandbuffer_id == len(commandbuffers):
+            commandbuffers.extend(self.commandpool.allocate_buffers(
+                context, vc.CommandBufferLevel.PRIMARY, 1))
+        commandbuffer = commandbuffers[self.commandbuffer_id]
+        self.commandbuffer_id += 1
+        commandbuffer.reset()
+        return commandbuffer
+
+    def _begin_slot(self, context):
+        '''Reset the query pool of the current frame'''
+        self.scopes[self.slot] = []
+        self.commandbuffer_id = 0
+        commandbuffer = self._pull_commandbuffer(context)
+        querypool = self.querypools[self.slot]
+        with commandbuffer.bind(vc.CommandBufferUsage.ONE_TIME_SUBMIT) as cmd:
+            cmd.reset_query_pool(querypool, 0, querypool.query_count)
+        submit = vo.SubmitInfo([], [], [], [commandbuffer])
+        vo.submit_to_graphic_queue(context, [submit])
+
+        self.pending[self.slot] = self.frame
+        self.active = True
+
+    def begin_scope(self, cmd, name):
+        '''Write the begin timestamp of a scope, you should use
+        `CommandBufferRegister.profile`
+
+        *Parameters:*
+
+        - `cmd`: `CommandBufferRegister`
+        - `name`: Name of the scope
+
+        *Returns:*
+
+        Scope to give to `end_scope` (`None` if not profiled)
+        '''
+        scopes = self.scopes[self.slot]
+        if not self.active or len(scopes) >= self.max_scopes:
+            return None
+
+        query = len(scopes) * 2
+        scopes.append(name)
+        cmd.write_timestamp(vc.PipelineStage.TOP_OF_PIPE,
+                            self.querypools[self.slot], query)
+        return query
+
+    def end_scope(self, cmd, scope):
+        '''Write the end timestamp of a scope
+
+        *Parameters:*
+
+        - `cmd`: `CommandBufferRegister`
+        - `scope`: Value returned by `begin_scope`
+        '''
+        if scope is None:
+            return
+
+        cmd.write_timestamp(vc.PipelineStage.BOTTOM_OF_PIPE,
+                            self.querypools[self.slot], scope + 1)
+
+    def scope_commandbuffers(self, context, name):
+        '''Return two command buffers to submit around command buffers
+        which can't contain the scope (prerecorded)
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        - `name`: Name of the scope
+
+        *Returns:*
+
+        `list` of two `CommandBuffer` or `None` if not profiled
+        '''
+        if not self.active or \
+           len(self.scopes[self.slot]) >= self.max_scopes:
+            return None
+
+        begin = self._pull_commandbuffer(context)
+        end = self._pull_commandbuffer(context)
+        flags = vc.CommandBufferUsage.ONE_TIME_SUBMIT
+        with begin.bind(flags) as cmd:
+            scope = self.begin_scope(cmd, name)
+        with end.bind(flags) as cmd:
+            self.end_scope(cmd, scope)
+        return [begin, end]
+
+    def resolve(self, context, slot):
+        '''Read the results of a frame in flight
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        - `slot`: Index of the frame in flight
+
+        *Returns:*
+
+        `False` if results are not available yet
+        '''
+        names = self.scopes[slot]
+        timestamps = self.querypools[slot].get_results(
+            context, 0, len(names) * 2)
+        if timestamps is None:
+            return False
+
+        results = {}
+        for i, name in enumerate(names):
+            ticks = (timestamps[i * 2 + 1] - timestamps[i * 2]) & self.mask
+            results[name] = results.get(name, 0) + \
+                ticks * self.period / 1000000
+
+        for name, duration in results.items():
+            if name not in self.history:
+                self.history[name] = deque(maxlen=self.window)
+            self.history[name].append(duration)
+
+        self.results = results
+        self.result_frame = self.pending[slot]
+        self.pending[slot] = None
+        return True
+
+    def next_frame(self, context):
+        '''Start profiling a new frame, called by `VulkContext.swap`
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        self.frame += 1
+        self.slot = self.frame % len(self.querypools)
+        if self.pending[self.slot] is not None and \
+           not self.resolve(context, self.slot):
+            # Query pool still in use, this frame is not profiled
+            self.active = False
+            self.dropped += 1
+            return
+
+        self._begin_slot(context)
+
+    def percentiles(self, percents=(50, 90, 99)):
+        '''Aggregate durations of the last `window` frames
+
+        *Parameters:*
+
+        - `percents`: Percentiles to compute
+
+        *Returns:*
+
+        `OrderedDict` name -> `dict` with 'count', 'mean' and 'p<percent>'
+        in milliseconds
+        '''
+        table = OrderedDict()
+        for name, durations in self.history.items():
+            values = np.array(durations)
+            row = {'count': len(values), 'mean': float(values.mean())}
+            for percent, value in zip(percents,
+                                      np.percentile(values, percents)):
+                row['p%s' % percent] = float(value)
+            table[name] = row
+        return table
+
+    def table(self, percents=(50, 90, 99)):
+        '''Format `percentiles` as a text table
+
+        *Parameters:*
+
+        - `percents`: Percentiles to compute
+
+        *Returns:*
+
+        `str`
+        '''
+        columns = ['mean'] + ['p%s' % p for p in percents]
+        lines = ['%-24s %6s ' % ('scope', 'count') +
+                 ' '.join('%9s' % c for c in columns)]
+        for name, row in self.percentiles(percents).items():
+            lines.append('%-24s %6d ' % (name, row['count']) +
+                         ' '.join('%9.3f' % row[c] for c in columns))
+        return '\n'.join(lines)
+
+    def destroy(self, context):
+        '''Destroy query pools and command buffers
+
+        *Parameters:*
+
+        - `context`: `VulkContext`
+        '''
+        for querypool in self.querypools:
+            querypool.destroy(context)
+        self.commandpool.destroy(context)